@@ -0,0 +1,46 @@
+"""Fixed point rates
+
+Revision ID: f2d8c4a61b37
+Revises: e4b9a1f06c52
+Create Date: 2026-10-17 21:14:09.502318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2d8c4a61b37'
+down_revision: Union[str, None] = 'e4b9a1f06c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# rates are stored as integers scaled by domain.fixedpoint.RATE_SCALE
+RATE_SCALE = 10**9
+RATE_TABLES = ('exchange_rate', 'exchange_rate_history')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in RATE_TABLES:
+        op.alter_column(
+            table,
+            '_value',
+            type_=sa.BigInteger(),
+            existing_type=sa.Float(precision=6),
+            postgresql_using=f'round(_value::numeric * {RATE_SCALE})::bigint',
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in RATE_TABLES:
+        op.alter_column(
+            table,
+            '_value',
+            type_=sa.Float(precision=6),
+            existing_type=sa.BigInteger(),
+            postgresql_using=f'_value::double precision / {RATE_SCALE}',
+        )
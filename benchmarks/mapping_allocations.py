@@ -0,0 +1,87 @@
+"""
+Measures memory allocated and time spent for mapping of exchange rates rows to domain models, as it's done for
+every row of ExchangeRatesPostgresRepo.get_all_rates. No database is needed, rows are made of transient ORM models.
+
+Run from the project root:
+	PYTHONPATH=src python benchmarks/mapping_allocations.py --rates 100000
+"""
+
+import argparse
+import gc
+import itertools
+import random
+import string
+import time
+import tracemalloc
+
+from currency_exchange.currency_exchange.domain.types import ExchangeRateValue
+from currency_exchange.currency_exchange.infrastructure.db.dbmodels import (
+	CurrenciesExchangeRateORMModel,
+	CurrencyORMModel,
+)
+from currency_exchange.currency_exchange.infrastructure.db.modelmapping import (
+	orm_ex_rate_to_dm_ex_rate,
+)
+
+
+def make_rows(currencies_count: int, rates_count: int):
+	codes = [
+		"".join(letters)
+		for letters in random.sample(
+			list(itertools.product(string.ascii_uppercase, repeat=3)),
+			currencies_count,
+		)
+	]
+	currencies = [
+		CurrencyORMModel(id=i, code=code, name=f"Currency {code}", sign=code[0])
+		for i, code in enumerate(codes, 1)
+	]
+	return [
+		CurrenciesExchangeRateORMModel(
+			id=i,
+			base_crncy=base,
+			target_crncy=target,
+			value=ExchangeRateValue(random.uniform(0.01, 100)),
+		)
+		for i, (base, target) in enumerate(
+			(random.sample(currencies, 2) for _ in range(rates_count)), 1
+		)
+	]
+
+
+def main():
+	parser = argparse.ArgumentParser(prog="mapping_allocations")
+	parser.add_argument("--currencies", type=int, default=150)
+	parser.add_argument("--rates", type=int, default=100_000)
+	args = parser.parse_args()
+
+	rows = make_rows(args.currencies, args.rates)
+
+	gc.collect()
+	tracemalloc.start()
+	before, _ = tracemalloc.get_traced_memory()
+	snapshot_before = tracemalloc.take_snapshot()
+	rates = [orm_ex_rate_to_dm_ex_rate(row) for row in rows]
+	after, _ = tracemalloc.get_traced_memory()
+	snapshot_after = tracemalloc.take_snapshot()
+	tracemalloc.stop()
+	blocks = sum(
+		stat.count_diff
+		for stat in snapshot_after.compare_to(snapshot_before, "filename")
+	)
+	del rates
+
+	gc.collect()
+	started = time.perf_counter()
+	rates = [orm_ex_rate_to_dm_ex_rate(row) for row in rows]
+	elapsed = time.perf_counter() - started
+	assert len(rates) == len(rows)
+
+	print(f"rows: {len(rows)}, currencies: {args.currencies}")
+	print(f"retained bytes per row: {(after - before) / len(rows):.1f}")
+	print(f"retained allocations per row: {blocks / len(rows):.2f}")
+	print(f"mapping time per row: {elapsed / len(rows) * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,134 @@
+"""
+Compares time of reads made by ORM and asyncpg implementations of currencies and exchange rates repositories.
+Sample currencies and rates are inserted into the configured db within a transaction, which is rolled back at the
+end, so the db only needs to be migrated.
+
+Run from the project root:
+	PYTHONPATH=src python benchmarks/repos_reads.py --currencies 150 --rates 5000 --reads 2000
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import string
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from currency_exchange.currency_exchange.application.dto import (
+	GetCurrencyDto,
+	GetExchangeRateDto,
+)
+from currency_exchange.currency_exchange.domain.types import CurrencyCode
+from currency_exchange.currency_exchange.infrastructure.db.dbmodels import (
+	CurrenciesExchangeRateORMModel,
+	CurrencyORMModel,
+)
+from currency_exchange.currency_exchange.infrastructure.db.rawrepos import (
+	CurrencyAsyncpgRepo,
+	ExchangeRatesAsyncpgRepo,
+)
+from currency_exchange.currency_exchange.infrastructure.db.repos import (
+	CurrencyPostgresRepo,
+	ExchangeRatesPostgresRepo,
+)
+from currency_exchange.db.session import engine
+
+BACKENDS = {
+	"orm": (CurrencyPostgresRepo, ExchangeRatesPostgresRepo),
+	"asyncpg": (CurrencyAsyncpgRepo, ExchangeRatesAsyncpgRepo),
+}
+
+
+async def fill_db(session_factory, currencies_count: int, rates_count: int):
+	codes = [
+		"".join(letters)
+		for letters in random.sample(
+			list(itertools.product(string.ascii_uppercase, repeat=3)),
+			currencies_count,
+		)
+	]
+	async with session_factory() as session:
+		async with session.begin():
+			ids = await session.scalars(
+				insert(CurrencyORMModel).returning(CurrencyORMModel.id),
+				[
+					{"code": code, "name": f"Currency {code}", "sign": code[0]}
+					for code in codes
+				],
+			)
+			currencies = dict(zip(ids.all(), codes))
+			pairs = random.sample(
+				list(itertools.permutations(currencies, 2)), rates_count
+			)
+			await session.execute(
+				insert(CurrenciesExchangeRateORMModel),
+				[
+					{
+						"base_crncy_id": base_id,
+						"target_crncy_id": target_id,
+						"_value": random.randint(10**7, 10**11),
+					}
+					for base_id, target_id in pairs
+				],
+			)
+	return codes, [(currencies[base], currencies[target]) for base, target in pairs]
+
+
+async def measure(name: str, reads: int, read) -> None:
+	# first read prepares statements and warms up the connection
+	await read(0)
+	started = time.perf_counter()
+	for i in range(reads):
+		await read(i)
+	elapsed = time.perf_counter() - started
+	print(f"  {name}: {elapsed / reads * 1e6:.1f} us")
+
+
+async def main():
+	parser = argparse.ArgumentParser(prog="repos_reads")
+	parser.add_argument("--currencies", type=int, default=150)
+	parser.add_argument("--rates", type=int, default=5000)
+	parser.add_argument("--reads", type=int, default=2000)
+	args = parser.parse_args()
+
+	async with engine.connect() as connection:
+		transaction = await connection.begin()
+		session_factory = async_sessionmaker(
+			bind=connection,
+			expire_on_commit=False,
+			join_transaction_mode="create_savepoint",
+		)
+		codes, pairs = await fill_db(session_factory, args.currencies, args.rates)
+		print(f"currencies: {args.currencies}, rates: {args.rates}")
+		for backend, (currencies_repo_class, rates_repo_class) in BACKENDS.items():
+			currencies_repo = currencies_repo_class(session_factory)
+			rates_repo = rates_repo_class(session_factory)
+			print(f"{backend}:")
+			await measure(
+				"get_currency",
+				args.reads,
+				lambda i: currencies_repo.get_currency(
+					GetCurrencyDto(CurrencyCode(codes[i % len(codes)]))
+				),
+			)
+			await measure(
+				"get_rate",
+				args.reads,
+				lambda i: rates_repo.get_rate(
+					GetExchangeRateDto(*map(CurrencyCode, pairs[i % len(pairs)]))
+				),
+			)
+			await measure(
+				"get_all_rates",
+				max(args.reads // 100, 1),
+				lambda i: rates_repo.get_all_rates(),
+			)
+		await transaction.rollback()
+	await engine.dispose()
+
+
+if __name__ == "__main__":
+	asyncio.run(main())
@@ -1,2 +1,14 @@
 from .repos import get_users_repo, get_token_state_repo
-from .providers import verify_access, get_user_from_bearer_token
+from .providers import (
+	verify_access,
+	get_user_from_bearer_token,
+	get_lazy_user_from_bearer_token,
+)
+
+__all__ = [
+	"get_users_repo",
+	"get_token_state_repo",
+	"verify_access",
+	"get_user_from_bearer_token",
+	"get_lazy_user_from_bearer_token",
+]
@@ -1,7 +1,13 @@
-from typing import Literal
+from typing import Annotated, Literal, Optional
 from enum import IntEnum
 
-from fastapi import APIRouter, Security, status, HTTPException
+from fastapi import APIRouter, Query, Request, Security, status, HTTPException
+
+from currency_exchange.utils.streaming import (
+	PAGE_MAX_SIZE,
+	STREAMING_RESPONSES,
+	stream_page_response,
+)
 
 from . import get_users_repo, get_token_state_repo, errors
 from .providers import verify_access
@@ -96,10 +102,27 @@ async def get_user(username: str):
 
 
 @users_ops_router.get(
-	"/all", status_code=status.HTTP_200_OK, response_model=list[UserOut]
+	"/all",
+	status_code=status.HTTP_200_OK,
+	response_model=list[UserOut],
+	responses=STREAMING_RESPONSES,
 )
-async def get_all_users():
-	return await users_repo.get_all()
+async def get_all_users(
+	request: Request,
+	category: Optional[UserCategory] = None,
+	is_active: Optional[bool] = None,
+	after: Annotated[
+		Optional[int], Query(description="Id of the last user of the previous page")
+	] = None,
+	limit: Annotated[Optional[int], Query(ge=1, le=PAGE_MAX_SIZE)] = None,
+):
+	return await stream_page_response(
+		request,
+		users_repo.stream_all(category, is_active, after, limit),
+		UserOut,
+		limit,
+		lambda user: user.id,
+	)
 
 
 @users_ops_router.patch(
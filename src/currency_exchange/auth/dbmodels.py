@@ -1,7 +1,7 @@
 import re
 from typing import Optional, Literal
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.dialects.postgresql import TIMESTAMP
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.types import UUID
@@ -26,6 +26,7 @@ class User(SQLAModelBase):
 	_USERNAME_PATTERN = re.compile("\\w+")
 
 	__tablename__ = "user"
+	__table_args__ = (Index("ix_user_category_id", "category", "id"),)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	username: Mapped[str] = mapped_column(unique=True)
@@ -1,5 +1,7 @@
 from collections.abc import Awaitable
-from typing import Annotated, Callable
+from dataclasses import dataclass
+from functools import partial
+from typing import Annotated, Callable, Optional
 import logging
 
 from fastapi import Depends, HTTPException, status
@@ -12,7 +14,8 @@ from fastapi.security import (
 )
 from starlette.requests import Request
 
-from .schemas import UserDbOut
+from . import get_token_state_repo
+from .schemas import UserDbOut, TokenStateDbOut
 from .services.permissions import scopes_registry, UserCategory
 from .services.jwtservice import JWTValidator, JWTModel, JWTIssuer
 from . import errors
@@ -21,8 +24,8 @@ from .utils import (
 	check_jwt_revocation,
 	get_user,
 	get_active_user,
-	get_user_from_sub_jwt_claim,
 	get_subject_claim_for_user,
+	LazyUser,
 )
 
 logger = logging.getLogger("auth")
@@ -50,20 +53,30 @@ class JWTValidatorProvider:
 
 
 class JWTRevocationCheckerProvider:
-	_checker: RevocationCheckerType
+	"""
+	Provides the checker, set explicitly, if any. Otherwise the checker is chosen by REVOCATION_INDEX setting:
+	either the revocation index is checked, or the token state is read along with its user, so that
+	get_auth_context doesn't read them again.
+	"""
 
-	def __init__(self, checker: RevocationCheckerType):
+	_checker: Optional[RevocationCheckerType]
+
+	def __init__(self, checker: Optional[RevocationCheckerType] = None):
 		self._checker = checker
 
-	def __call__(self):
-		return self._checker
+	def __call__(self, request: Request) -> RevocationCheckerType:
+		if self._checker is not None:
+			return self._checker
+		if auth_settings.REVOCATION_INDEX:
+			return check_jwt_revocation
+		return partial(check_jwt_revocation_by_auth_context, request)
 
-	def set_checker(self, checker: RevocationCheckerType):
+	def set_checker(self, checker: Optional[RevocationCheckerType]):
 		self._checker = checker
 
 
 jwt_validator_provider = JWTValidatorProvider(JWTValidator.from_config(auth_settings))
-jwt_revocation_checker_provider = JWTRevocationCheckerProvider(check_jwt_revocation)
+jwt_revocation_checker_provider = JWTRevocationCheckerProvider()
 
 
 async def validate_jwt(
@@ -72,6 +85,7 @@ async def validate_jwt(
 	revocation_checker: Annotated[
 		RevocationCheckerType, Depends(jwt_revocation_checker_provider)
 	],
+	request: Request,
 ) -> JWTModel:
 	exc_args = {
 		"status_code": status.HTTP_401_UNAUTHORIZED,
@@ -81,6 +95,12 @@ async def validate_jwt(
 	if not token_str:
 		raise HTTPException(**exc_args)
 
+	# dependencies are cached per security scopes they're solved for, so the token validated for a dependency
+	# with other scopes is kept in the request state
+	token = getattr(request.state, "validated_jwt", None)
+	if token is not None:
+		return token
+
 	try:
 		try:
 			token = token_validator.token_validate(token_str)
@@ -102,13 +122,13 @@ async def validate_jwt(
 	except errors.CorruptedTokenDataError as e:
 		raise HTTPException(detail="Corrupted token", **exc_args) from e
 	try:
-		revoked = await revocation_checker(token)
-		if revoked:
+		if await revocation_checker(token):
 			raise HTTPException(detail="Revoked token", **exc_args)
 	except errors.TokenDoesNotExistError as e:
 		logger.debug("Unrecognized token. Token id: %s", token.claims.jti)
 		raise HTTPException(detail="Unrecognized token", **exc_args) from e
 
+	request.state.validated_jwt = token
 	return token
 
 
@@ -168,10 +188,84 @@ async def get_active_user_http_basic_auth(
 	return await get_active_user(user_credentials.username)
 
 
+@dataclass(slots=True)
+class AuthContext:
+	token: JWTModel
+	token_state: TokenStateDbOut
+	user: UserDbOut
+
+
+async def load_auth_context(request: Request, token: JWTModel) -> AuthContext:
+	"""
+	Token of the request along with its state and user, read by one query from the primary db once per request.
+	Raises TokenDoesNotExistError, if there's no state of the token.
+	"""
+	auth_context = getattr(request.state, "auth_context", None)
+	if auth_context is None:
+		token_state, user = await get_token_state_repo().get_with_user(token.claims.jti)
+		auth_context = AuthContext(token=token, token_state=token_state, user=user)
+		request.state.auth_context = auth_context
+	return auth_context
+
+
+async def check_jwt_revocation_by_auth_context(
+	request: Request, token: JWTModel
+) -> bool:
+	return (await load_auth_context(request, token)).token_state.revoked
+
+
+async def get_auth_context(
+	token: Annotated[JWTModel, Depends(validate_jwt)],
+	request: Request,
+) -> AuthContext:
+	"""
+	Token of the request along with its state and user. The token is validated once per request, as validate_jwt
+	result is shared by all dependencies of the request, e.g. verify_access, and its state is read once, unless
+	revocation is checked by the revocation index.
+	"""
+	exc_args = {
+		"status_code": status.HTTP_401_UNAUTHORIZED,
+		"headers": {"WWW-Authenticate": "Bearer"},
+	}
+	try:
+		auth_context = await load_auth_context(request, token)
+	except errors.TokenDoesNotExistError as e:
+		logger.debug("Unrecognized token. Token id: %s", token.claims.jti)
+		raise HTTPException(detail="Unrecognized token", **exc_args) from e
+	# the state is read from the primary, so revocation made after the index check is seen as well
+	if auth_context.token_state.revoked:
+		raise HTTPException(detail="Revoked token", **exc_args)
+	return auth_context
+
+
+def check_user_is_active(user: UserDbOut) -> None:
+	if not user.is_active:
+		raise HTTPException(
+			status_code=status.HTTP_403_FORBIDDEN, detail="User is not active"
+		)
+
+
 async def get_user_from_bearer_token(
-	bearer_token: Annotated[JWTModel, Depends(validate_jwt)],
+	auth_context: Annotated[AuthContext, Depends(get_auth_context)],
 ) -> UserDbOut:
-	return await get_user_from_sub_jwt_claim(bearer_token.claims.sub)
+	check_user_is_active(auth_context.user)
+	return auth_context.user
+
+
+async def get_lazy_user_from_bearer_token(
+	bearer_token: Annotated[JWTModel, Depends(validate_jwt)],
+	request: Request,
+) -> LazyUser:
+	"""
+	User of the token, taken from its claims without a db query. If the user is read along with the token state
+	by validate_jwt, i.e. revocation isn't checked by the revocation index, the user is rejected, unless active.
+	Otherwise tokens of a deactivated user are rejected by the index, as they're revoked on deactivation.
+	"""
+	auth_context: Optional[AuthContext] = getattr(request.state, "auth_context", None)
+	if auth_context is None:
+		return LazyUser(bearer_token.claims.sub)
+	check_user_is_active(auth_context.user)
+	return LazyUser(bearer_token.claims.sub, user=auth_context.user)
 
 
 class JWTIssuerProvider:
@@ -1,8 +1,9 @@
-from collections.abc import Awaitable, Callable
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Optional
 from uuid import UUID
 
 import sqlalchemy
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from currency_exchange.db.session import async_session_factory
@@ -15,10 +16,16 @@ from .schemas import (
 	TokenStateDbUpdate,
 )
 from currency_exchange.db.repoabc import RepositoryABC
+from currency_exchange.db.changes import publish_change
 from currency_exchange.db.crud import AsyncCrudMixin
+from currency_exchange.db.routing import read_only
 from .dbmodels import User, TokenState
+from .services.permissions import UserCategory
 from . import errors
 
+USERS_CHANGES_TOPIC = "users"
+TOKEN_STATES_CHANGES_TOPIC = "token_states"
+
 
 class ExceptionHandlerMixin:
 	_db_exception_handlers: dict[
@@ -50,18 +57,35 @@ class UsersRepository(AsyncCrudMixin, ExceptionHandlerMixin, RepositoryABC):
 	_object_does_not_exist_error = errors.UserDoesNotExistError
 	_input_model = UserDbIn
 	_output_model = UserDbOut
+	_changes_topic = USERS_CHANGES_TOPIC
 	_db_exception_handlers = {}
 
 	def __init__(self, db_session_maker: async_sessionmaker[AsyncSession]):
 		self._session_factory = db_session_maker
 
 	async def get(self, user_identity: str | int) -> UserDbOut:
+		# users are authenticated on the primary, as the user could have been deactivated just now
 		criteria, criteria_str = self._get_identity_criteria(user_identity)
 		return await self._get_object(criteria, f"No such user with {criteria_str}")
 
+	@read_only
 	async def get_all(self) -> list[UserDbOut]:
 		return await self._get_all_objects()
 
+	def stream_all(
+		self,
+		category: Optional[UserCategory] = None,
+		is_active: Optional[bool] = None,
+		after_id: Optional[int] = None,
+		limit: Optional[int] = None,
+	) -> AsyncIterator[UserDbOut]:
+		criteria = []
+		if category is not None:
+			criteria.append(User.category == category)
+		if is_active is not None:
+			criteria.append(User.is_active == is_active)
+		return self._stream_all_objects(*criteria, after_id=after_id, limit=limit)
+
 	async def save(self, user: UserDbIn | UserDbUpdate) -> UserDbOut | None:
 		if isinstance(user, UserDbUpdate):
 			await self.update(user)
@@ -128,20 +152,48 @@ class TokenStateRepository(AsyncCrudMixin, ExceptionHandlerMixin, RepositoryABC)
 	_object_does_not_exist_error = errors.TokenDoesNotExistError
 	_input_model = TokenStateDbIn
 	_output_model = TokenStateDbOut
+	_changes_topic = TOKEN_STATES_CHANGES_TOPIC
 	_db_exception_handlers = {}
 
 	def __init__(self, db_session_maker: async_sessionmaker[AsyncSession]):
 		self._session_factory = db_session_maker
 
 	async def get(self, token_id: str | UUID) -> TokenStateDbOut:
+		# revocation is checked on the primary, as the token could have been revoked just now
 		token_id = self._normalize_uuid(token_id)
 		return await self._get_object(
 			TokenState.id == token_id, f"No such token with {token_id}"
 		)
 
+	@read_only
 	async def get_all(self) -> list[TokenStateDbOut]:
 		return await self._get_all_objects()
 
+	def stream_unexpired(self) -> AsyncIterator[TokenStateDbOut]:
+		return self._stream_all_objects(TokenState.expiry_date > func.now())
+
+	async def get_with_user(
+		self, token_id: str | UUID
+	) -> tuple[TokenStateDbOut, UserDbOut]:
+		"""
+		Token state along with its user, read by one query. It's read from the primary, as the token could have
+		been revoked just now.
+		"""
+		token_id = self._normalize_uuid(token_id)
+		async with self._session_factory() as session:
+			async with session.begin():
+				res = await session.execute(
+					select(TokenState, User)
+					.join(User, User.id == TokenState.user_id)
+					.where(TokenState.id == token_id)
+				)
+				row = res.one_or_none()
+				if row is None:
+					raise errors.TokenDoesNotExistError(
+						f"No such token with {token_id}"
+					)
+		return TokenStateDbOut.model_validate(row[0]), UserDbOut.model_validate(row[1])
+
 	async def save(
 		self, token_state: TokenStateDbIn | TokenStateDbUpdate
 	) -> TokenStateDbOut | None:
@@ -179,7 +231,7 @@ class TokenStateRepository(AsyncCrudMixin, ExceptionHandlerMixin, RepositoryABC)
 				select(TokenState).where(
 					TokenState.user_id == user_id,
 					TokenState.device_id == device_id,
-					TokenState.revoked == False,
+					TokenState.revoked.is_(False),
 				)
 			)
 		return [
@@ -190,7 +242,7 @@ class TokenStateRepository(AsyncCrudMixin, ExceptionHandlerMixin, RepositoryABC)
 		async with self._session_factory() as session:
 			res = await session.execute(
 				select(TokenState).where(
-					TokenState.user_id == user_id, TokenState.revoked == False
+					TokenState.user_id == user_id, TokenState.revoked.is_(False)
 				)
 			)
 		return [
@@ -205,7 +257,7 @@ class TokenStateRepository(AsyncCrudMixin, ExceptionHandlerMixin, RepositoryABC)
 				select(TokenState).where(
 					TokenState.user_id == user_id,
 					TokenState.id.in_(jtis),
-					TokenState.revoked == False,
+					TokenState.revoked.is_(False),
 				)
 			)
 
@@ -213,6 +265,44 @@ class TokenStateRepository(AsyncCrudMixin, ExceptionHandlerMixin, RepositoryABC)
 			TokenStateDbOut.model_validate(t_model) for t_model in res.scalars().all()
 		]
 
+	async def revoke(self, token_ids: list[str | UUID]) -> list[UUID]:
+		"""Revokes tokens with given ids by one query. Returns ids of tokens, which weren't revoked before."""
+		return await self._revoke_tokens(TokenState.id.in_(token_ids))
+
+	async def revoke_users_tokens(
+		self,
+		user_id: int,
+		device_id: Optional[str] = None,
+		token_ids: Optional[list[str | UUID]] = None,
+	) -> list[UUID]:
+		"""
+		Revokes user's tokens by one query, only those of the device or with given ids, if they're given. Returns
+		ids of tokens, which weren't revoked before.
+		"""
+		criteria = [TokenState.user_id == user_id]
+		if device_id is not None:
+			criteria.append(TokenState.device_id == device_id)
+		if token_ids is not None:
+			criteria.append(TokenState.id.in_(token_ids))
+		return await self._revoke_tokens(*criteria)
+
+	async def _revoke_tokens(self, *criteria) -> list[UUID]:
+		async with self._session_factory() as session:
+			async with session.begin():
+				res = await session.execute(
+					update(TokenState)
+					.where(*criteria, TokenState.revoked.is_(False))
+					.values(revoked=True)
+					.returning(TokenState.id)
+					.execution_options(synchronize_session=False)
+				)
+				revoked_ids = list(res.scalars().all())
+				if revoked_ids:
+					await publish_change(
+						session, self._changes_topic, [str(id_) for id_ in revoked_ids]
+					)
+		return revoked_ids
+
 	@staticmethod
 	def create_root_model_from_dto(dto: TokenStateDbIn) -> TokenState:
 		return TokenState(**dto.model_dump())
@@ -0,0 +1,97 @@
+import heapq
+import time
+from typing import Optional
+from uuid import UUID
+
+from currency_exchange.db.changes import ChangesListener
+from . import get_token_state_repo
+from .repos import TOKEN_STATES_CHANGES_TOPIC, TokenStateRepository
+from .schemas import TokenStateDbIn
+
+
+class TokenRevocationIndex:
+	"""
+	Revocation states of unexpired tokens, held in process memory, so that revocation of a token is checked
+	without a db query. A token, which isn't in the index, e.g. issued by another process, is looked up in db
+	once, and is kept in the index since then.
+
+	Tokens changed by other processes are dropped from the index on notification about the change, and are
+	looked up again on their next check.
+	"""
+
+	def __init__(self, token_state_repo: TokenStateRepository) -> None:
+		self._token_state_repo = token_state_repo
+		# revoked flags and expiry times of tokens by their ids
+		self._tokens: dict[UUID, tuple[bool, float]] = {}
+		# expiry times of the indexed tokens, the earliest goes first
+		self._expiries: list[tuple[float, UUID]] = []
+		# changed on every drop, so that a state read from db before the drop isn't put into the index
+		self._generation = 0
+
+	def __len__(self) -> int:
+		return len(self._tokens)
+
+	async def load(self) -> None:
+		generation = self._generation
+		token_states = [
+			token_state
+			async for token_state in self._token_state_repo.stream_unexpired()
+		]
+		if generation == self._generation:
+			for token_state in token_states:
+				self.add(token_state)
+
+	async def is_revoked(self, token_id: str | UUID) -> bool:
+		"""
+		Whether the token is revoked. Raises TokenDoesNotExistError, if there's no such token.
+		"""
+		token_id = self._normalize_id(token_id)
+		self._drop_expired()
+		state = self._tokens.get(token_id)
+		if state is not None:
+			return state[0]
+		generation = self._generation
+		token_state = await self._token_state_repo.get(token_id)
+		if generation == self._generation:
+			self.add(token_state)
+		return token_state.revoked
+
+	def add(self, token_state: TokenStateDbIn) -> None:
+		expiry = token_state.expiry_date.timestamp()
+		self._tokens[token_state.id] = bool(token_state.revoked), expiry
+		heapq.heappush(self._expiries, (expiry, token_state.id))
+
+	def revoke(self, *token_ids: str | UUID) -> None:
+		for token_id in map(self._normalize_id, token_ids):
+			state = self._tokens.get(token_id)
+			if state is not None:
+				self._tokens[token_id] = True, state[1]
+
+	def drop(self, token_ids: Optional[list[str]] = None) -> None:
+		"""Drops given tokens, or all of them if None, so that their states are read from db again."""
+		self._generation += 1
+		if token_ids is None:
+			self._tokens.clear()
+			self._expiries.clear()
+			return
+		for token_id in map(self._normalize_id, token_ids):
+			self._tokens.pop(token_id, None)
+
+	def subscribe_to_changes(self, changes_listener: ChangesListener) -> None:
+		"""Keeps the index coherent with changes of tokens made by other processes."""
+		changes_listener.subscribe(TOKEN_STATES_CHANGES_TOPIC, self.drop)
+
+	def _drop_expired(self) -> None:
+		now = time.time()
+		while self._expiries and self._expiries[0][0] <= now:
+			expiry, token_id = heapq.heappop(self._expiries)
+			state = self._tokens.get(token_id)
+			if state is not None and state[1] <= now:
+				del self._tokens[token_id]
+
+	@staticmethod
+	def _normalize_id(token_id: str | UUID) -> UUID:
+		return UUID(token_id) if isinstance(token_id, str) else token_id
+
+
+revocation_index = TokenRevocationIndex(get_token_state_repo())
@@ -1,4 +1,8 @@
+import base64
 import binascii
+import hashlib
+import json
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -6,6 +10,7 @@ import joserfc.errors
 import pydantic
 from joserfc import jwt
 
+from currency_exchange.utils.boundedcache import BoundedCache, CacheStats
 from .jwtissuer import LoadKeyMixin, KeyDataType
 from .jwtmodel import JWTModel
 from . import JWTAlgorithms
@@ -13,25 +18,54 @@ from ... import errors
 
 
 class JWTValidator(LoadKeyMixin):
+	"""
+	Validates signature and claims of jwts. Validated tokens are kept in a cache of cache_size entries, keyed by
+	token digest, until they expire, so that a token used again is neither verified nor validated again.
+	"""
+
 	def __init__(
 		self,
 		key: Optional[KeyDataType] = None,
 		key_path: Optional[str | Path] = None,
 		algorithm: JWTAlgorithms = JWTAlgorithms.RS256,
+		cache_size: int = 0,
 	) -> None:
 		self._key = self._load_key(key, key_path)
 		self._algorithm = algorithm
+		self._cache = BoundedCache(cache_size) if cache_size else None
 
 	@classmethod
 	def from_config(cls, config, **kwargs):
 		init_args = {
 			"key_path": getattr(config, "JWT_PUB_KEY_PATH", None),
 			"algorithm": getattr(config, "JWT_SIGN_ALGORITHM", JWTAlgorithms.RS256),
+			"cache_size": getattr(config, "JWT_CACHE_SIZE", 0),
 		}
 		init_args.update(kwargs)
 		return cls(**init_args)
 
 	def token_validate(self, token: str) -> JWTModel:
+		if self._cache is None:
+			return self._validate(token)
+		digest = hashlib.sha256(token.encode()).digest()
+		token_model = self._cache.get(digest, None)
+		if token_model is None:
+			token_model = self._validate(token)
+			self._cache.set(digest, token_model)
+		elif token_model.claims.exp.timestamp() < time.time():
+			self._cache.invalidate(digest)
+			raise errors.ExpiredTokenError(
+				"Token has expired",
+				token_model.claims.model_dump(mode="json"),
+				token_model.header.model_dump(mode="json"),
+			)
+		return token_model
+
+	def get_cache_stats(self) -> Optional[CacheStats]:
+		return self._cache.get_stats() if self._cache is not None else None
+
+	def _validate(self, token: str) -> JWTModel:
+		self._check_time_claims(token)
 		token_obj = self._decode_jwt_data(token)
 		try:
 			return JWTModel.model_validate(
@@ -58,3 +92,26 @@ class JWTValidator(LoadKeyMixin):
 			raise errors.BadSignatureError("Invalid token with bad signature") from e
 		except (binascii.Error, ValueError, joserfc.errors.DecodeError) as e:
 			raise errors.CorruptedTokenDataError("Token data is corrupted") from e
+
+	@staticmethod
+	def _check_time_claims(token: str) -> None:
+		"""
+		Rejects tokens, which are expired or issued in the future, by their unverified claims, so that no
+		signature is verified for them. Malformed tokens are left for the full validation to reject.
+		"""
+		try:
+			payload = token.split(".")[1]
+			claims = json.loads(
+				base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+			)
+			iat, exp = float(claims["iat"]), float(claims["exp"])
+		except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+			return
+		now = time.time()
+		# same checks, in the same order, as done by the claims model
+		if now - iat <= -1:
+			raise errors.InvalidTokenClaimError(
+				"iat < current_time+1sec  should be true", claims
+			)
+		if exp < now:
+			raise errors.ExpiredTokenError("Token has expired", claims)
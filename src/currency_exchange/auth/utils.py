@@ -1,11 +1,15 @@
 import logging
 from typing import Optional, Literal
+from uuid import UUID
 
 from fastapi import status, HTTPException
 
+from currency_exchange.config import auth_settings
+from currency_exchange.db.unitofwork import after_commit
 from . import get_token_state_repo, get_users_repo, errors
 from .repos import TokenStateRepository, UsersRepository
-from .schemas import UserDbOut, TokenStateDbOut, TokenStateDbUpdate, TokenStateDbIn
+from .revocation import revocation_index
+from .schemas import UserDbOut, TokenStateDbOut, TokenStateDbIn
 from .services.jwtservice import JWTModel
 from .services.passwordhashing import match_password
 
@@ -13,23 +17,57 @@ logger = logging.getLogger("auth")
 
 
 async def check_jwt_revocation(jwt: JWTModel) -> bool:
-	token_repo: TokenStateRepository = get_token_state_repo()
-	token_state = await token_repo.get(jwt.claims.jti)
-	if token_state.revoked:
+	if auth_settings.REVOCATION_INDEX:
+		revoked = await revocation_index.is_revoked(jwt.claims.jti)
+	else:
+		token_repo: TokenStateRepository = get_token_state_repo()
+		revoked = (await token_repo.get(jwt.claims.jti)).revoked
+	if revoked:
 		logger.debug("Got revoked token. Owner: %s", jwt.claims.sub)
-	return token_state.revoked
+	return revoked
 
 
 async def get_user_from_sub_jwt_claim(sub: str) -> UserDbOut:
-	username = sub.rsplit(".", 2)[-2]
 	user_repo = get_users_repo()
-	return await user_repo.get(username)
+	return await user_repo.get(get_username_from_sub_jwt_claim(sub))
+
+
+def get_username_from_sub_jwt_claim(sub: str) -> str:
+	return sub.rsplit(".", 2)[-2]
 
 
 def get_user_id_from_sub_jwt_claim(sub: str) -> int:
 	return int(sub.rsplit(".", 1)[-1].lstrip("id"))
 
 
+class LazyUser:
+	"""
+	User of a token, which username and id are taken from the token subject claim, so that they're known without
+	a db query. The rest of user data is read from db by load(), and is accessible as attributes afterwards.
+	"""
+
+	__slots__ = ("username", "id", "_user")
+
+	def __init__(self, sub: str, user: Optional[UserDbOut] = None) -> None:
+		self.username = get_username_from_sub_jwt_claim(sub)
+		self.id = get_user_id_from_sub_jwt_claim(sub)
+		# user, read already, isn't read again by load()
+		self._user = user
+
+	async def load(self) -> UserDbOut:
+		if self._user is None:
+			self._user = await get_users_repo().get(self.id)
+		return self._user
+
+	def __getattr__(self, name: str):
+		# called for attributes, which aren't taken from the claim
+		if name.startswith("_") or self._user is None:
+			raise AttributeError(
+				f"User attribute {name} isn't available until the user is loaded"
+			)
+		return getattr(self._user, name)
+
+
 async def get_user(username: str) -> UserDbOut:
 	user_repo: UsersRepository = get_users_repo()
 
@@ -61,47 +99,42 @@ def check_password(user: UserDbOut, password: str) -> None:
 
 async def revoke_tokens(tokens: list[TokenStateDbOut]):
 	token_state_repo = get_token_state_repo()
-	for token in tokens:
-		update_token = TokenStateDbUpdate.model_validate(token.model_dump())
-		update_token.revoked = True
-		await token_state_repo.update(update_token)
+	revoked_ids = await token_state_repo.revoke([token.id for token in tokens])
+	after_commit(lambda: revocation_index.revoke(*revoked_ids))
 
 
 async def revoke_all_users_tokens_per_device(
 	user: UserDbOut, device_id: str
-) -> list[TokenStateDbOut]:
+) -> list[UUID]:
 	token_state_repo = get_token_state_repo()
-	users_tokens = await token_state_repo.get_users_tokens_per_device(
-		user.id, device_id
+	tokens_jtis = await token_state_repo.revoke_users_tokens(
+		user.id, device_id=device_id
 	)
-	tokens_jtis = [token.id for token in users_tokens]
+	after_commit(lambda: revocation_index.revoke(*tokens_jtis))
 
-	if not users_tokens:
+	if not tokens_jtis:
 		logger.info(
 			"Tokens revocation: user %s has no active tokens for device %s",
 			user.username,
 			device_id,
 		)
 
-	await revoke_tokens(users_tokens)
 	logger.info("Revoked all user %s tokens for device %s", user.username, device_id)
 	return tokens_jtis
 
 
 async def revoke_users_tokens(
 	user: UserDbOut, jtis: Optional[list[str]] = None
-) -> list[TokenStateDbOut]:
+) -> list[UUID]:
 	token_state_repo = get_token_state_repo()
-	if jtis:
-		users_tokens = await token_state_repo.get_users_tokens_by_jti(user.id, jtis)
-	else:
-		users_tokens = await token_state_repo.get_users_tokens(user.id)
-	tokens_jtis = [token.id for token in users_tokens]
+	tokens_jtis = await token_state_repo.revoke_users_tokens(
+		user.id, token_ids=jtis or None
+	)
+	after_commit(lambda: revocation_index.revoke(*tokens_jtis))
 
-	if not users_tokens:
+	if not tokens_jtis:
 		logger.info("Tokens revocation: user %s has no active tokens", user.username)
 
-	await revoke_tokens(users_tokens)
 	if not jtis:
 		logger.info("Revoked all user %s tokens", user.username)
 	else:
@@ -113,15 +146,15 @@ async def save_token_state_in_db(
 	token_payload: dict, type_: Literal["access", "refresh"], user_id: int
 ):
 	token_state_repo = get_token_state_repo()
-	await token_state_repo.save(
-		TokenStateDbIn(
-			id=token_payload["jti"],
-			type=type_,
-			user_id=user_id,
-			device_id=token_payload["device_id"],
-			expiry_date=token_payload["exp"],
-		)
+	token_state = TokenStateDbIn(
+		id=token_payload["jti"],
+		type=type_,
+		user_id=user_id,
+		device_id=token_payload["device_id"],
+		expiry_date=token_payload["exp"],
 	)
+	await token_state_repo.save(token_state)
+	after_commit(lambda: revocation_index.add(token_state))
 
 
 def get_subject_claim_for_user(prefix: str, username: str, user_id: int):
@@ -3,7 +3,14 @@ from pathlib import Path
 from typing import Annotated, Literal, Optional
 from enum import Enum
 
-from pydantic import StrictStr, IPvAnyAddress, field_validator, PositiveInt, Field
+from pydantic import (
+	StrictStr,
+	IPvAnyAddress,
+	field_validator,
+	PositiveInt,
+	PositiveFloat,
+	Field,
+)
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # DeclarativeBase common for all project models
@@ -43,12 +50,71 @@ class DbConnectionSettings(BaseSettings):
 	PASSWORD: str
 	DB_NAME: str
 
+	# connections pool: POOL_SIZE connections are kept open and up to MAX_OVERFLOW more are opened under load.
+	# Request waits for a free connection up to POOL_TIMEOUT seconds, then fails
+	POOL_SIZE: PositiveInt = 5
+	MAX_OVERFLOW: Annotated[int, Field(ge=0)] = 10
+	POOL_TIMEOUT: PositiveFloat = 30
+	# connections older than POOL_RECYCLE seconds are reopened, -1 keeps them as long as they work.
+	# POOL_PRE_PING checks that connection is alive on every checkout
+	POOL_RECYCLE: Annotated[int, Field(ge=-1)] = -1
+	POOL_PRE_PING: bool = False
+	# number of prepared statements cached per connection, 0 turns caching off, as needed behind pgbouncer in
+	# transaction pooling mode
+	STATEMENT_CACHE_SIZE: Annotated[int, Field(ge=0)] = 100
+	# read replicas as "host" or "host:port", with the same credentials and db name, e.g. ["replica1", "replica2:5433"].
+	# Read only operations are routed to them in turn, except for REPLICA_STICKINESS seconds after writes of the same
+	# request, so that the request reads its writes despite replication lag. Replica, which connection failed, isn't
+	# used for REPLICA_RETRY_INTERVAL seconds, its reads are made on the primary
+	REPLICA_HOSTS: list[str] = []
+	REPLICA_STICKINESS: Annotated[float, Field(ge=0)] = 2
+	REPLICA_RETRY_INTERVAL: PositiveFloat = 30
+	# each request is handled within a unit of work: repositories share one connection and transaction, which
+	# is committed when the request is handled successfully, or rolled back otherwise
+	REQUEST_UNIT_OF_WORK: bool = True
+
 	@field_validator("HOST", mode="after")
 	@classmethod
 	def validate_host(cls, value):
 		return value.lower()
 
 
+class CurrencyExchangeSettings(BaseSettings):
+	model_config = SettingsConfigDict(
+		env_file=".env", env_prefix="CUREXCH_", extra="ignore"
+	)
+
+	# implementation of db repositories: "orm" reads through SQLAlchemy ORM, "asyncpg" reads currencies and
+	# exchange rates by asyncpg prepared statements, mapping rows straight to domain models. Writes are the same
+	DB_REPOS: Literal["orm", "asyncpg"] = "orm"
+
+	# keep all currencies and exchange rates in process memory, so that reads are served without db queries
+	IN_MEMORY_RATES: bool = False
+
+	# allows currencies convertion through a chain of exchange rates, when no straight, reversed or
+	# cross rate exists. Chain length is limited by RATES_CHAIN_MAX_HOPS exchange rates
+	CONVERT_BY_RATES_CHAIN: bool = False
+	RATES_CHAIN_MAX_HOPS: PositiveInt = 3
+
+	# number of entries in cache of currencies and exchange rates reads, 0 turns cache off.
+	# CACHE_POLICY defines which entries are evicted when cache is full: least recently or least frequently used
+	CACHE_SIZE: Annotated[int, Field(ge=0)] = 0
+	CACHE_POLICY: Literal["lru", "lfu"] = "lru"
+
+	# number of serialized responses of currencies and exchange rates reads, kept ready to be sent along with
+	# their compressed variants, 0 turns the cache off. Larger than RESPONSE_CACHE_MAX_BODY_SIZE bytes are not kept
+	RESPONSE_CACHE_SIZE: Annotated[int, Field(ge=0)] = 0
+	RESPONSE_CACHE_MAX_BODY_SIZE: PositiveInt = 1024 * 1024
+
+	# serialize currencies and exchange rates read from the app straight to JSON, without validating them
+	# by response schemas. Output stays the same, as the data is valid already
+	FAST_SERIALIZATION: bool = False
+
+	# data held in process memory is kept coherent with changes made by other processes through db notifications.
+	# Notifications could be missed, so versions of data are also polled each CHANGES_POLL_INTERVAL seconds
+	CHANGES_POLL_INTERVAL: PositiveFloat = 5
+
+
 class AuthConfig(BaseSettings):
 	model_config = SettingsConfigDict(
 		env_file=".env", env_prefix="AUTH_", extra="ignore"
@@ -81,6 +147,14 @@ class AuthConfig(BaseSettings):
 	# mechanism of tokens blacklist heavily relies on token ids
 	JWT_JTIS: bool = True
 
+	# number of validated jwts kept until their expiry, so that signature of a token used again isn't verified again,
+	# 0 turns the cache off
+	JWT_CACHE_SIZE: Annotated[int, Field(ge=0)] = 10000
+
+	# revocation states of unexpired tokens are held in process memory, so that they aren't queried from db on every
+	# request. Changes made by other processes are caught through db notifications
+	REVOCATION_INDEX: bool = True
+
 	# absolute import paths of validator functions used to validate users password
 	PASSWORD_VALIDATORS: list[str] = [
 		"currency_exchange.auth.services.passwordvalidation.min_length_validator",
@@ -135,5 +209,6 @@ class PermissionsConfig(BaseSettings):
 
 db_conn_settings = DbConnectionSettings()
 general_settings = GeneralSettings()
+currency_exchange_settings = CurrencyExchangeSettings()
 auth_settings = AuthConfig()
 permissions_settings = PermissionsConfig()
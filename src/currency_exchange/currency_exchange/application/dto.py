@@ -56,6 +56,31 @@ class ConvertedCurrenciesPairDto:
 	target_currency_amount: CurrencyAmount
 
 
+@dataclass(slots=True)
+class UpsertedExchangeRateDto:
+	exchange_rate: ExchangeRateDto
+	created: bool
+
+
+@dataclass(slots=True)
+class CurrenciesQueryDto:
+	"""Currencies ordered by code, starting after after_code."""
+
+	codes: Optional[list[CurrencyCode]] = None
+	after_code: Optional[CurrencyCode] = None
+	limit: Optional[int] = None
+
+
+@dataclass(slots=True)
+class ExchangeRatesQueryDto:
+	"""Exchange rates ordered by id, starting after after_id."""
+
+	base_currency: Optional[CurrencyCode] = None
+	target_currency: Optional[CurrencyCode] = None
+	after_id: Optional[int] = None
+	limit: Optional[int] = None
+
+
 @dataclass(slots=True)
 class AddCurrencyDto:
 	code: CurrencyCode
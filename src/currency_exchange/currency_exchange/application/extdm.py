@@ -4,12 +4,12 @@ from typing import Optional
 from ..domain.entities import Currency, CurrenciesExchangeRate
 
 
-@dataclass(frozen=True)
+@dataclass(slots=True, frozen=True)
 class IdentifiedCurrency(Currency):
 	id: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class IdentifiedCurrenciesExchangeRate(CurrenciesExchangeRate):
 	base: IdentifiedCurrency | Currency
 	target: IdentifiedCurrency | Currency
@@ -1,6 +1,9 @@
+from collections.abc import AsyncIterator
+
 from ..dto import (
 	CurrencyDto,
 	GetCurrencyDto,
+	CurrenciesQueryDto,
 	AddCurrencyDto,
 	AlterCurrencyDto,
 	DeleteCurrencyDto,
@@ -19,6 +22,15 @@ class GetAllCurrenciesInteraction:
 		]
 
 
+class StreamCurrenciesInteraction:
+	def __init__(self, currencies_repo: CurrencyRepoInterface):
+		self._currencies_repo = currencies_repo
+
+	async def __call__(self, query: CurrenciesQueryDto) -> AsyncIterator[CurrencyDto]:
+		async for currency in self._currencies_repo.stream_currencies(query):
+			yield CurrencyDto.from_dm(currency)
+
+
 class GetCurrencyInteraction:
 	def __init__(self, currencies_repo: CurrencyRepoInterface):
 		self._currencies_repo = currencies_repo
@@ -5,3 +5,4 @@ class ExchangeRateFetchStrategy(Flag):
 	BY_STRAIGHT_RATE = auto()
 	BY_REVERSED_RATE = auto()
 	BY_COMMON_CURRENCY = auto()
+	BY_RATES_CHAIN = auto()
@@ -1,6 +1,14 @@
+from collections.abc import AsyncIterator
+from datetime import datetime
+from functools import reduce
+from typing import Optional
+
+import numpy as np
+
 from ..dto import (
 	MakeConvertionDto,
 	GetExchangeRateDto,
+	ExchangeRatesQueryDto,
 	ExchangeRateDto,
 	ConvertedCurrenciesPairDto,
 	AlterExchangeRateDto,
@@ -8,14 +16,30 @@ from ..dto import (
 	DeleteExchangeRateDto,
 	CurrencyDto,
 	GetCurrencyDto,
+	UpsertedExchangeRateDto,
 )
 
-from ...domain.types import CurrencyAmount, ExchangeRateValue
-from ..interfaces import ExchangeRatesRepoInterface, CurrencyRepoInterface
+from ...domain.fixedpoint import (
+	DEFAULT_MINOR_UNIT,
+	convert_minor_units_array,
+	from_minor_units,
+	get_minor_unit,
+	to_minor_units_array,
+	to_scaled_rate,
+)
+from ...domain.errors import IncorrectExchangeRateValue
+from ...domain.types import CurrencyAmount, CurrencyCode, ExchangeRateValue
+from ..interfaces import (
+	ExchangeRatesRepoInterface,
+	CurrencyRepoInterface,
+	ExchangeRateResolverInterface,
+)
 from .erfetchstrategies import ExchangeRateFetchStrategy as ERFetchStrat
 from .. import errors
 from ..extdm import IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate
 
+DEFAULT_RATES_CHAIN_MAX_HOPS = 3
+
 
 class GetAllExchangeRatesInteraction:
 	def __init__(self, exchange_rates_repo: ExchangeRatesRepoInterface):
@@ -28,18 +52,92 @@ class GetAllExchangeRatesInteraction:
 		]
 
 
+class StreamExchangeRatesInteraction:
+	def __init__(self, exchange_rates_repo: ExchangeRatesRepoInterface):
+		self._exchange_rates_repo = exchange_rates_repo
+
+	async def __call__(
+		self, query: ExchangeRatesQueryDto
+	) -> AsyncIterator[ExchangeRateDto]:
+		async for er in self._exchange_rates_repo.stream_rates(query):
+			yield ExchangeRateDto.from_dm(er)
+
+
 async def _get_exchange_rate(
 	rate_data: GetExchangeRateDto,
 	exchange_rates_repo: ExchangeRatesRepoInterface,
 	currencies_repo: CurrencyRepoInterface,
 	*,
 	rate_fetch_strategy: ERFetchStrat,
+	rates_chain_max_hops: int = DEFAULT_RATES_CHAIN_MAX_HOPS,
+	rate_resolver: Optional[ExchangeRateResolverInterface] = None,
+	as_of: Optional[datetime] = None,
+) -> CurrenciesExchangeRate:
+	try:
+		return await _find_exchange_rate(
+			rate_data,
+			exchange_rates_repo,
+			currencies_repo,
+			rate_fetch_strategy=rate_fetch_strategy,
+			rates_chain_max_hops=rates_chain_max_hops,
+			rate_resolver=rate_resolver,
+			as_of=as_of,
+		)
+	except IncorrectExchangeRateValue as e:
+		# rate, computed of the stored ones, could be out of range of fixed point rates
+		raise errors.ExchangeRateDoesntExistError(
+			f"Exchange rate {rate_data.base_currency}-{rate_data.target_currency} "
+			f"is out of range"
+		) from e
+
+
+async def _find_exchange_rate(
+	rate_data: GetExchangeRateDto,
+	exchange_rates_repo: ExchangeRatesRepoInterface,
+	currencies_repo: CurrencyRepoInterface,
+	*,
+	rate_fetch_strategy: ERFetchStrat,
+	rates_chain_max_hops: int,
+	rate_resolver: Optional[ExchangeRateResolverInterface],
+	as_of: Optional[datetime],
 ) -> CurrenciesExchangeRate:
 	if rate_data.base_currency == rate_data.target_currency:
 		currency = await currencies_repo.get_currency(
 			GetCurrencyDto(rate_data.base_currency)
 		)
 		return CurrenciesExchangeRate(currency, currency, ExchangeRateValue(1))
+	if as_of is not None:
+		return await _get_exchange_rate_as_of(
+			rate_data,
+			exchange_rates_repo,
+			as_of,
+			rate_fetch_strategy=rate_fetch_strategy,
+		)
+	try:
+		if rate_resolver is not None:
+			rate, _ = await rate_resolver.resolve_rate(
+				rate_data, rate_fetch_strategy=rate_fetch_strategy
+			)
+			return rate
+		return await _resolve_exchange_rate(
+			rate_data, exchange_rates_repo, rate_fetch_strategy=rate_fetch_strategy
+		)
+	except errors.ExchangeRateDoesntExistError:
+		if ERFetchStrat.BY_RATES_CHAIN not in rate_fetch_strategy:
+			raise
+
+	rates_chain = await exchange_rates_repo.get_rates_chain(
+		rate_data, rates_chain_max_hops
+	)
+	return reduce(CurrenciesExchangeRate.get_chained_rate, rates_chain)
+
+
+async def _resolve_exchange_rate(
+	rate_data: GetExchangeRateDto,
+	exchange_rates_repo: ExchangeRatesRepoInterface,
+	*,
+	rate_fetch_strategy: ERFetchStrat,
+) -> CurrenciesExchangeRate:
 	try:
 		return await exchange_rates_repo.get_rate(rate_data)
 	except errors.ExchangeRateDoesntExistError:
@@ -59,7 +157,11 @@ async def _get_exchange_rate(
 			if ERFetchStrat.BY_COMMON_CURRENCY not in rate_fetch_strategy:
 				raise
 
-	cross_rates = await exchange_rates_repo.get_cross_rates(rate_data)
+	cross_rates = (
+		await exchange_rates_repo.get_cross_rates(rate_data)
+		if ERFetchStrat.BY_COMMON_CURRENCY in rate_fetch_strategy
+		else []
+	)
 	if not cross_rates:
 		raise errors.ExchangeRateDoesntExistError(
 			f"Couldn't find cross-rates for "
@@ -74,17 +176,48 @@ async def _get_exchange_rate(
 	return rate
 
 
+async def _get_exchange_rate_as_of(
+	rate_data: GetExchangeRateDto,
+	exchange_rates_repo: ExchangeRatesRepoInterface,
+	as_of: datetime,
+	*,
+	rate_fetch_strategy: ERFetchStrat,
+) -> CurrenciesExchangeRate:
+	"""Past rates are only fetched straight or reversed, as history of rates of other currencies isn't matched."""
+	try:
+		return await exchange_rates_repo.get_rate_as_of(rate_data, as_of)
+	except errors.ExchangeRateDoesntExistError:
+		if ERFetchStrat.BY_REVERSED_RATE not in rate_fetch_strategy:
+			raise
+
+	reversed_er = await exchange_rates_repo.get_rate_as_of(
+		GetExchangeRateDto(rate_data.target_currency, rate_data.base_currency), as_of
+	)
+	rate = reversed_er.get_reversed()
+	rate.id = reversed_er.id
+	return rate
+
+
 class GetExchangeRateInteraction:
 	def __init__(
 		self,
 		exchange_rates_repo: ExchangeRatesRepoInterface,
 		currencies_repo: CurrencyRepoInterface,
+		*,
+		rates_chain_max_hops: int = DEFAULT_RATES_CHAIN_MAX_HOPS,
+		rate_resolver: Optional[ExchangeRateResolverInterface] = None,
 	):
 		self._exchange_rates_repo = exchange_rates_repo
 		self._currencies_repo = currencies_repo
+		self._rates_chain_max_hops = rates_chain_max_hops
+		self._rate_resolver = rate_resolver
 
 	async def __call__(
-		self, rate_data: GetExchangeRateDto, *, rate_fetch_strategy: ERFetchStrat
+		self,
+		rate_data: GetExchangeRateDto,
+		*,
+		rate_fetch_strategy: ERFetchStrat,
+		as_of: Optional[datetime] = None,
 	) -> ExchangeRateDto:
 		return ExchangeRateDto.from_dm(
 			await _get_exchange_rate(
@@ -92,6 +225,9 @@ class GetExchangeRateInteraction:
 				self._exchange_rates_repo,
 				self._currencies_repo,
 				rate_fetch_strategy=rate_fetch_strategy,
+				rates_chain_max_hops=self._rates_chain_max_hops,
+				rate_resolver=self._rate_resolver,
+				as_of=as_of,
 			)
 		)
 
@@ -120,6 +256,46 @@ class UpdateExchangeRateInteraction:
 		)
 
 
+class UpsertExchangeRatesInteraction:
+	"""Adds new exchange rates and updates existing ones at once, with outcome reported for every rate."""
+
+	def __init__(self, exchange_rates_repo: ExchangeRatesRepoInterface):
+		self._exchange_rates_repo = exchange_rates_repo
+
+	async def __call__(
+		self, exchange_rates: list[AddExchangeRateDto]
+	) -> list[UpsertedExchangeRateDto | errors.DataRequestError]:
+		valid_rates = [
+			rate
+			for rate in exchange_rates
+			if rate.base_currency != rate.target_currency
+		]
+		saved_rates = iter(
+			await self._exchange_rates_repo.upsert_rates(valid_rates)
+			if valid_rates
+			else []
+		)
+
+		results: list[UpsertedExchangeRateDto | errors.DataRequestError] = []
+		for rate in exchange_rates:
+			if rate.base_currency == rate.target_currency:
+				results.append(
+					errors.CurrencyToSameCurrencyExchangeRateError(
+						"Cant't add exchange rate to same currency"
+					)
+				)
+				continue
+			saved_rate = next(saved_rates)
+			results.append(
+				saved_rate
+				if isinstance(saved_rate, Exception)
+				else UpsertedExchangeRateDto(
+					ExchangeRateDto.from_dm(saved_rate[0]), saved_rate[1]
+				)
+			)
+		return results
+
+
 class DeleteExchangeRateInteraction:
 	def __init__(self, exchange_rates_repo: ExchangeRatesRepoInterface):
 		self._exchange_rates_repo = exchange_rates_repo
@@ -135,12 +311,21 @@ class ConvertCurrencyInteraction:
 		self,
 		exchange_rates_repo: ExchangeRatesRepoInterface,
 		currencies_repo: CurrencyRepoInterface,
+		*,
+		rates_chain_max_hops: int = DEFAULT_RATES_CHAIN_MAX_HOPS,
+		rate_resolver: Optional[ExchangeRateResolverInterface] = None,
 	):
 		self._exchange_rates_repo = exchange_rates_repo
 		self._currencies_repo = currencies_repo
+		self._rates_chain_max_hops = rates_chain_max_hops
+		self._rate_resolver = rate_resolver
 
 	async def __call__(
-		self, convertion_data: MakeConvertionDto, *, rate_fetch_strategy: ERFetchStrat
+		self,
+		convertion_data: MakeConvertionDto,
+		*,
+		rate_fetch_strategy: ERFetchStrat,
+		as_of: Optional[datetime] = None,
 	) -> ConvertedCurrenciesPairDto:
 		try:
 			rate = await _get_exchange_rate(
@@ -150,8 +335,14 @@ class ConvertCurrencyInteraction:
 				self._exchange_rates_repo,
 				self._currencies_repo,
 				rate_fetch_strategy=rate_fetch_strategy,
+				rates_chain_max_hops=self._rates_chain_max_hops,
+				rate_resolver=self._rate_resolver,
+				as_of=as_of,
 			)
-		except errors.ExchangeRateDoesntExistError as e:
+		except (
+			errors.ExchangeRateDoesntExistError,
+			errors.CurrencyDoesNotExistError,
+		) as e:
 			raise errors.CurrenciesConvertionError(
 				"Can't convert currencies as no exchange rate was found"
 			) from e
@@ -163,3 +354,131 @@ class ConvertCurrencyInteraction:
 			convertion_data.amount,
 			CurrencyAmount(rate.convert(convertion_data.amount)),
 		)
+
+
+class BatchConvertCurrencyInteraction:
+	"""
+	Converts many amounts at once. Exchange rate of every distinct currencies pair is fetched only once,
+	and amounts are converted in a single vectorized pass.
+	"""
+
+	def __init__(
+		self,
+		exchange_rates_repo: ExchangeRatesRepoInterface,
+		currencies_repo: CurrencyRepoInterface,
+		*,
+		rates_chain_max_hops: int = DEFAULT_RATES_CHAIN_MAX_HOPS,
+		rate_resolver: Optional[ExchangeRateResolverInterface] = None,
+	):
+		self._exchange_rates_repo = exchange_rates_repo
+		self._currencies_repo = currencies_repo
+		self._rates_chain_max_hops = rates_chain_max_hops
+		self._rate_resolver = rate_resolver
+
+	async def __call__(
+		self,
+		convertions_data: list[MakeConvertionDto],
+		*,
+		rate_fetch_strategy: ERFetchStrat,
+	) -> list[ConvertedCurrenciesPairDto | errors.CurrenciesConvertionError]:
+		pairs: dict[tuple[str, str], int] = {}
+		pairs_indices = np.array(
+			[
+				pairs.setdefault((c.from_currency.data, c.to_currency.data), len(pairs))
+				for c in convertions_data
+			],
+			dtype=np.intp,
+		)
+
+		rates: list[CurrenciesExchangeRate | errors.CurrenciesConvertionError] = []
+		for from_currency, to_currency in pairs:
+			try:
+				rates.append(
+					await _get_exchange_rate(
+						GetExchangeRateDto(
+							CurrencyCode(from_currency), CurrencyCode(to_currency)
+						),
+						self._exchange_rates_repo,
+						self._currencies_repo,
+						rate_fetch_strategy=rate_fetch_strategy,
+						rates_chain_max_hops=self._rates_chain_max_hops,
+						rate_resolver=self._rate_resolver,
+					)
+				)
+			except (
+				errors.ExchangeRateDoesntExistError,
+				errors.CurrencyDoesNotExistError,
+			) as e:
+				rates.append(
+					errors.CurrenciesConvertionError(
+						f"Can't convert {from_currency} to {to_currency} as no exchange "
+						f"rate was found: {e}"
+					)
+				)
+
+		# amounts are converted in fixed point, unfound rates are replaced by a placeholder
+		scaled_rates = np.array(
+			[
+				1 if isinstance(rate, Exception) else to_scaled_rate(rate.rate.value)
+				for rate in rates
+			],
+			dtype=np.int64,
+		)
+		base_minor_units, target_minor_units = (
+			np.array(
+				[
+					DEFAULT_MINOR_UNIT
+					if isinstance(rate, Exception)
+					else get_minor_unit(getattr(rate, side).code)
+					for rate in rates
+				],
+				dtype=np.int64,
+			)
+			for side in ("base", "target")
+		)
+		base_minor_units = base_minor_units[pairs_indices]
+		target_minor_units = target_minor_units[pairs_indices]
+		converted_minor = convert_minor_units_array(
+			to_minor_units_array(
+				np.array([float(c.amount.value) for c in convertions_data]),
+				base_minor_units,
+			),
+			scaled_rates[pairs_indices],
+			base_minor_units,
+			target_minor_units,
+		)
+		converted_amounts = [
+			from_minor_units(minor, minor_unit)
+			for minor, minor_unit in zip(
+				converted_minor.tolist(), target_minor_units.tolist()
+			)
+		]
+
+		currencies = [
+			(CurrencyDto.from_dm(rate.base), CurrencyDto.from_dm(rate.target))
+			if not isinstance(rate, Exception)
+			else None
+			for rate in rates
+		]
+		results: list[
+			ConvertedCurrenciesPairDto | errors.CurrenciesConvertionError
+		] = []
+		for convertion_data, pair_index, converted_amount in zip(
+			convertions_data, pairs_indices.tolist(), converted_amounts
+		):
+			rate = rates[pair_index]
+			if isinstance(rate, Exception):
+				results.append(rate)
+				continue
+			base_currency, target_currency = currencies[pair_index]
+			results.append(
+				ConvertedCurrenciesPairDto(
+					base_currency,
+					target_currency,
+					rate.rate,
+					convertion_data.amount,
+					CurrencyAmount(converted_amount),
+				)
+			)
+
+		return results
@@ -1,9 +1,13 @@
+from collections.abc import AsyncIterator
+from datetime import datetime
 from typing import Protocol
 
 from .extdm import (
 	IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate,
 	IdentifiedCurrency as Currency,
 )
+from .errors import DataRequestError
+from .interactions.erfetchstrategies import ExchangeRateFetchStrategy as ERFetchStrat
 from .dto import (
 	AddCurrencyDto,
 	AlterCurrencyDto,
@@ -13,12 +17,18 @@ from .dto import (
 	DeleteExchangeRateDto,
 	GetCurrencyDto,
 	GetExchangeRateDto,
+	CurrenciesQueryDto,
+	ExchangeRatesQueryDto,
 )
 
 
 class CurrencyRepoInterface(Protocol):
 	async def get_all_currencies(self) -> list[Currency]: ...
 
+	def stream_currencies(
+		self, query: CurrenciesQueryDto
+	) -> AsyncIterator[Currency]: ...
+
 	async def get_currency(self, currency_data: GetCurrencyDto) -> Currency: ...
 
 	async def save_currency(self, currency: AddCurrencyDto) -> Currency: ...
@@ -31,6 +41,10 @@ class CurrencyRepoInterface(Protocol):
 class ExchangeRatesRepoInterface(Protocol):
 	async def get_all_rates(self) -> list[CurrenciesExchangeRate]: ...
 
+	def stream_rates(
+		self, query: ExchangeRatesQueryDto
+	) -> AsyncIterator[CurrenciesExchangeRate]: ...
+
 	async def get_rate(self, rate: GetExchangeRateDto) -> CurrenciesExchangeRate: ...
 
 	async def save_rate(self, rate: AddExchangeRateDto) -> CurrenciesExchangeRate: ...
@@ -46,3 +60,30 @@ class ExchangeRatesRepoInterface(Protocol):
 	async def get_cross_rates(
 		self, rate: GetExchangeRateDto
 	) -> list[tuple[CurrenciesExchangeRate, CurrenciesExchangeRate]]: ...
+
+	async def get_rates_chain(
+		self, rate: GetExchangeRateDto, max_hops: int
+	) -> list[CurrenciesExchangeRate]: ...
+
+	async def get_rate_as_of(
+		self, rate: GetExchangeRateDto, as_of: datetime
+	) -> CurrenciesExchangeRate:
+		"""Fetches the rate as it was at the as_of moment."""
+
+	async def upsert_rates(
+		self, rates: list[AddExchangeRateDto]
+	) -> list[tuple[CurrenciesExchangeRate, bool] | DataRequestError]:
+		"""
+		Saves new rates and updates existing ones at once. Returns each saved rate along with a flag telling
+		whether it was created, or an error in place of a rate that couldn't be saved.
+		"""
+
+
+class ExchangeRateResolverInterface(Protocol):
+	async def resolve_rate(
+		self, rate: GetExchangeRateDto, *, rate_fetch_strategy: ERFetchStrat
+	) -> tuple[CurrenciesExchangeRate, ERFetchStrat]:
+		"""
+		Fetches the rate by the first of strategy's ways that gives a result, and returns it along with the
+		strategy it was fetched by.
+		"""
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import datetime
+
+from currency_exchange.db.session import engine
+from .infrastructure.db.ratehistory import create_month_partitions
+
+
+def create_rate_history_partitions():
+	parser = argparse.ArgumentParser(
+		prog="createratehistorypartitions", usage="%(prog)s [options]"
+	)
+	parser.add_argument(
+		"--months",
+		type=int,
+		default=3,
+		help="Number of months to create partitions for, starting with the current one",
+	)
+	args = parser.parse_args()
+
+	asyncio.run(_create_rate_history_partitions(args.months))
+
+
+async def _create_rate_history_partitions(months: int):
+	async with engine.begin() as connection:
+		failed = await create_month_partitions(
+			connection, datetime.date.today(), months
+		)
+	await engine.dispose()
+	if failed:
+		print(
+			f"Couldn't create partitions for {', '.join(failed)}, "
+			f"as their rows are in default partition already"
+		)
+	print(
+		f"Exchange rate history partitions for {months - len(failed)} months are ready"
+	)
@@ -2,7 +2,7 @@ from dataclasses import dataclass, field, InitVar
 from decimal import Decimal
 from typing import Optional
 
-from . import errors
+from . import errors, fixedpoint
 from .types import (
 	CurrencyCode,
 	CurrencySign,
@@ -39,7 +39,11 @@ class CurrenciesExchangeRate:
 		reversed = (
 			self._to_decimal_value(1 / self.rate.value, precision)
 			if as_decimal
-			else 1 / self.rate.value
+			else fixedpoint.from_scaled_rate(
+				fixedpoint.reverse_scaled_rate(
+					fixedpoint.to_scaled_rate(self.rate.value)
+				)
+			)
 		)
 		return self.__class__(
 			self.target,
@@ -64,13 +68,17 @@ class CurrenciesExchangeRate:
 			decimal_fmt_precision=precision or self.decimal_fmt_precision,
 		)
 
-	def convert(self, amount: CurrencyAmount) -> int | float:
-		value = (
-			self.rate.value
-			if isinstance(self.rate.value, (float, int))
-			else float(self.rate.value)
+	def convert(self, amount: CurrencyAmount) -> float:
+		"""Converts amount exactly in fixed point, rounding the result to the target currency minor unit."""
+		base_minor_unit = fixedpoint.get_minor_unit(self.base.code)
+		target_minor_unit = fixedpoint.get_minor_unit(self.target.code)
+		converted = fixedpoint.convert_minor_units(
+			fixedpoint.to_minor_units(amount.value, base_minor_unit),
+			fixedpoint.to_scaled_rate(self.rate.value),
+			base_minor_unit,
+			target_minor_unit,
 		)
-		return value * amount.value
+		return fixedpoint.from_minor_units(converted, target_minor_unit)
 
 	def get_cross_rate(
 		self, exchange_rate: "CurrenciesExchangeRate", precision: Optional[int] = None
@@ -95,7 +103,34 @@ class CurrenciesExchangeRate:
 			rate1_normalized.base,
 			rate2_normalized.base,
 			ExchangeRateValue(
-				float(rate1_normalized.rate.value) / float(rate2_normalized.rate.value)
+				fixedpoint.from_scaled_rate(
+					fixedpoint.divide_scaled_rates(
+						fixedpoint.to_scaled_rate(rate1_normalized.rate.value),
+						fixedpoint.to_scaled_rate(rate2_normalized.rate.value),
+					)
+				)
+			),
+			decimal_fmt_precision=precision or self.decimal_fmt_precision,
+		)
+
+	def get_chained_rate(
+		self, exchange_rate: "CurrenciesExchangeRate", precision: Optional[int] = None
+	) -> "CurrenciesExchangeRate":
+		if self.target.code != exchange_rate.base.code:
+			raise errors.ExchangeRatesChainComputationError(
+				f"Exchange rates {self}, {exchange_rate} cannot be chained"
+			)
+
+		return self.__class__(
+			self.base,
+			exchange_rate.target,
+			ExchangeRateValue(
+				fixedpoint.from_scaled_rate(
+					fixedpoint.multiply_scaled_rates(
+						fixedpoint.to_scaled_rate(self.rate.value),
+						fixedpoint.to_scaled_rate(exchange_rate.rate.value),
+					)
+				)
 			),
 			decimal_fmt_precision=precision or self.decimal_fmt_precision,
 		)
@@ -7,6 +7,9 @@ class IncorrectCurrencyCodeError(CurrencyCoreError): ...
 class CrossExchangeRateComputationError(CurrencyCoreError): ...
 
 
+class ExchangeRatesChainComputationError(CurrencyCoreError): ...
+
+
 class IncorrectExchangeRateValue(CurrencyCoreError): ...
 
 
@@ -0,0 +1,156 @@
+"""
+Fixed point arithmetic of exchange rates and currencies amounts.
+
+Rates are represented as integers, scaled by RATE_SCALE, and amounts as integers of currency minor units, like
+cents. Conversions are computed on integers exactly and rounded half to even once, so the results don't depend
+on order of float operations and are the same in every process.
+
+Scaled rates are stored in BIGINT columns, so rates, given or computed, range from 1 / RATE_SCALE to MAX_RATE.
+Rates out of the range, including ones rounded to zero, are rejected with IncorrectExchangeRateValue.
+"""
+
+from decimal import Decimal, ROUND_HALF_EVEN
+import math
+
+import numpy as np
+
+from . import errors
+
+RATE_SCALE_DIGITS = 9
+RATE_SCALE = 10**RATE_SCALE_DIGITS
+
+DEFAULT_MINOR_UNIT = 2
+# ISO 4217 currencies, which minor unit isn't a hundredth of the major one
+MINOR_UNITS = {
+	**dict.fromkeys(
+		"BIF CLP DJF GNF ISK JPY KMF KRW PYG RWF UGX UYI VND VUV XAF XOF XPF".split(), 0
+	),
+	**dict.fromkeys("BHD IQD JOD KWD LYD OMR TND".split(), 3),
+	**dict.fromkeys("CLF UYW".split(), 4),
+}
+
+_INT64_MAX = np.iinfo(np.int64).max
+MAX_RATE = _INT64_MAX // RATE_SCALE
+
+
+def get_minor_unit(code: str) -> int:
+	"""Number of decimal digits of the currency minor unit."""
+	return MINOR_UNITS.get(str(code), DEFAULT_MINOR_UNIT)
+
+
+def to_scaled_rate(value: int | float | Decimal) -> int:
+	if isinstance(value, Decimal):
+		return _check_scaled_rate(
+			int((value * RATE_SCALE).to_integral_value(ROUND_HALF_EVEN))
+		)
+	scaled = value * RATE_SCALE
+	if not math.isfinite(scaled):
+		raise errors.IncorrectExchangeRateValue(
+			f"Invalid value for exchange rate {value}"
+		)
+	# builtin round of float is half to even
+	return _check_scaled_rate(round(scaled))
+
+
+def _check_scaled_rate(scaled: int) -> int:
+	if not 0 < scaled <= _INT64_MAX:
+		raise errors.IncorrectExchangeRateValue(
+			f"Exchange rate is out of range from {1 / RATE_SCALE} to {MAX_RATE}"
+		)
+	return scaled
+
+
+def from_scaled_rate(scaled: int) -> float:
+	# true division of integers is correctly rounded
+	return scaled / RATE_SCALE
+
+
+def quantize_rate(value: int | float | Decimal) -> float:
+	"""Rounds the rate value to the digits, representable by a scaled rate."""
+	return from_scaled_rate(to_scaled_rate(value))
+
+
+def to_minor_units(amount: int | float | Decimal, minor_unit: int) -> int:
+	if isinstance(amount, Decimal):
+		return int(amount.scaleb(minor_unit).to_integral_value(ROUND_HALF_EVEN))
+	minor = amount * 10**minor_unit
+	if not math.isfinite(minor):
+		raise errors.IncorrectCurrencyAmount(f"Invalid currency amount: {amount}")
+	return round(minor)
+
+
+def to_minor_units_array(amounts: np.ndarray, minor_units: np.ndarray) -> np.ndarray:
+	"""Vectorized to_minor_units of float amounts, giving the same results."""
+	minor = np.rint(amounts * 10.0**minor_units)
+	if not np.isfinite(minor).all():
+		raise errors.IncorrectCurrencyAmount("Invalid currency amount")
+	if len(minor) and np.abs(minor).max() >= 2**63:
+		return np.array([int(value) for value in minor.tolist()], dtype=object)
+	return minor.astype(np.int64)
+
+
+def from_minor_units(minor: int, minor_unit: int) -> float:
+	return minor / 10**minor_unit
+
+
+def div_round_half_even(dividend: int, divisor: int) -> int:
+	quotient, remainder = divmod(dividend, divisor)
+	twice = 2 * remainder
+	if twice > divisor or (twice == divisor and quotient % 2):
+		quotient += 1
+	return quotient
+
+
+def reverse_scaled_rate(scaled: int) -> int:
+	return divide_scaled_rates(RATE_SCALE, scaled)
+
+
+def divide_scaled_rates(dividend: int, divisor: int) -> int:
+	if divisor <= 0:
+		raise errors.IncorrectExchangeRateValue(
+			"Exchange rate can't be divided by non positive one"
+		)
+	return _check_scaled_rate(div_round_half_even(dividend * RATE_SCALE, divisor))
+
+
+def multiply_scaled_rates(scaled1: int, scaled2: int) -> int:
+	return _check_scaled_rate(div_round_half_even(scaled1 * scaled2, RATE_SCALE))
+
+
+def convert_minor_units(
+	minor: int, scaled_rate: int, base_minor_unit: int, target_minor_unit: int
+) -> int:
+	"""Converts amount of base currency minor units to the target currency ones."""
+	shift = target_minor_unit - base_minor_unit
+	return div_round_half_even(
+		minor * scaled_rate * 10 ** max(shift, 0), RATE_SCALE * 10 ** max(-shift, 0)
+	)
+
+
+def convert_minor_units_array(
+	minor: np.ndarray,
+	scaled_rates: np.ndarray,
+	base_minor_units: np.ndarray,
+	target_minor_units: np.ndarray,
+) -> np.ndarray:
+	"""
+	Vectorized convert_minor_units, giving the same results. Integers are computed in int64, when products
+	can't overflow it, otherwise as Python integers.
+	"""
+	shifts = target_minor_units.astype(np.int64) - base_minor_units
+	multipliers = 10 ** np.maximum(shifts, 0)
+	divisors = RATE_SCALE * 10 ** np.maximum(-shifts, 0)
+	if len(minor) and (
+		int(np.abs(minor).max()) * int(scaled_rates.max()) * int(multipliers.max())
+		> _INT64_MAX
+	):
+		minor, scaled_rates, multipliers, divisors = (
+			array.astype(object)
+			for array in (minor, scaled_rates, multipliers, divisors)
+		)
+	dividends = minor * scaled_rates * multipliers
+	# divmod has no loop for object arrays
+	quotients, remainders = dividends // divisors, dividends % divisors
+	twice = 2 * remainders
+	round_up = (twice > divisors) | ((twice == divisors) & (quotients % 2 == 1))
+	return quotients + round_up.astype(np.int64)
@@ -1,12 +1,32 @@
 from collections import UserString
 from decimal import Decimal
-from typing import Any
+from functools import lru_cache
+from typing import Any, Self
 from string import ascii_letters
 
 from . import errors
 
+# values are limited by the number of currencies, so all of them are normally interned
+INTERNED_MAX_SIZE = 4096
 
-class CurrencyCode(UserString):
+
+class InternedString(UserString):
+	"""
+	String value, which could be shared by instances of entities. Interned instances are validated once and
+	taken from the registry afterwards, so values, mapped from storage for every row, take no extra memory.
+	"""
+
+	@classmethod
+	def interned(cls, value: str) -> Self:
+		return _intern(cls, value)
+
+
+@lru_cache(maxsize=INTERNED_MAX_SIZE)
+def _intern(cls: type[InternedString], value: str) -> InternedString:
+	return cls(value)
+
+
+class CurrencyCode(InternedString):
 	def __init__(self, code: str, *args: Any, **kwargs: Any) -> None:
 		if (
 			not code.isalpha()
@@ -19,7 +39,7 @@ class CurrencyCode(UserString):
 		super().__init__(code.upper(), *args, **kwargs)
 
 
-class CurrencyName(UserString):
+class CurrencyName(InternedString):
 	def __init__(self, name: str, *args: Any, **kwargs: Any) -> None:
 		if len(name) == 0:
 			raise errors.IncorrectCurrencyName("Currency name cannot be blank")
@@ -30,7 +50,7 @@ class CurrencyName(UserString):
 		super().__init__(name, *args, **kwargs)
 
 
-class CurrencySign(UserString):
+class CurrencySign(InternedString):
 	def __init__(self, sign: str, *args: Any, **kwargs: Any) -> None:
 		if len(sign) == 0:
 			raise errors.IncorrectCurrencySign("Currency sign cannot be blank")
@@ -38,6 +58,8 @@ class CurrencySign(UserString):
 
 
 class ExchangeRateValue:
+	__slots__ = ("value",)
+
 	def __init__(self, value: int | float | Decimal):
 		if not value > 0 or value in [float("inf"), float("-inf")]:
 			raise errors.IncorrectExchangeRateValue(
@@ -47,6 +69,8 @@ class ExchangeRateValue:
 
 
 class CurrencyAmount:
+	__slots__ = ("value",)
+
 	def __init__(self, value: int | float):
 		if not value > 0 or value in [float("inf"), float("-inf")]:
 			raise errors.IncorrectCurrencyAmount(f"Invalid currency amount: {value}")
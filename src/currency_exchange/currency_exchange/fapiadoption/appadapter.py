@@ -1,6 +1,18 @@
+import asyncio
+from collections.abc import AsyncIterator, Coroutine
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from currency_exchange.config import (
+	CurrencyExchangeSettings,
+	currency_exchange_settings,
+)
+from currency_exchange.db.changes import ChangesListener, get_versions
 from currency_exchange.db.session import async_session_factory
+from currency_exchange.utils.streaming import ItemSerializer
 from ..application.dto import (
 	GetCurrencyDto,
 	CurrencyDto,
@@ -14,9 +26,13 @@ from ..application.dto import (
 	DeleteExchangeRateDto,
 	ConvertedCurrenciesPairDto,
 	MakeConvertionDto,
+	UpsertedExchangeRateDto,
+	CurrenciesQueryDto,
+	ExchangeRatesQueryDto,
 )
 from ..application.interactions.currenciesinteractions import (
 	GetAllCurrenciesInteraction,
+	StreamCurrenciesInteraction,
 	GetCurrencyInteraction,
 	AddCurrencyInteraction,
 	UpdateCurrencyInteraction,
@@ -24,11 +40,14 @@ from ..application.interactions.currenciesinteractions import (
 )
 from ..application.interactions.exchangeratesinteracions import (
 	GetAllExchangeRatesInteraction,
+	StreamExchangeRatesInteraction,
 	GetExchangeRateInteraction,
 	AddExchangeRateInteraction,
 	UpdateExchangeRateInteraction,
+	UpsertExchangeRatesInteraction,
 	DeleteExchangeRateInteraction,
 	ConvertCurrencyInteraction,
+	BatchConvertCurrencyInteraction,
 )
 from ..application.interactions.erfetchstrategies import (
 	ExchangeRateFetchStrategy as ERFetchStrat,
@@ -40,18 +59,103 @@ from ..domain.types import (
 	ExchangeRateValue,
 	CurrencyAmount,
 )
-from ..infrastructure.db.repos import CurrencyPostgresRepo, ExchangeRatesPostgresRepo
-from .schemas import AddCurrencySchema, UpdateCurrencySchema, AddExchangeRateSchema
+from currency_exchange.utils.boundedcache import BoundedCache, CacheStats
+from ..infrastructure.cache.repos import (
+	CachingCurrencyRepo,
+	CachingExchangeRatesRepo,
+	invalidate_currencies,
+	invalidate_exchange_rates,
+)
+from ..infrastructure.dataversion import DataVersion
+from ..infrastructure.db.currenciesindex import CurrenciesIndex
+from ..infrastructure.db.repos import (
+	CurrencyPostgresRepo,
+	ExchangeRatesPostgresRepo,
+	CURRENCIES_CHANGES_TOPIC,
+	EXCHANGE_RATES_CHANGES_TOPIC,
+)
+from ..infrastructure.db.rawrepos import CurrencyAsyncpgRepo, ExchangeRatesAsyncpgRepo
+from ..infrastructure.memory.repos import (
+	ExchangeRatesGraphStore,
+	InMemoryCurrencyRepo,
+	InMemoryExchangeRatesRepo,
+)
+from ..application import errors
+from .schemas import (
+	AddCurrencySchema,
+	UpdateCurrencySchema,
+	AddExchangeRateSchema,
+	CurrencyConvertionDataSchema,
+)
+from .responsecache import ResponseCache
+from .serializers import DTO_SERIALIZERS
 
 
 class CurrencyExchangeFastAPIAdapter:
-	def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
-		self._currencies_repo = CurrencyPostgresRepo(session_factory)
-		self._exchange_rates_repo = ExchangeRatesPostgresRepo(session_factory)
+	def __init__(
+		self,
+		session_factory: async_sessionmaker[AsyncSession],
+		settings: CurrencyExchangeSettings = currency_exchange_settings,
+	) -> None:
+		self._session_factory = session_factory
+		self._currencies_index = CurrenciesIndex()
+		self._data_version = DataVersion()
+		self._changes_listener: Optional[ChangesListener] = None
+		self._refresh_tasks: set[asyncio.Task] = set()
+		currencies_repo_class, exchange_rates_repo_class = {
+			"orm": (CurrencyPostgresRepo, ExchangeRatesPostgresRepo),
+			"asyncpg": (CurrencyAsyncpgRepo, ExchangeRatesAsyncpgRepo),
+		}[settings.DB_REPOS]
+		self._currencies_postgres_repo = currencies_repo_class(
+			session_factory, self._currencies_index, self._data_version
+		)
+		self._currencies_repo = self._currencies_postgres_repo
+		self._exchange_rates_repo = exchange_rates_repo_class(
+			session_factory, self._currencies_index, self._data_version
+		)
+		self._rates_graph_store = None
+		if settings.IN_MEMORY_RATES:
+			self._rates_graph_store = ExchangeRatesGraphStore(
+				self._currencies_repo, self._exchange_rates_repo
+			)
+			self._currencies_repo = InMemoryCurrencyRepo(self._rates_graph_store)
+			self._exchange_rates_repo = InMemoryExchangeRatesRepo(
+				self._rates_graph_store
+			)
+		self._cache = None
+		if settings.CACHE_SIZE:
+			self._cache = BoundedCache(settings.CACHE_SIZE, settings.CACHE_POLICY)
+			self._currencies_repo = CachingCurrencyRepo(
+				self._currencies_repo, self._cache
+			)
+			self._exchange_rates_repo = CachingExchangeRatesRepo(
+				self._exchange_rates_repo, self._cache
+			)
+		self._response_cache = None
+		if settings.RESPONSE_CACHE_SIZE:
+			self._response_cache = ResponseCache(
+				settings.RESPONSE_CACHE_SIZE,
+				settings.RESPONSE_CACHE_MAX_BODY_SIZE,
+				self._data_version,
+			)
+		self._fast_serialization = settings.FAST_SERIALIZATION
+		# all repositories fetch a rate by any strategy at once
+		self._rate_resolver = self._exchange_rates_repo
+
+		self._convertion_strategy = (
+			ERFetchStrat.BY_STRAIGHT_RATE
+			| ERFetchStrat.BY_REVERSED_RATE
+			| ERFetchStrat.BY_COMMON_CURRENCY
+		)
+		if settings.CONVERT_BY_RATES_CHAIN:
+			self._convertion_strategy |= ERFetchStrat.BY_RATES_CHAIN
 		self._app_layer_interactions = {
 			GetAllCurrenciesInteraction: GetAllCurrenciesInteraction(
 				self._currencies_repo
 			),
+			StreamCurrenciesInteraction: StreamCurrenciesInteraction(
+				self._currencies_repo
+			),
 			GetCurrencyInteraction: GetCurrencyInteraction(self._currencies_repo),
 			AddCurrencyInteraction: AddCurrencyInteraction(self._currencies_repo),
 			UpdateCurrencyInteraction: UpdateCurrencyInteraction(self._currencies_repo),
@@ -59,8 +163,14 @@ class CurrencyExchangeFastAPIAdapter:
 			GetAllExchangeRatesInteraction: GetAllExchangeRatesInteraction(
 				self._exchange_rates_repo
 			),
+			StreamExchangeRatesInteraction: StreamExchangeRatesInteraction(
+				self._exchange_rates_repo
+			),
 			GetExchangeRateInteraction: GetExchangeRateInteraction(
-				self._exchange_rates_repo, self._currencies_repo
+				self._exchange_rates_repo,
+				self._currencies_repo,
+				rates_chain_max_hops=settings.RATES_CHAIN_MAX_HOPS,
+				rate_resolver=self._rate_resolver,
 			),
 			AddExchangeRateInteraction: AddExchangeRateInteraction(
 				self._exchange_rates_repo
@@ -68,20 +178,127 @@ class CurrencyExchangeFastAPIAdapter:
 			UpdateExchangeRateInteraction: UpdateExchangeRateInteraction(
 				self._exchange_rates_repo
 			),
+			UpsertExchangeRatesInteraction: UpsertExchangeRatesInteraction(
+				self._exchange_rates_repo
+			),
 			DeleteExchangeRateInteraction: DeleteExchangeRateInteraction(
 				self._exchange_rates_repo
 			),
 			ConvertCurrencyInteraction: ConvertCurrencyInteraction(
-				self._exchange_rates_repo, self._currencies_repo
+				self._exchange_rates_repo,
+				self._currencies_repo,
+				rates_chain_max_hops=settings.RATES_CHAIN_MAX_HOPS,
+				rate_resolver=self._rate_resolver,
+			),
+			BatchConvertCurrencyInteraction: BatchConvertCurrencyInteraction(
+				self._exchange_rates_repo,
+				self._currencies_repo,
+				rates_chain_max_hops=settings.RATES_CHAIN_MAX_HOPS,
+				rate_resolver=self._rate_resolver,
 			),
 		}
 
 	def get_interaction(self, interaction):
 		return self._app_layer_interactions[interaction]
 
+	async def startup(self) -> None:
+		# fills currencies index, so exchange rates writes don't need to look currencies ids up
+		await self._currencies_postgres_repo.get_all_currencies()
+		# data version is the same as of other processes from the start
+		async with self._session_factory() as session:
+			for version in await get_versions(
+				session, (CURRENCIES_CHANGES_TOPIC, EXCHANGE_RATES_CHANGES_TOPIC)
+			):
+				self._data_version.update(version)
+
+	def subscribe_to_changes(self, changes_listener: ChangesListener) -> None:
+		"""Keeps data, held in process memory, coherent with changes made by other processes."""
+		self._changes_listener = changes_listener
+		changes_listener.subscribe(
+			CURRENCIES_CHANGES_TOPIC, self._handle_currencies_changes
+		)
+		changes_listener.subscribe(
+			EXCHANGE_RATES_CHANGES_TOPIC, self._handle_exchange_rates_changes
+		)
+
+	def _handle_currencies_changes(self, codes: Optional[list[str]]) -> None:
+		self._data_version.update(
+			self._changes_listener.get_version(CURRENCIES_CHANGES_TOPIC)
+		)
+		if codes is None:
+			self._currencies_index.reset(())
+		else:
+			for code in codes:
+				self._currencies_index.remove(code)
+		if self._rates_graph_store is not None:
+			if codes is None:
+				self._rates_graph_store.invalidate()
+			else:
+				self._refresh_rates_graph(
+					self._rates_graph_store.refresh_currencies(codes)
+				)
+		if self._cache is not None:
+			invalidate_currencies(self._cache, codes)
+
+	def _handle_exchange_rates_changes(self, code_pairs: Optional[list[str]]) -> None:
+		self._data_version.update(
+			self._changes_listener.get_version(EXCHANGE_RATES_CHANGES_TOPIC)
+		)
+		if self._rates_graph_store is not None:
+			if code_pairs is None:
+				self._rates_graph_store.invalidate()
+			else:
+				self._refresh_rates_graph(
+					self._rates_graph_store.refresh_rates(
+						[(pair[:3], pair[3:]) for pair in code_pairs]
+					)
+				)
+		if self._cache is not None:
+			invalidate_exchange_rates(self._cache, code_pairs)
+
+	def _refresh_rates_graph(self, refresh: Coroutine) -> None:
+		# changed data is fetched in background, as notifications are handled synchronously
+		task = asyncio.create_task(refresh)
+		self._refresh_tasks.add(task)
+		task.add_done_callback(self._refresh_tasks.discard)
+
+	def get_data_version(self) -> DataVersion:
+		return self._data_version
+
+	def get_cache_stats(self) -> Optional[CacheStats]:
+		return self._cache.get_stats() if self._cache is not None else None
+
+	def get_fast_serializer(self, schema: type[BaseModel]) -> Optional[ItemSerializer]:
+		"""Returns serializer of the schema DTOs, which skips their validation, if fast serialization is on."""
+		return DTO_SERIALIZERS.get(schema) if self._fast_serialization else None
+
+	def get_response_cache(self) -> Optional[ResponseCache]:
+		return self._response_cache
+
+	def get_response_cache_stats(self) -> Optional[CacheStats]:
+		return (
+			self._response_cache.get_stats()
+			if self._response_cache is not None
+			else None
+		)
+
 	async def get_all_currencies(self) -> list[CurrencyDto]:
 		return await self.get_interaction(GetAllCurrenciesInteraction)()
 
+	def stream_currencies(
+		self,
+		codes: Optional[list[str]] = None,
+		after_code: Optional[str] = None,
+		limit: Optional[int] = None,
+	) -> AsyncIterator[CurrencyDto]:
+		return self.get_interaction(StreamCurrenciesInteraction)(
+			CurrenciesQueryDto(
+				[CurrencyCode(code) for code in codes] if codes is not None else None,
+				CurrencyCode(after_code) if after_code is not None else None,
+				limit,
+			)
+		)
+
 	async def get_currency(self, code: str) -> CurrencyDto:
 		return await self.get_interaction(GetCurrencyInteraction)(
 			GetCurrencyDto(code=CurrencyCode(code))
@@ -114,14 +331,38 @@ class CurrencyExchangeFastAPIAdapter:
 	async def get_all_exchange_rates(self) -> list[ExchangeRateDto]:
 		return await self.get_interaction(GetAllExchangeRatesInteraction)()
 
+	def stream_exchange_rates(
+		self,
+		base_currency_code: Optional[str] = None,
+		target_currency_code: Optional[str] = None,
+		after_id: Optional[int] = None,
+		limit: Optional[int] = None,
+	) -> AsyncIterator[ExchangeRateDto]:
+		return self.get_interaction(StreamExchangeRatesInteraction)(
+			ExchangeRatesQueryDto(
+				CurrencyCode(base_currency_code)
+				if base_currency_code is not None
+				else None,
+				CurrencyCode(target_currency_code)
+				if target_currency_code is not None
+				else None,
+				after_id,
+				limit,
+			)
+		)
+
 	async def get_exchange_rate(
-		self, base_currency_code: str, target_currency_code: str
+		self,
+		base_currency_code: str,
+		target_currency_code: str,
+		as_of: Optional[datetime] = None,
 	) -> ExchangeRateDto:
 		return await self.get_interaction(GetExchangeRateInteraction)(
 			GetExchangeRateDto(
 				CurrencyCode(base_currency_code), CurrencyCode(target_currency_code)
 			),
 			rate_fetch_strategy=ERFetchStrat.BY_REVERSED_RATE,
+			as_of=as_of,
 		)
 
 	async def add_exchange_rate(self, er_data: AddExchangeRateSchema):
@@ -144,6 +385,20 @@ class CurrencyExchangeFastAPIAdapter:
 			)
 		)
 
+	async def upsert_exchange_rates(
+		self, er_data: list[AddExchangeRateSchema]
+	) -> list[UpsertedExchangeRateDto | errors.DataRequestError]:
+		return await self.get_interaction(UpsertExchangeRatesInteraction)(
+			[
+				AddExchangeRateDto(
+					CurrencyCode(rate_data.baseCurrencyCode),
+					CurrencyCode(rate_data.targetCurrencyCode),
+					ExchangeRateValue(rate_data.rate),
+				)
+				for rate_data in er_data
+			]
+		)
+
 	async def delete_exchange_rate(
 		self, base_currency_code: str, target_currency_code: str
 	) -> ExchangeRateDto:
@@ -154,21 +409,38 @@ class CurrencyExchangeFastAPIAdapter:
 		)
 
 	async def convert_currency(
-		self, base_currency_code: str, target_currency_code: str, amount: float
+		self,
+		base_currency_code: str,
+		target_currency_code: str,
+		amount: float,
+		as_of: Optional[datetime] = None,
 	) -> ConvertedCurrenciesPairDto:
-		strat = (
-			ERFetchStrat.BY_STRAIGHT_RATE
-			| ERFetchStrat.BY_REVERSED_RATE
-			| ERFetchStrat.BY_COMMON_CURRENCY
-		)
 		return await self.get_interaction(ConvertCurrencyInteraction)(
 			MakeConvertionDto(
 				CurrencyCode(base_currency_code),
 				CurrencyCode(target_currency_code),
 				CurrencyAmount(amount),
 			),
-			rate_fetch_strategy=strat,
+			rate_fetch_strategy=self._convertion_strategy,
+			as_of=as_of,
+		)
+
+	async def convert_currency_batch(
+		self, convertions_data: list[CurrencyConvertionDataSchema]
+	) -> list[ConvertedCurrenciesPairDto | errors.CurrenciesConvertionError]:
+		return await self.get_interaction(BatchConvertCurrencyInteraction)(
+			[
+				MakeConvertionDto(
+					CurrencyCode(convertion_data.from_),
+					CurrencyCode(convertion_data.to),
+					CurrencyAmount(convertion_data.amount),
+				)
+				for convertion_data in convertions_data
+			],
+			rate_fetch_strategy=self._convertion_strategy,
 		)
 
 
-currency_exchange_app = CurrencyExchangeFastAPIAdapter(async_session_factory)
+currency_exchange_app = CurrencyExchangeFastAPIAdapter(
+	async_session_factory, currency_exchange_settings
+)
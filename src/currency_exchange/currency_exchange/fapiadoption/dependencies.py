@@ -1,9 +1,70 @@
-from typing import Annotated
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated, Optional
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Request, Response, status
 
-from currency_exchange.auth import get_user_from_bearer_token
-from currency_exchange.auth.schemas import UserDbOut
+from currency_exchange.auth import get_lazy_user_from_bearer_token
+from currency_exchange.auth.utils import LazyUser
+from .appadapter import currency_exchange_app
 
 
-user_dependency = Annotated[UserDbOut, Depends(get_user_from_bearer_token)]
+# routes use username of the user only, which is taken from the token without a db query
+user_dependency = Annotated[LazyUser, Depends(get_lazy_user_from_bearer_token)]
+
+
+def check_data_version(request: Request, response: Response) -> dict[str, str]:
+	"""
+	Answers with 304 Not Modified, if the client has data of the current version already, before anything is
+	fetched. Otherwise returns validators of the data, which is about to be fetched, and sets them to the response.
+	Validators are the same for all processes, which have seen the same changes.
+	"""
+	data_version = currency_exchange_app.get_data_version()
+	headers = {"ETag": data_version.etag}
+	changed_at = data_version.changed_at
+	if changed_at is not None:
+		headers["Last-Modified"] = format_datetime(changed_at, usegmt=True)
+	if_none_match = request.headers.get("if-none-match")
+	if if_none_match is not None:
+		# tags are compared weakly, as they're weak
+		tag = data_version.etag.removeprefix("W/")
+		not_modified = any(
+			etag.strip().removeprefix("W/") in (tag, "*")
+			for etag in if_none_match.split(",")
+		)
+	else:
+		# If-Modified-Since is ignored along with If-None-Match, as the latter is more accurate
+		not_modified = _is_not_modified_since(
+			changed_at, request.headers.get("if-modified-since")
+		)
+	if not_modified:
+		raise HTTPException(status.HTTP_304_NOT_MODIFIED, headers=headers)
+	response.headers.update(headers)
+	return headers
+
+
+def _is_not_modified_since(
+	changed_at: Optional[datetime], if_modified_since: Optional[str]
+) -> bool:
+	if changed_at is None or if_modified_since is None:
+		return False
+	try:
+		since = parsedate_to_datetime(if_modified_since)
+	except (TypeError, ValueError):
+		# invalid date is ignored
+		return False
+	if since.tzinfo is None:
+		# date isn't in GMT, as required
+		return False
+	# HTTP dates have one second resolution
+	return changed_at.replace(microsecond=0) <= since
+
+
+NOT_MODIFIED_RESPONSES = {
+	304: {
+		"description": "Data didn't change since the version given in If-None-Match, "
+		"or since the time given in If-Modified-Since"
+	}
+}
+
+data_version_dependency = Annotated[dict[str, str], Depends(check_data_version)]
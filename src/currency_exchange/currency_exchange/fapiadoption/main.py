@@ -1,28 +1,78 @@
-from fastapi import FastAPI, Request, HTTPException, status
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request, HTTPException, status
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 from fastapi.routing import APIRoute
+from fastapi.utils import is_body_allowed_for_status_code
 
 from .routes.currencies import currencies_router
 from .routes.exchangerates import exchange_rates_router
 from .routes.currenciesconvertion import currencies_convertion_router
+from .routes.stats import stats_router
+from .appadapter import currency_exchange_app
+from currency_exchange.auth.revocation import revocation_index
+from currency_exchange.config import (
+	auth_settings,
+	currency_exchange_settings,
+	db_conn_settings,
+)
+from currency_exchange.db.changes import ChangesListener
+from currency_exchange.db.session import engine
+from currency_exchange.db.unitofwork import request_unit_of_work
+
+logger = logging.getLogger("currency_exchange")
 
 
 def custom_generate_unique_id(route: APIRoute):
 	return f"{route.tags[0]}-{route.name}"
 
 
-app = FastAPI(generate_unique_id_function=custom_generate_unique_id)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	try:
+		await currency_exchange_app.startup()
+	except Exception:
+		# application works without preloaded data, just slower
+		logger.warning("Failed to preload currency exchange data", exc_info=True)
+	changes_listener = ChangesListener(
+		engine, currency_exchange_settings.CHANGES_POLL_INTERVAL
+	)
+	currency_exchange_app.subscribe_to_changes(changes_listener)
+	if auth_settings.REVOCATION_INDEX:
+		try:
+			await revocation_index.load()
+		except Exception:
+			# tokens are looked up in db on their first check instead
+			logger.warning("Failed to preload tokens revocation states", exc_info=True)
+		revocation_index.subscribe_to_changes(changes_listener)
+	changes_listener.start()
+	yield
+	await changes_listener.stop()
+
+
+app = FastAPI(
+	generate_unique_id_function=custom_generate_unique_id,
+	lifespan=lifespan,
+	dependencies=[Depends(request_unit_of_work)]
+	if db_conn_settings.REQUEST_UNIT_OF_WORK
+	else None,
+)
 app.include_router(currencies_router, tags=["Currency exchange"])
 app.include_router(exchange_rates_router, tags=["Currency exchange"])
 app.include_router(currencies_convertion_router, tags=["Currency exchange"])
+app.include_router(stats_router, tags=["Stats"])
 
 
 @app.exception_handler(HTTPException)
 async def app_http_exception_handler(
 	request: Request, exc: HTTPException
-) -> JSONResponse:
+) -> Response:
+	if not is_body_allowed_for_status_code(exc.status_code):
+		# e.g. 304 Not Modified, which carries only validators of the data
+		return Response(status_code=exc.status_code, headers=exc.headers)
 	return JSONResponse(status_code=exc.status_code, content={"message": exc.detail})
 
 
@@ -0,0 +1,189 @@
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Optional
+import gzip
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+from currency_exchange.utils.streaming import NDJSON_MEDIA_TYPE
+from currency_exchange.utils.boundedcache import BoundedCache, CacheStats
+from ..infrastructure.dataversion import DataVersion
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+# bodies are compressed on the event loop, when they're requested first after a write, so the levels are
+# moderate ones, which are several times faster than the best ones at a slightly worse compression
+COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {}
+if brotli is not None:
+	COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=5)
+COMPRESSORS["gzip"] = lambda body: gzip.compress(body, compresslevel=6, mtime=0)
+
+# smaller bodies aren't worth compressing
+COMPRESS_MIN_SIZE = 500
+
+# headers are recomputed, when a response is built from cached body
+_UNCACHED_HEADERS = ("content-length", "content-encoding")
+
+
+@dataclass(slots=True)
+class SerializedBody:
+	headers: dict[str, str]
+	# body encoded by content codings, identity one is always present
+	encodings: dict[str, bytes] = field(default_factory=dict)
+
+
+def choose_encoding(accept_encoding: str) -> str:
+	"""
+	Chooses the supported content coding of the highest quality by the Accept-Encoding header value. Compressed
+	codings are preferred over identity one of the same quality, and identity one, unless it's given a quality
+	explicitly, is chosen only, when no compressed one is acceptable.
+	"""
+	accepted = {}
+	for item in accept_encoding.split(","):
+		coding, *params = item.split(";")
+		quality = 1.0
+		for param in params:
+			name, _, value = param.strip().partition("=")
+			if name == "q":
+				try:
+					quality = float(value)
+				except ValueError:
+					quality = 0.0
+		accepted[coding.strip().lower()] = quality
+	chosen = "identity"
+	chosen_quality = accepted.get("identity", accepted.get("*", 0.0))
+	# of codings of the same quality, the one earlier in COMPRESSORS is chosen
+	for encoding in reversed(COMPRESSORS):
+		quality = accepted.get(encoding, accepted.get("*", 0.0))
+		if quality > 0 and quality >= chosen_quality:
+			chosen, chosen_quality = encoding, quality
+	return chosen
+
+
+def get_request_key(request: Request) -> Hashable:
+	# representation depends on path, query and media type only, the same for every client, but pagination links
+	# are absolute ones, so they depend on scheme and host the request was sent to as well
+	return (
+		request.url.scheme,
+		request.url.netloc,
+		request.url.path,
+		tuple(sorted(request.query_params.multi_items())),
+		NDJSON_MEDIA_TYPE in request.headers.get("accept", ""),
+	)
+
+
+class ResponseCache:
+	"""
+	Cache of serialized response bodies, ready to be sent, along with their compressed variants. Bodies are
+	cached for the current data version only, so any write to the data invalidates them all.
+
+	Streamed bodies are collected, while being sent, and cached, if they aren't larger than max_body_size.
+	"""
+
+	def __init__(
+		self,
+		max_size: int,
+		max_body_size: int,
+		data_version: DataVersion,
+	) -> None:
+		self._cache = BoundedCache(max_size)
+		self._max_body_size = max_body_size
+		self._data_version = data_version
+		self._version = data_version.value
+
+	def get(self, key: Hashable, encoding: str = "identity") -> Optional[Response]:
+		self._check_version()
+		body = self._cache.get(key, None)
+		if body is None:
+			return None
+		if encoding not in body.encodings:
+			identity = body.encodings["identity"]
+			body.encodings[encoding] = (
+				COMPRESSORS[encoding](identity)
+				if len(identity) >= COMPRESS_MIN_SIZE
+				else identity
+			)
+		content = body.encodings[encoding]
+		headers = dict(body.headers)
+		if content is not body.encodings["identity"]:
+			headers["Content-Encoding"] = encoding
+		return Response(content, headers=headers)
+
+	@property
+	def version(self) -> int:
+		return self._data_version.value
+
+	def store(self, key: Hashable, response: Response, version: int) -> Response:
+		"""
+		Caches the response body, or the streamed one once it's sent completely. Version is the one of data,
+		the response was made of, the body isn't cached, if data was changed since.
+		"""
+		self._check_version()
+		response.headers["Vary"] = "Accept, Accept-Encoding"
+		headers = {
+			name: value
+			for name, value in response.headers.items()
+			if name not in _UNCACHED_HEADERS
+		}
+		if isinstance(response, StreamingResponse):
+			response.body_iterator = self._collect(
+				key, headers, version, response.body_iterator
+			)
+		elif version == self._version and len(response.body) <= self._max_body_size:
+			self._cache.set(key, SerializedBody(headers, {"identity": response.body}))
+		return response
+
+	def get_stats(self) -> CacheStats:
+		return self._cache.get_stats()
+
+	def _check_version(self) -> None:
+		if self._version != self._data_version.value:
+			self._cache.clear()
+			self._version = self._data_version.value
+
+	async def _collect(
+		self,
+		key: Hashable,
+		headers: dict[str, str],
+		version: int,
+		body_iterator: AsyncIterator[bytes],
+	) -> AsyncIterator[bytes]:
+		chunks: Optional[list[bytes]] = []
+		size = 0
+		async for chunk in body_iterator:
+			yield chunk
+			if chunks is not None:
+				size += len(chunk)
+				if size > self._max_body_size:
+					# too large body is sent without being cached
+					chunks = None
+				else:
+					chunks.append(chunk)
+		self._check_version()
+		# body fetched before a write mustn't be cached for the new version
+		if chunks is not None and version == self._version:
+			self._cache.set(
+				key, SerializedBody(headers, {"identity": b"".join(chunks)})
+			)
+
+
+async def cached_response(
+	response_cache: Optional[ResponseCache],
+	request: Request,
+	make_response: Callable[[], Awaitable[Response]],
+) -> Response:
+	"""Sends cached body of the request's response, if there is one, otherwise makes the response and caches it."""
+	if response_cache is None:
+		return await make_response()
+	key = get_request_key(request)
+	response = response_cache.get(
+		key, choose_encoding(request.headers.get("accept-encoding", ""))
+	)
+	if response is None:
+		version = response_cache.version
+		response = response_cache.store(key, await make_response(), version)
+	return response
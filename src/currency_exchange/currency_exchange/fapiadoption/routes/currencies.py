@@ -1,9 +1,25 @@
-from typing import Annotated
+from typing import Annotated, Optional
 import logging
 
-from fastapi import APIRouter, Security, status, HTTPException, Form, Path
+from fastapi import (
+	APIRouter,
+	Request,
+	Security,
+	status,
+	HTTPException,
+	Form,
+	Path,
+	Query,
+	Response,
+)
 
 from currency_exchange.auth import verify_access
+from currency_exchange.utils.streaming import (
+	PAGE_MAX_SIZE,
+	STREAMING_RESPONSES,
+	serialize_item,
+	stream_page_response,
+)
 from ...application import errors as appexc
 from ..schemas import (
 	CurrencyOutSchema,
@@ -12,7 +28,12 @@ from ..schemas import (
 	CurrencyCodeField,
 )
 from ..appadapter import currency_exchange_app
-from ..dependencies import user_dependency
+from ..responsecache import cached_response
+from ..dependencies import (
+	user_dependency,
+	data_version_dependency,
+	NOT_MODIFIED_RESPONSES,
+)
 
 currencies_router = APIRouter()
 
@@ -25,10 +46,32 @@ currency_code_path_field = Annotated[CurrencyCodeField, Path()]
 @currencies_router.get(
 	"/currencies",
 	response_model=list[CurrencyOutSchema],
+	responses={**STREAMING_RESPONSES, **NOT_MODIFIED_RESPONSES},
 	dependencies=[Security(verify_access, scopes=["currency:request"])],
 )
-async def get_all_currencies():
-	return await currency_exchange_app.get_all_currencies()
+async def get_all_currencies(
+	request: Request,
+	data_version_headers: data_version_dependency,
+	codes: Annotated[Optional[list[CurrencyCodeField]], Query()] = None,
+	after: Annotated[
+		Optional[CurrencyCodeField],
+		Query(description="Code of the last currency of the previous page"),
+	] = None,
+	limit: Annotated[Optional[int], Query(ge=1, le=PAGE_MAX_SIZE)] = None,
+):
+	return await cached_response(
+		currency_exchange_app.get_response_cache(),
+		request,
+		lambda: stream_page_response(
+			request,
+			currency_exchange_app.stream_currencies(codes, after, limit),
+			CurrencyOutSchema,
+			limit,
+			lambda currency: currency.code,
+			data_version_headers,
+			currency_exchange_app.get_fast_serializer(CurrencyOutSchema),
+		),
+	)
 
 
 currency_code_not_present_exc = HTTPException(
@@ -63,7 +106,7 @@ async def delete_currency_stub():
 )
 async def get_currency(currency_code: CurrencyCodeField, user: user_dependency):
 	try:
-		return await currency_exchange_app.get_currency(currency_code)
+		currency = await currency_exchange_app.get_currency(currency_code)
 	except appexc.CurrencyDoesNotExistError:
 		logger.debug(
 			"Error requesting currency %s by user %s",
@@ -74,6 +117,14 @@ async def get_currency(currency_code: CurrencyCodeField, user: user_dependency):
 		raise HTTPException(
 			status_code=status.HTTP_404_NOT_FOUND, detail="Currency not found"
 		)
+	return Response(
+		serialize_item(
+			currency,
+			CurrencyOutSchema,
+			currency_exchange_app.get_fast_serializer(CurrencyOutSchema),
+		),
+		media_type="application/json",
+	)
 
 
 @currencies_router.post(
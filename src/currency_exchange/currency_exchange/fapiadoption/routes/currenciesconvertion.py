@@ -1,12 +1,18 @@
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, Query, status, HTTPException, Security
+from fastapi import APIRouter, Query, Response, status, HTTPException, Security
 
 from currency_exchange.auth import verify_access
+from currency_exchange.utils.streaming import serialize_item
 from ...application import errors as appexc
 from ..appadapter import currency_exchange_app
-from ..schemas import ConvertedCurrencySchema, CurrencyConvertionDataSchema
+from ..schemas import (
+	ConvertedCurrencySchema,
+	CurrencyConvertionQuerySchema,
+	BatchCurrencyConvertionDataSchema,
+	BatchConvertedCurrencyItemSchema,
+)
 from ..dependencies import user_dependency
 
 logger = logging.getLogger("currency_exchange")
@@ -23,13 +29,16 @@ currencies_convertion_router = APIRouter()
 	dependencies=[Security(verify_access, scopes=["exch_rate:request"])],
 )
 async def convert_currencies(
-	convertion_data: Annotated[CurrencyConvertionDataSchema, Query()],
+	convertion_data: Annotated[CurrencyConvertionQuerySchema, Query()],
 	user: user_dependency,
 ):
 	try:
 		try:
-			return await currency_exchange_app.convert_currency(
-				convertion_data.from_, convertion_data.to, convertion_data.amount
+			converted = await currency_exchange_app.convert_currency(
+				convertion_data.from_,
+				convertion_data.to,
+				convertion_data.amount,
+				convertion_data.as_of,
 			)
 		except Exception:
 			logger.debug(
@@ -43,3 +52,38 @@ async def convert_currencies(
 			raise
 	except appexc.CurrenciesConvertionError:
 		raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Exchange rate not found")
+	return Response(
+		serialize_item(
+			converted,
+			ConvertedCurrencySchema,
+			currency_exchange_app.get_fast_serializer(ConvertedCurrencySchema),
+		),
+		media_type="application/json",
+	)
+
+
+@currencies_convertion_router.post(
+	"/exchange/batch",
+	response_model=list[BatchConvertedCurrencyItemSchema],
+	responses={400: {"description": "Bad request data"}},
+	dependencies=[Security(verify_access, scopes=["exch_rate:request"])],
+)
+async def convert_currencies_batch(
+	convertions_data: BatchCurrencyConvertionDataSchema,
+	user: user_dependency,
+):
+	results = await currency_exchange_app.convert_currency_batch(convertions_data.items)
+	failed = sum(isinstance(res, appexc.CurrenciesConvertionError) for res in results)
+	if failed:
+		logger.debug(
+			"%s of %s currency convertions failed in batch by user %s",
+			failed,
+			len(results),
+			user.username,
+		)
+	return [
+		{"error": "Exchange rate not found"}
+		if isinstance(res, appexc.CurrenciesConvertionError)
+		else {"result": res}
+		for res in results
+	]
@@ -1,17 +1,43 @@
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Optional
 import logging
 
-from fastapi import APIRouter, HTTPException, status, Form, Path, Security
+from fastapi import (
+	APIRouter,
+	HTTPException,
+	status,
+	Form,
+	Path,
+	Query,
+	Request,
+	Response,
+	Security,
+)
 
 from currency_exchange.auth import verify_access
+from currency_exchange.utils.streaming import (
+	PAGE_MAX_SIZE,
+	STREAMING_RESPONSES,
+	serialize_item,
+	stream_page_response,
+)
 from ...application import errors as appexc
+from ...domain.errors import IncorrectExchangeRateValue
 from ..schemas import (
 	ExchangeRateOutSchema,
 	AddExchangeRateSchema,
 	UpdateExchangeRateSchema,
+	BulkExchangeRatesSchema,
+	UpsertedExchangeRateItemSchema,
+	CurrencyCodeField,
 )
 from ..appadapter import currency_exchange_app
-from ..dependencies import user_dependency
+from ..responsecache import cached_response
+from ..dependencies import (
+	user_dependency,
+	data_version_dependency,
+	NOT_MODIFIED_RESPONSES,
+)
 
 logger = logging.getLogger("currency_exchange")
 exchange_rates_router = APIRouter()
@@ -22,10 +48,32 @@ CodePairPathField = Path(pattern="[a-zA-Z]{6}", examples=["USDRUB", "RUBEUR"])
 @exchange_rates_router.get(
 	"/exchangerates",
 	response_model=list[ExchangeRateOutSchema],
+	responses={**STREAMING_RESPONSES, **NOT_MODIFIED_RESPONSES},
 	dependencies=[Security(verify_access, scopes=["exch_rate:request"])],
 )
-async def get_all_exchange_rates():
-	return await currency_exchange_app.get_all_exchange_rates()
+async def get_all_exchange_rates(
+	request: Request,
+	data_version_headers: data_version_dependency,
+	base: Annotated[Optional[CurrencyCodeField], Query()] = None,
+	target: Annotated[Optional[CurrencyCodeField], Query()] = None,
+	after: Annotated[
+		Optional[int], Query(description="Id of the last rate of the previous page")
+	] = None,
+	limit: Annotated[Optional[int], Query(ge=1, le=PAGE_MAX_SIZE)] = None,
+):
+	return await cached_response(
+		currency_exchange_app.get_response_cache(),
+		request,
+		lambda: stream_page_response(
+			request,
+			currency_exchange_app.stream_exchange_rates(base, target, after, limit),
+			ExchangeRateOutSchema,
+			limit,
+			lambda rate: rate.id,
+			data_version_headers,
+			currency_exchange_app.get_fast_serializer(ExchangeRateOutSchema),
+		),
+	)
 
 
 er_codes_not_present_exc = HTTPException(
@@ -55,20 +103,47 @@ async def delete_currency_stub():
 	responses={
 		400: {"description": "Bad data in request"},
 		404: {"description": "Rate not found"},
+		**NOT_MODIFIED_RESPONSES,
 	},
 	dependencies=[Security(verify_access, scopes=["exch_rate:request"])],
 )
 async def get_exchange_rate(
-	code_pair: Annotated[str, CodePairPathField], user: user_dependency
+	request: Request,
+	code_pair: Annotated[str, CodePairPathField],
+	user: user_dependency,
+	data_version_headers: data_version_dependency,
+	as_of: Annotated[
+		Optional[datetime],
+		Query(description="Moment, which exchange rate value is requested for"),
+	] = None,
 ):
 	base_code, target_code = code_pair[:3], code_pair[3:]
-	try:
-		return await currency_exchange_app.get_exchange_rate(base_code, target_code)
-	except appexc.ExchangeRateDoesntExistError:
-		logger.debug(
-			"Error on trying to get currency by user %s", user.username, exc_info=True
+
+	async def make_response() -> Response:
+		try:
+			exchange_rate = await currency_exchange_app.get_exchange_rate(
+				base_code, target_code, as_of
+			)
+		except (appexc.ExchangeRateDoesntExistError, appexc.CurrencyDoesNotExistError):
+			logger.debug(
+				"Error on trying to get currency by user %s",
+				user.username,
+				exc_info=True,
+			)
+			raise HTTPException(status_code=404, detail="Rate not found")
+		return Response(
+			serialize_item(
+				exchange_rate,
+				ExchangeRateOutSchema,
+				currency_exchange_app.get_fast_serializer(ExchangeRateOutSchema),
+			),
+			headers=data_version_headers,
+			media_type="application/json",
 		)
-		raise HTTPException(status_code=404, detail="Rate not found")
+
+	return await cached_response(
+		currency_exchange_app.get_response_cache(), request, make_response
+	)
 
 
 @exchange_rates_router.post(
@@ -111,6 +186,35 @@ async def add_exchange_rate(
 		raise HTTPException(
 			status_code=409, detail="Can't add exchange rate to same currency"
 		)
+	except IncorrectExchangeRateValue as e:
+		raise HTTPException(status_code=400, detail=e.args[0])
+
+
+@exchange_rates_router.post(
+	"/exchangerates/bulk",
+	response_model=list[UpsertedExchangeRateItemSchema],
+	responses={400: {"description": "Bad data in request"}},
+	dependencies=[
+		Security(verify_access, scopes=["exch_rate:create", "exch_rate:update"])
+	],
+)
+async def upsert_exchange_rates(
+	exchange_rates: BulkExchangeRatesSchema, user: user_dependency
+):
+	results = await currency_exchange_app.upsert_exchange_rates(exchange_rates.items)
+	failed = sum(isinstance(res, appexc.DataRequestError) for res in results)
+	logger.info(
+		"User %s saved %s of %s exchange rates in bulk",
+		user.username,
+		len(results) - failed,
+		len(results),
+	)
+	return [
+		{"error": res.args[0]}
+		if isinstance(res, appexc.DataRequestError)
+		else {"result": res.exchange_rate, "created": res.created}
+		for res in results
+	]
 
 
 @exchange_rates_router.patch(
@@ -158,10 +262,13 @@ async def update_exchange_rate(
 			raise
 	except appexc.CurrencyDoesNotExistError as e:
 		raise HTTPException(status_code=404, detail=e.args[0])
+	except IncorrectExchangeRateValue as e:
+		raise HTTPException(status_code=400, detail=e.args[0])
 
 
 @exchange_rates_router.delete(
 	"/exchangerate/{code_pair}",
+	response_model=ExchangeRateOutSchema,
 	responses={
 		404: {"description": "Currency(ies) not found"},
 		400: {"description": "Bad request data"},
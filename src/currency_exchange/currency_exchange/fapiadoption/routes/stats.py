@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, status, Security
+
+from currency_exchange.auth import verify_access
+from currency_exchange.auth.providers import jwt_validator_provider
+from currency_exchange.db import pool as db_pool
+from currency_exchange.db.session import engine
+from ..appadapter import currency_exchange_app
+from ..schemas import CacheStatsSchema, PoolStatsSchema
+
+stats_router = APIRouter(
+	prefix="/admin/stats", dependencies=[Security(verify_access, scopes=["all"])]
+)
+
+
+@stats_router.get(
+	"/cache",
+	response_model=CacheStatsSchema,
+	responses={404: {"description": "Cache is turned off"}},
+)
+async def get_cache_stats():
+	cache_stats = currency_exchange_app.get_cache_stats()
+	if cache_stats is None:
+		raise HTTPException(
+			status_code=status.HTTP_404_NOT_FOUND, detail="Cache is turned off"
+		)
+	return cache_stats
+
+
+@stats_router.get(
+	"/responses",
+	response_model=CacheStatsSchema,
+	responses={404: {"description": "Responses cache is turned off"}},
+)
+async def get_response_cache_stats():
+	cache_stats = currency_exchange_app.get_response_cache_stats()
+	if cache_stats is None:
+		raise HTTPException(
+			status_code=status.HTTP_404_NOT_FOUND,
+			detail="Responses cache is turned off",
+		)
+	return cache_stats
+
+
+@stats_router.get(
+	"/pool",
+	response_model=PoolStatsSchema,
+	responses={404: {"description": "Db connections pool isn't monitored"}},
+)
+async def get_pool_stats():
+	pool_stats = db_pool.get_pool_stats(engine)
+	if pool_stats is None:
+		raise HTTPException(
+			status_code=status.HTTP_404_NOT_FOUND,
+			detail="Db connections pool isn't monitored",
+		)
+	return pool_stats
+
+
+@stats_router.get(
+	"/tokens",
+	response_model=CacheStatsSchema,
+	responses={404: {"description": "Validated tokens cache is turned off"}},
+)
+async def get_tokens_cache_stats():
+	cache_stats = jwt_validator_provider().get_cache_stats()
+	if cache_stats is None:
+		raise HTTPException(
+			status_code=status.HTTP_404_NOT_FOUND,
+			detail="Validated tokens cache is turned off",
+		)
+	return cache_stats
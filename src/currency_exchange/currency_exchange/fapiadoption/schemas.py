@@ -1,6 +1,7 @@
 import re
 from collections import UserString
-from typing import Annotated
+from datetime import datetime
+from typing import Annotated, Optional
 
 from pydantic import (
 	BaseModel,
@@ -11,8 +12,12 @@ from pydantic import (
 	BeforeValidator,
 )
 
+from currency_exchange.currency_exchange.domain.fixedpoint import MAX_RATE
 from currency_exchange.currency_exchange.domain.types import ExchangeRateValue
 
+CONVERTION_BATCH_MAX_SIZE = 10000
+EXCHANGE_RATES_BULK_MAX_SIZE = 10000
+
 user_string_converter = BeforeValidator(
 	lambda v: v.data if isinstance(v, UserString) else v
 )
@@ -32,6 +37,24 @@ ExchangeRateValueField = Annotated[
 ]
 
 
+def round_rate(digits: int) -> AfterValidator:
+	"""Rounds given rate to the digits, rejecting the rate, which is rounded to zero."""
+
+	def validate(value: float) -> float:
+		rounded = round(value, digits)
+		if rounded == 0:
+			raise ValueError(f"Exchange rate should be at least {10**-digits}")
+		return rounded
+
+	return AfterValidator(validate)
+
+
+# scaled rates have to fit BIGINT column, they are stored in
+ExchangeRateValueInField = Annotated[
+	float, Field(gt=0, le=MAX_RATE, allow_inf_nan=False), round_rate(2)
+]
+
+
 class CurrencyOutSchema(BaseModel):
 	model_config = ConfigDict(from_attributes=True)
 	id: int
@@ -67,21 +90,46 @@ class ExchangeRateOutSchema(BaseModel):
 class AddExchangeRateSchema(BaseModel):
 	baseCurrencyCode: CurrencyCodeField
 	targetCurrencyCode: CurrencyCodeField
-	rate: ExchangeRateValueField
+	rate: ExchangeRateValueInField
 
 
-class UpdateExchangeRateSchema(BaseModel):
-	rate: Annotated[
-		float, Field(gt=0, allow_inf_nan=False), AfterValidator(lambda v: round(v, 6))
+class BulkExchangeRatesSchema(BaseModel):
+	items: Annotated[
+		list[AddExchangeRateSchema],
+		Field(min_length=1, max_length=EXCHANGE_RATES_BULK_MAX_SIZE),
 	]
 
 
+class UpsertedExchangeRateItemSchema(BaseModel):
+	result: Optional[ExchangeRateOutSchema] = None
+	created: Optional[bool] = None
+	error: Optional[str] = None
+
+
+class UpdateExchangeRateSchema(BaseModel):
+	rate: Annotated[float, Field(gt=0, le=MAX_RATE, allow_inf_nan=False), round_rate(6)]
+
+
 class CurrencyConvertionDataSchema(BaseModel):
 	from_: Annotated[str, Field(pattern=re.compile("[A-Z]{3}"))]
 	to: CurrencyCodeField
 	amount: Annotated[float, Field(gt=0, allow_inf_nan=False)]
 
 
+class CurrencyConvertionQuerySchema(CurrencyConvertionDataSchema):
+	as_of: Annotated[
+		Optional[datetime],
+		Field(description="Moment, which exchange rate is taken for convertion"),
+	] = None
+
+
+class BatchCurrencyConvertionDataSchema(BaseModel):
+	items: Annotated[
+		list[CurrencyConvertionDataSchema],
+		Field(min_length=1, max_length=CONVERTION_BATCH_MAX_SIZE),
+	]
+
+
 class ConvertedCurrencySchema(BaseModel):
 	model_config = ConfigDict(from_attributes=True)
 
@@ -100,3 +148,34 @@ class ConvertedCurrencySchema(BaseModel):
 		Field(validation_alias=AliasPath("target_currency_amount", "value")),
 		AfterValidator(lambda v: round(v, 2)),
 	]
+
+
+class BatchConvertedCurrencyItemSchema(BaseModel):
+	result: Optional[ConvertedCurrencySchema] = None
+	error: Optional[str] = None
+
+
+class CacheStatsSchema(BaseModel):
+	model_config = ConfigDict(from_attributes=True)
+
+	size: int
+	max_size: int
+	hits: int
+	misses: int
+	evictions: int
+	invalidations: int
+
+
+class PoolStatsSchema(BaseModel):
+	model_config = ConfigDict(from_attributes=True)
+
+	size: int
+	max_overflow: int
+	checked_out: int
+	overflow: int
+	max_checked_out: int
+	max_overflow_used: int
+	checkouts: int
+	timeouts: int
+	total_wait_seconds: float
+	max_wait_seconds: float
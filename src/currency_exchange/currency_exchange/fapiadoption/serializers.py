@@ -0,0 +1,81 @@
+from typing import TypedDict
+
+from pydantic import BaseModel, TypeAdapter
+
+from currency_exchange.utils.streaming import ItemSerializer
+from ..application.dto import CurrencyDto, ExchangeRateDto, ConvertedCurrenciesPairDto
+from .schemas import CurrencyOutSchema, ExchangeRateOutSchema, ConvertedCurrencySchema
+
+# Output of the schemas is reproduced from DTOs, which are valid by construction, without validating
+# them. Dicts have the same fields in the same order as the schemas and values converted the same way as
+# the schemas' validators do, so they are dumped by the same pydantic serializer to the same bytes.
+
+
+class CurrencyOutDict(TypedDict):
+	id: int
+	name: str
+	code: str
+	sign: str
+
+
+class ExchangeRateOutDict(TypedDict):
+	id: int
+	baseCurrency: CurrencyOutDict
+	targetCurrency: CurrencyOutDict
+	rate: float
+
+
+class ConvertedCurrencyDict(TypedDict):
+	baseCurrency: CurrencyOutDict
+	targetCurrency: CurrencyOutDict
+	rate: float
+	amount: float
+	convertedAmount: float
+
+
+_currency_adapter = TypeAdapter(CurrencyOutDict)
+_exchange_rate_adapter = TypeAdapter(ExchangeRateOutDict)
+_converted_currency_adapter = TypeAdapter(ConvertedCurrencyDict)
+
+
+def _currency_dict(currency: CurrencyDto) -> CurrencyOutDict:
+	return {
+		"id": currency.id,  # type: ignore[typeddict-item]
+		"name": str(currency.name),
+		"code": str(currency.code),
+		"sign": str(currency.sign),
+	}
+
+
+def dump_currency(currency: CurrencyDto) -> bytes:
+	return _currency_adapter.dump_json(_currency_dict(currency))
+
+
+def dump_exchange_rate(exchange_rate: ExchangeRateDto) -> bytes:
+	return _exchange_rate_adapter.dump_json(
+		{
+			"id": exchange_rate.id,  # type: ignore[typeddict-item]
+			"baseCurrency": _currency_dict(exchange_rate.base_currency),
+			"targetCurrency": _currency_dict(exchange_rate.target_currency),
+			"rate": round(float(exchange_rate.rate.value), 2),
+		}
+	)
+
+
+def dump_converted_currency(converted: ConvertedCurrenciesPairDto) -> bytes:
+	return _converted_currency_adapter.dump_json(
+		{
+			"baseCurrency": _currency_dict(converted.base_currency),
+			"targetCurrency": _currency_dict(converted.target_currency),
+			"rate": round(float(converted.exchange_rate.value), 2),
+			"amount": round(float(converted.base_currency_amount.value), 2),
+			"convertedAmount": round(float(converted.target_currency_amount.value), 2),
+		}
+	)
+
+
+DTO_SERIALIZERS: dict[type[BaseModel], ItemSerializer] = {
+	CurrencyOutSchema: dump_currency,
+	ExchangeRateOutSchema: dump_exchange_rate,
+	ConvertedCurrencySchema: dump_converted_currency,
+}
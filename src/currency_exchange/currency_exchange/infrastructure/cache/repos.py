@@ -0,0 +1,309 @@
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable, Iterable
+from datetime import datetime
+from typing import Any, Optional
+
+from currency_exchange.db.unitofwork import after_commit, has_uncommitted_changes
+from currency_exchange.utils.boundedcache import BoundedCache, MISSING
+from ..memory.repos import select_currencies, select_rates
+from ...application import errors
+from ...application.extdm import (
+	IdentifiedCurrency as Currency,
+	IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate,
+)
+from ...application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from ...application.interfaces import (
+	CurrencyRepoInterface,
+	ExchangeRatesRepoInterface,
+	ExchangeRateResolverInterface,
+)
+from ...application.dto import (
+	GetCurrencyDto,
+	GetExchangeRateDto,
+	CurrenciesQueryDto,
+	ExchangeRatesQueryDto,
+	AddCurrencyDto,
+	AddExchangeRateDto,
+	AlterCurrencyDto,
+	AlterExchangeRateDto,
+	DeleteCurrencyDto,
+	DeleteExchangeRateDto,
+)
+
+ALL_CURRENCIES_KEY = ("all_currencies",)
+ALL_RATES_KEY = ("all_rates",)
+CURRENCY_NAMES_TAG = "currency_names"
+RATES_TAG = "rates"
+# rates through a common currency might depend on any currency
+RESOLVED_RATES_TAG = "resolved"
+
+
+class CachedError:
+	"""Negative result of a read, kept in cache and raised again on a hit."""
+
+	__slots__ = ("error_type", "args")
+
+	def __init__(self, error: Exception) -> None:
+		self.error_type = type(error)
+		self.args = error.args
+
+	def raise_error(self):
+		raise self.error_type(*self.args)
+
+
+def currency_tag(code: str) -> str:
+	return f"currency:{code}"
+
+
+def rates_tag(code: str) -> str:
+	return f"rates:{code}"
+
+
+def found_currency_tags(currency: Currency | CachedError) -> list[str]:
+	if isinstance(currency, CachedError):
+		return [CURRENCY_NAMES_TAG]
+	return [CURRENCY_NAMES_TAG, currency_tag(currency.code.data)]
+
+
+def invalidate_currencies(cache: BoundedCache, codes: Optional[list[str]]) -> None:
+	"""Invalidates entries, affected by changes of currencies made by another process."""
+	if codes is None:
+		cache.clear()
+		return
+	cache.invalidate(ALL_CURRENCIES_KEY, ALL_RATES_KEY)
+	# names of the changed currencies are unknown
+	cache.invalidate_tagged(CURRENCY_NAMES_TAG, RESOLVED_RATES_TAG)
+	for code in codes:
+		cache.invalidate_tagged(currency_tag(code), rates_tag(code))
+
+
+def invalidate_exchange_rates(
+	cache: BoundedCache, code_pairs: Optional[list[str]]
+) -> None:
+	"""
+	Invalidates entries, affected by changes of exchange rates between currencies pairs, given as joined codes.
+	None means that any exchange rate could have changed.
+	"""
+	if code_pairs is None:
+		cache.invalidate_tagged(RATES_TAG)
+		return
+	cache.invalidate(ALL_RATES_KEY)
+	cache.invalidate_tagged(
+		*{rates_tag(code) for pair in code_pairs for code in (pair[:3], pair[3:])}
+	)
+
+
+async def read_through(
+	cache: BoundedCache,
+	key: Hashable,
+	fetch: Callable[[], Awaitable[Any]],
+	tags: Iterable[Hashable] | Callable[[Any], Iterable[Hashable]] = (),
+	cached_errors: tuple[type[Exception], ...] = (),
+) -> Any:
+	"""
+	Gets the value from cache or fetches and caches it. Errors of cached_errors types are cached as well.
+	Tags could be given as a function of fetched value. Value, fetched after writes of the current unit of work,
+	isn't cached, as it might be never committed, while the writes invalidate cache only once committed.
+	"""
+	value = cache.get(key)
+	if value is MISSING:
+		generation = cache.generation
+		try:
+			value = await fetch()
+		except cached_errors as e:
+			value = CachedError(e)
+		# value fetched before an invalidation might be obsolete already
+		if generation == cache.generation and not has_uncommitted_changes():
+			cache.set(key, value, tags(value) if callable(tags) else tags)
+	if isinstance(value, CachedError):
+		value.raise_error()
+	return value
+
+
+class CachingCurrencyRepo(CurrencyRepoInterface):
+	def __init__(self, repo: CurrencyRepoInterface, cache: BoundedCache) -> None:
+		self._repo = repo
+		self._cache = cache
+
+	async def get_all_currencies(self) -> list[Currency]:
+		return list(
+			await read_through(
+				self._cache, ALL_CURRENCIES_KEY, self._repo.get_all_currencies
+			)
+		)
+
+	async def stream_currencies(
+		self, query: CurrenciesQueryDto
+	) -> AsyncIterator[Currency]:
+		# streamed currencies aren't cached, since they aren't held in memory all at once
+		currencies = self._cache.get(ALL_CURRENCIES_KEY)
+		if currencies is MISSING:
+			async for currency in self._repo.stream_currencies(query):
+				yield currency
+			return
+		for currency in select_currencies(currencies, query):
+			yield currency
+
+	async def get_currency(self, currency_data: GetCurrencyDto) -> Currency:
+		if currency_data.code:
+			code = currency_data.code.data
+			key, tags = ("currency", code), [currency_tag(code)]
+		else:
+			key = ("currency_name", currency_data.name.data)
+			# code of currency is known only after it's found
+			tags = found_currency_tags
+
+		return await read_through(
+			self._cache,
+			key,
+			lambda: self._repo.get_currency(currency_data),
+			tags,
+			cached_errors=(errors.CurrencyDoesNotExistError,),
+		)
+
+	async def save_currency(self, currency: AddCurrencyDto) -> Currency:
+		saved_currency = await self._repo.save_currency(currency)
+		code = saved_currency.code.data
+
+		def invalidate() -> None:
+			self._cache.invalidate(
+				("currency", code), ("currency_name", saved_currency.name.data)
+			)
+			# drops rates, previously not found for lack of the currency
+			self._invalidate_currency_rates(code)
+
+		after_commit(invalidate)
+		return saved_currency
+
+	async def update_currency(self, currency: AlterCurrencyDto) -> Currency:
+		updated_currency = await self._repo.update_currency(currency)
+
+		def invalidate() -> None:
+			self._cache.invalidate(("currency_name", updated_currency.name.data))
+			# rates hold currencies data too
+			self._invalidate_currency_rates(updated_currency.code.data)
+
+		after_commit(invalidate)
+		return updated_currency
+
+	async def delete_currency(self, currency: DeleteCurrencyDto) -> Currency:
+		deleted_currency = await self._repo.delete_currency(currency)
+
+		def invalidate() -> None:
+			self._invalidate_currency_rates(deleted_currency.code.data)
+			# the currency might have been common for rates between any other currencies
+			self._cache.invalidate_tagged(RESOLVED_RATES_TAG)
+
+		after_commit(invalidate)
+		return deleted_currency
+
+	def _invalidate_currency_rates(self, code: str) -> None:
+		self._cache.invalidate(ALL_CURRENCIES_KEY, ALL_RATES_KEY)
+		self._cache.invalidate_tagged(currency_tag(code), rates_tag(code))
+
+
+class CachingExchangeRatesRepo(
+	ExchangeRatesRepoInterface, ExchangeRateResolverInterface
+):
+	def __init__(
+		self,
+		repo: ExchangeRatesRepoInterface | ExchangeRateResolverInterface,
+		cache: BoundedCache,
+	) -> None:
+		self._repo = repo
+		self._cache = cache
+
+	async def get_all_rates(self) -> list[CurrenciesExchangeRate]:
+		return list(
+			await read_through(
+				self._cache, ALL_RATES_KEY, self._repo.get_all_rates, [RATES_TAG]
+			)
+		)
+
+	async def stream_rates(
+		self, query: ExchangeRatesQueryDto
+	) -> AsyncIterator[CurrenciesExchangeRate]:
+		# streamed rates aren't cached, since they aren't held in memory all at once
+		rates = self._cache.get(ALL_RATES_KEY)
+		if rates is MISSING:
+			async for rate in self._repo.stream_rates(query):
+				yield rate
+			return
+		for rate in select_rates(rates, query):
+			yield rate
+
+	async def get_rate(self, rate: GetExchangeRateDto) -> CurrenciesExchangeRate:
+		base, target = rate.base_currency.data, rate.target_currency.data
+		return await read_through(
+			self._cache,
+			("rate", base, target),
+			lambda: self._repo.get_rate(rate),
+			[RATES_TAG, rates_tag(base), rates_tag(target)],
+			cached_errors=(errors.ExchangeRateDoesntExistError,),
+		)
+
+	async def save_rate(self, rate: AddExchangeRateDto) -> CurrenciesExchangeRate:
+		saved_rate = await self._repo.save_rate(rate)
+		self._invalidate_rates(rate.base_currency.data, rate.target_currency.data)
+		return saved_rate
+
+	async def update_rate(self, rate: AlterExchangeRateDto) -> CurrenciesExchangeRate:
+		updated_rate = await self._repo.update_rate(rate)
+		self._invalidate_rates(rate.base_currency.data, rate.target_currency.data)
+		return updated_rate
+
+	async def delete_rate(self, rate: DeleteExchangeRateDto) -> CurrenciesExchangeRate:
+		deleted_rate = await self._repo.delete_rate(rate)
+		self._invalidate_rates(rate.base_currency.data, rate.target_currency.data)
+		return deleted_rate
+
+	async def upsert_rates(
+		self, rates: list[AddExchangeRateDto]
+	) -> list[tuple[CurrenciesExchangeRate, bool] | errors.DataRequestError]:
+		results = await self._repo.upsert_rates(rates)
+		code_pairs = [
+			f"{rate.base_currency.data}{rate.target_currency.data}" for rate in rates
+		]
+		after_commit(lambda: invalidate_exchange_rates(self._cache, code_pairs))
+		return results
+
+	async def get_rate_as_of(
+		self, rate: GetExchangeRateDto, as_of: datetime
+	) -> CurrenciesExchangeRate:
+		return await self._repo.get_rate_as_of(rate, as_of)
+
+	async def get_cross_rates(
+		self, rate: GetExchangeRateDto
+	) -> list[tuple[CurrenciesExchangeRate, CurrenciesExchangeRate]]:
+		return await self._repo.get_cross_rates(rate)
+
+	async def get_rates_chain(
+		self, rate: GetExchangeRateDto, max_hops: int
+	) -> list[CurrenciesExchangeRate]:
+		return await self._repo.get_rates_chain(rate, max_hops)
+
+	async def resolve_rate(
+		self, rate: GetExchangeRateDto, *, rate_fetch_strategy: ERFetchStrat
+	) -> tuple[CurrenciesExchangeRate, ERFetchStrat]:
+		base, target = rate.base_currency.data, rate.target_currency.data
+		return await read_through(
+			self._cache,
+			("resolved", base, target, rate_fetch_strategy.value),
+			lambda: self._repo.resolve_rate(
+				rate, rate_fetch_strategy=rate_fetch_strategy
+			),
+			# rate through a common currency consists of rates, having base or target currency
+			[RATES_TAG, rates_tag(base), rates_tag(target), RESOLVED_RATES_TAG],
+			cached_errors=(
+				errors.ExchangeRateDoesntExistError,
+				errors.CurrencyDoesNotExistError,
+			),
+		)
+
+	def _invalidate_rates(self, base: str, target: str) -> None:
+		def invalidate() -> None:
+			self._cache.invalidate(ALL_RATES_KEY)
+			self._cache.invalidate_tagged(rates_tag(base), rates_tag(target))
+
+		after_commit(invalidate)
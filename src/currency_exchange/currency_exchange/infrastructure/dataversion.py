@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+
+from currency_exchange.db.changes import TopicVersion
+
+
+class DataVersion:
+	"""
+	Version of currencies and exchange rates data, made of versions of their changes topics, which are shared by
+	all processes (see publish_change). It's updated after every write, committed by the process, and on every
+	change made by another process, once it's notified. So processes, which have seen the same changes, have the
+	same version, and validators of responses, made by one of them, are valid for the others.
+
+	Value is a local counter of updates, which tells that data, held in process memory, could have changed.
+	"""
+
+	def __init__(self) -> None:
+		self.value = 0
+		self._versions: dict[str, TopicVersion] = {}
+
+	@property
+	def etag(self) -> str:
+		# representations of the same version differ by media type, so tag is weak
+		versions = "-".join(
+			str(self._versions[topic].version) for topic in sorted(self._versions)
+		)
+		return f'W/"{versions}"'
+
+	@property
+	def changed_at(self) -> Optional[datetime]:
+		"""Time of the last change, unknown until some version is taken."""
+		return max(
+			(
+				version.changed_at
+				for version in self._versions.values()
+				if version.changed_at is not None
+			),
+			default=None,
+		)
+
+	def update(self, version: TopicVersion) -> None:
+		"""Takes version of the changed topic, unless a later one is taken already."""
+		current = self._versions.get(version.topic)
+		if current is None or version.version > current.version:
+			self._versions[version.topic] = version
+		self.value += 1
@@ -0,0 +1,45 @@
+from collections.abc import Iterable
+from typing import Optional
+
+from ...application.extdm import IdentifiedCurrency as Currency
+
+
+class CurrenciesIndex:
+	"""
+	Process local index of currencies by code and by id.
+
+	It's kept by the currencies repository, so that other repositories don't need to look currencies ids up.
+	A code missing in the index doesn't mean there's no such currency, as it could be added by another process.
+	"""
+
+	def __init__(self, currencies: Iterable[Currency] = ()) -> None:
+		self._ids: dict[str, int] = {}
+		self._currencies: dict[int, Currency] = {}
+		self.reset(currencies)
+
+	def __len__(self) -> int:
+		return len(self._ids)
+
+	def get_id(self, code: str) -> Optional[int]:
+		return self._ids.get(code)
+
+	def get_currency(self, id_: int) -> Optional[Currency]:
+		return self._currencies.get(id_)
+
+	def set(self, currency: Currency) -> None:
+		if currency.id is None:
+			return
+		self.remove(currency.code.data)
+		self._ids[currency.code.data] = currency.id
+		self._currencies[currency.id] = currency
+
+	def remove(self, code: str) -> None:
+		id_ = self._ids.pop(code, None)
+		if id_ is not None:
+			self._currencies.pop(id_, None)
+
+	def reset(self, currencies: Iterable[Currency]) -> None:
+		self._ids.clear()
+		self._currencies.clear()
+		for currency in currencies:
+			self.set(currency)
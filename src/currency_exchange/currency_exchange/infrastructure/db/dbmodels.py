@@ -1,10 +1,32 @@
-from sqlalchemy import String, ForeignKey, Float, UniqueConstraint
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+	DDL,
+	BigInteger,
+	Double,
+	String,
+	ForeignKey,
+	cast,
+	Index,
+	UniqueConstraint,
+	event,
+	func,
+)
+from sqlalchemy.dialects.postgresql import TIMESTAMP
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from currency_exchange.config import SQLAModelBase
 from currency_exchange.utils.importobject import import_object
+from ...domain.fixedpoint import RATE_SCALE, from_scaled_rate, to_scaled_rate
 from ...domain.types import CurrencyCode, CurrencySign, CurrencyName, ExchangeRateValue
+from .ratehistory import (
+	RATE_HISTORY_TABLE,
+	CREATE_DEFAULT_PARTITION,
+	CREATE_HISTORY_FUNCTION,
+	CREATE_HISTORY_TRIGGERS,
+)
 
 BaseModel = import_object(SQLAModelBase)
 
@@ -20,7 +42,11 @@ class CurrencyORMModel(BaseModel):
 
 class CurrenciesExchangeRateORMModel(BaseModel):
 	__tablename__ = "exchange_rate"
-	__table_args__ = (UniqueConstraint("base_crncy_id", "target_crncy_id"),)
+	__table_args__ = (
+		# also serves filtering by base currency
+		UniqueConstraint("base_crncy_id", "target_crncy_id"),
+		Index("ix_exchange_rate_target_crncy_id_id", "target_crncy_id", "id"),
+	)
 
 	id: Mapped[int] = mapped_column(primary_key=True)
 	base_crncy_id: Mapped[int] = mapped_column(
@@ -37,16 +63,57 @@ class CurrenciesExchangeRateORMModel(BaseModel):
 		primaryjoin="CurrenciesExchangeRateORMModel.target_crncy_id==CurrencyORMModel.id",
 		lazy="selectin",
 	)
-	_value: Mapped[float] = mapped_column(Float(precision=6))
+	# rate is kept exactly, as an integer scaled by RATE_SCALE
+	_value: Mapped[int] = mapped_column(BigInteger)
 
 	@hybrid_property
 	def value(self):
-		return ExchangeRateValue(self._value)
+		return ExchangeRateValue(from_scaled_rate(self._value))
 
 	@value.setter
 	def value(self, value: ExchangeRateValue):
-		self._value = value.value
+		self._value = to_scaled_rate(value.value)
 
 	@value.expression
 	def value(cls):
-		return cls._value
+		return cast(cls._value, Double) / RATE_SCALE
+
+
+class ExchangeRateHistoryORMModel(BaseModel):
+	"""
+	Values of exchange rates since the moment they were written, appended by triggers on exchange_rate table.
+	Partitioned by months of valid_from. Currencies aren't referenced by foreign keys, as history outlives them.
+	"""
+
+	__tablename__ = RATE_HISTORY_TABLE
+	__table_args__ = (
+		Index(
+			"ix_exchange_rate_history_pair_valid_from",
+			"base_crncy_id",
+			"target_crncy_id",
+			"valid_from",
+		),
+		Index(
+			"ix_exchange_rate_history_valid_from_brin",
+			"valid_from",
+			postgresql_using="brin",
+		),
+		{"postgresql_partition_by": "RANGE (valid_from)"},
+	)
+
+	id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+	valid_from: Mapped[datetime] = mapped_column(
+		TIMESTAMP(timezone=True), primary_key=True, server_default=func.now()
+	)
+	rate_id: Mapped[int]
+	base_crncy_id: Mapped[int]
+	target_crncy_id: Mapped[int]
+	# scaled rate, null value means the rate was deleted
+	_value: Mapped[Optional[int]] = mapped_column(BigInteger)
+
+
+event.listen(
+	ExchangeRateHistoryORMModel.__table__, "after_create", DDL(CREATE_DEFAULT_PARTITION)
+)
+for ddl in CREATE_HISTORY_FUNCTION, *CREATE_HISTORY_TRIGGERS:
+	event.listen(CurrenciesExchangeRateORMModel.__table__, "after_create", DDL(ddl))
@@ -1,22 +1,37 @@
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Any
+
 from ...application.extdm import (
 	IdentifiedCurrency as Currency,
 	IdentifiedCurrenciesExchangeRate as ExchangeRate,
 )
 from .dbmodels import CurrencyORMModel, CurrenciesExchangeRateORMModel
-from ...domain.types import CurrencyCode, CurrencyName, CurrencySign
+from ...domain.types import (
+	INTERNED_MAX_SIZE,
+	CurrencyCode,
+	CurrencyName,
+	CurrencySign,
+	ExchangeRateValue,
+)
+from ...domain.fixedpoint import from_scaled_rate
 
 
-def orm_currency_to_dm_currency(currency: CurrencyORMModel) -> Currency:
-	code = (
-		CurrencyCode(currency.code) if isinstance(currency.code, str) else currency.code
-	)
-	name = (
-		CurrencyName(currency.name) if isinstance(currency.name, str) else currency.name
+@lru_cache(maxsize=INTERNED_MAX_SIZE)
+def _get_currency(id_: int, code: str, sign: str, name: str) -> Currency:
+	# currencies are immutable, so one instance is shared by all rates of the currency row version
+	return Currency(
+		CurrencyCode.interned(code),
+		CurrencySign.interned(sign),
+		CurrencyName.interned(name),
+		id_,
 	)
-	sign = (
-		CurrencySign(currency.sign) if isinstance(currency.sign, str) else currency.sign
+
+
+def orm_currency_to_dm_currency(currency: CurrencyORMModel) -> Currency:
+	return _get_currency(
+		currency.id, str(currency.code), str(currency.sign), str(currency.name)
 	)
-	return Currency(code, sign, name, currency.id)
 
 
 def orm_ex_rate_to_dm_ex_rate(ex_rate: CurrenciesExchangeRateORMModel) -> ExchangeRate:
@@ -26,3 +41,18 @@ def orm_ex_rate_to_dm_ex_rate(ex_rate: CurrenciesExchangeRateORMModel) -> Exchan
 		id=ex_rate.id,
 		rate=ex_rate.value,
 	)
+
+
+def record_to_dm_currency(record: Sequence[Any]) -> Currency:
+	"""Maps a row of currency id, code, sign and name columns."""
+	return _get_currency(*record)
+
+
+def record_to_dm_ex_rate(record: Sequence[Any]) -> ExchangeRate:
+	"""Maps a row of rate id and scaled value columns, followed by base and target currencies columns."""
+	return ExchangeRate(
+		base=_get_currency(*record[2:6]),
+		target=_get_currency(*record[6:10]),
+		id=record[0],
+		rate=ExchangeRateValue(from_scaled_rate(record[1])),
+	)
@@ -0,0 +1,82 @@
+from datetime import date
+
+import sqlalchemy.exc
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+RATE_HISTORY_TABLE = "exchange_rate_history"
+
+# rows written out of monthly partitions' ranges
+CREATE_DEFAULT_PARTITION = f"""
+CREATE TABLE IF NOT EXISTS {RATE_HISTORY_TABLE}_default
+PARTITION OF {RATE_HISTORY_TABLE} DEFAULT
+"""
+
+# every write to exchange_rate table, including cascade deletes, is appended to history.
+# Deleted rate is recorded with null value, so it doesn't exist since then
+CREATE_HISTORY_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION append_exchange_rate_history() RETURNS trigger AS $$
+BEGIN
+	IF TG_OP = 'DELETE' THEN
+		INSERT INTO {RATE_HISTORY_TABLE} (rate_id, base_crncy_id, target_crncy_id, _value, valid_from)
+		SELECT id, base_crncy_id, target_crncy_id, NULL, statement_timestamp() FROM old_rows;
+	ELSE
+		INSERT INTO {RATE_HISTORY_TABLE} (rate_id, base_crncy_id, target_crncy_id, _value, valid_from)
+		SELECT id, base_crncy_id, target_crncy_id, _value, statement_timestamp() FROM new_rows;
+	END IF;
+	RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+CREATE_HISTORY_TRIGGERS = [
+	f"""
+	CREATE TRIGGER exchange_rate_history_{event.lower()}
+	AFTER {event} ON exchange_rate
+	REFERENCING {"OLD" if event == "DELETE" else "NEW"} TABLE AS {"old" if event == "DELETE" else "new"}_rows
+	FOR EACH STATEMENT EXECUTE FUNCTION append_exchange_rate_history()
+	"""
+	for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+DROP_HISTORY_TRIGGERS = [
+	f"DROP TRIGGER IF EXISTS exchange_rate_history_{event} ON exchange_rate"
+	for event in ("insert", "update", "delete")
+]
+DROP_HISTORY_FUNCTION = "DROP FUNCTION IF EXISTS append_exchange_rate_history()"
+
+
+def get_next_month(month: date) -> date:
+	month = month.replace(day=1)
+	if month.month == 12:
+		return month.replace(year=month.year + 1, month=1)
+	return month.replace(month=month.month + 1)
+
+
+def get_month_partition_ddl(month: date) -> str:
+	start, end = month.replace(day=1), get_next_month(month)
+	return (
+		f"CREATE TABLE IF NOT EXISTS {RATE_HISTORY_TABLE}_{start:%Y_%m} "
+		f"PARTITION OF {RATE_HISTORY_TABLE} "
+		f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+	)
+
+
+async def create_month_partitions(
+	connection: AsyncConnection, since: date, months: int
+) -> list[str]:
+	"""
+	Creates history partitions for the given number of months, starting with the month of since date.
+	Returns names of the months, which partitions couldn't be created, since history rows of them are already
+	in the default partition.
+	"""
+	failed = []
+	month = since.replace(day=1)
+	for _ in range(months):
+		try:
+			async with connection.begin_nested():
+				await connection.execute(text(get_month_partition_ddl(month)))
+		except sqlalchemy.exc.DBAPIError:
+			failed.append(f"{month:%Y-%m}")
+		month = get_next_month(month)
+	return failed
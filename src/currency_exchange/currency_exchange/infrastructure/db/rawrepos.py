@@ -0,0 +1,112 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Sequence
+
+import asyncpg
+
+from currency_exchange.db.routing import read_only
+from .modelmapping import record_to_dm_currency, record_to_dm_ex_rate
+from .repos import CurrencyPostgresRepo, ExchangeRatesPostgresRepo
+from ...application.extdm import (
+	IdentifiedCurrency as Currency,
+	IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate,
+)
+from ...application.dto import GetCurrencyDto, GetExchangeRateDto
+from ...application import errors
+from ...domain.entities import CurrencyCode
+
+# Queries are sent as constant texts, so asyncpg prepares each of them once per connection and reuses the
+# prepared statement from the connection's statement cache afterwards
+
+SELECT_CURRENCIES = "SELECT id, code, sign, name FROM currency"
+SELECT_CURRENCY_BY_CODE = f"{SELECT_CURRENCIES} WHERE code = $1"
+SELECT_CURRENCY_BY_NAME = f"{SELECT_CURRENCIES} WHERE name = $1"
+SELECT_CURRENCIES_BY_CODES = f"{SELECT_CURRENCIES} WHERE code = any($1::text[])"
+
+SELECT_RATES = """
+SELECT rate.id, rate._value,
+	base.id, base.code, base.sign, base.name,
+	target.id, target.code, target.sign, target.name
+FROM exchange_rate AS rate
+JOIN currency AS base ON base.id = rate.base_crncy_id
+JOIN currency AS target ON target.id = rate.target_crncy_id
+"""
+SELECT_RATE = f"{SELECT_RATES} WHERE base.code = $1 AND target.code = $2"
+
+
+@asynccontextmanager
+async def _driver_connection(session_factory) -> AsyncIterator[asyncpg.Connection]:
+	"""
+	asyncpg connection of a session, taken from the same pool and joining the same transaction, when the
+	session is bound to a connection in transaction.
+	"""
+	async with session_factory() as session:
+		connection = await session.connection()
+		raw_connection = await connection.get_raw_connection()
+		yield raw_connection.driver_connection
+
+
+class CurrencyAsyncpgRepo(CurrencyPostgresRepo):
+	"""
+	Currencies repository, which reads currencies by asyncpg prepared statements and maps rows straight to
+	domain models, bypassing the ORM. Writes and streams are done as by the ORM repository.
+	"""
+
+	@read_only
+	async def get_all_currencies(self) -> list[Currency]:
+		async with _driver_connection(self._session_factory) as connection:
+			records = await connection.fetch(SELECT_CURRENCIES)
+		currencies = [record_to_dm_currency(record) for record in records]
+		self._currencies_index.reset(currencies)
+		return currencies
+
+	@read_only
+	async def get_currency(self, currency_data: GetCurrencyDto) -> Currency:
+		if currency_data.code:
+			query, arg = SELECT_CURRENCY_BY_CODE, currency_data.code.data
+			on_exc = f"code {currency_data.code}"
+		else:
+			query, arg = SELECT_CURRENCY_BY_NAME, currency_data.name.data
+			on_exc = f"name {currency_data.name}"
+		async with _driver_connection(self._session_factory) as connection:
+			records = await connection.fetch(query, arg)
+		if len(records) != 1:
+			raise errors.CurrencyDoesNotExistError(f"No currency with {on_exc}")
+		currency = record_to_dm_currency(records[0])
+		self._currencies_index.set(currency)
+		return currency
+
+
+class ExchangeRatesAsyncpgRepo(ExchangeRatesPostgresRepo):
+	"""
+	Exchange rates repository, which reads rates by asyncpg prepared statements, joining their currencies in
+	the same query, and maps rows straight to domain models, bypassing the ORM. Writes and other reads are done
+	as by the ORM repository.
+	"""
+
+	@read_only
+	async def get_all_rates(self) -> list[CurrenciesExchangeRate]:
+		async with _driver_connection(self._session_factory) as connection:
+			records = await connection.fetch(SELECT_RATES)
+		return [record_to_dm_ex_rate(record) for record in records]
+
+	@read_only
+	async def get_rate(self, rate: GetExchangeRateDto) -> CurrenciesExchangeRate:
+		async with _driver_connection(self._session_factory) as connection:
+			record = await connection.fetchrow(
+				SELECT_RATE, rate.base_currency.data, rate.target_currency.data
+			)
+		if record is None:
+			raise errors.ExchangeRateDoesntExistError(
+				f"No exchange rate for {rate.base_currency}->{rate.target_currency}"
+			)
+		return record_to_dm_ex_rate(record)
+
+	async def _fetch_currencies(
+		self, *currencies: *Sequence[CurrencyCode]
+	) -> list[Currency]:
+		async with _driver_connection(self._session_factory) as connection:
+			records = await connection.fetch(
+				SELECT_CURRENCIES_BY_CODES, [str(code) for code in currencies]
+			)
+		return [record_to_dm_currency(record) for record in records]
@@ -1,13 +1,40 @@
-from typing import Sequence
+from collections.abc import AsyncIterator
+from datetime import datetime
+from typing import Optional, Sequence
 from dataclasses import asdict as dataclass_asdict
 
-from sqlalchemy import select, insert, update, delete, or_, and_
+from sqlalchemy import (
+	select,
+	insert,
+	update,
+	delete,
+	or_,
+	and_,
+	literal,
+	null,
+	cast,
+	Integer,
+	true,
+	union_all,
+	func,
+	literal_column,
+	Boolean,
+	BigInteger,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 import sqlalchemy.exc
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import aliased
 
+from currency_exchange.db.changes import TopicVersion, publish_change
+from currency_exchange.db.crud import STREAM_BATCH_SIZE
+from currency_exchange.db.routing import read_only
+from currency_exchange.db.unitofwork import after_commit
+from .currenciesindex import CurrenciesIndex
+from ..dataversion import DataVersion
 from .modelmapping import orm_currency_to_dm_currency, orm_ex_rate_to_dm_ex_rate
+from ..memory.rategraph import ExchangeRatesGraph
 from ...application.errors import ExchangeRateAlreadyExistsError
 from ...application.extdm import (
 	IdentifiedCurrency as Currency,
@@ -17,11 +44,21 @@ from .dbmodels import (
 	CurrencyORMModel as CurrencyORM,
 	CurrenciesExchangeRateORMModel as ExRateORM,
 	CurrenciesExchangeRateORMModel,
+	ExchangeRateHistoryORMModel as ExRateHistoryORM,
+)
+from ...application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from ...application.interfaces import (
+	CurrencyRepoInterface,
+	ExchangeRatesRepoInterface,
+	ExchangeRateResolverInterface,
 )
-from ...application.interfaces import CurrencyRepoInterface, ExchangeRatesRepoInterface
 from ...application.dto import (
 	GetCurrencyDto,
 	GetExchangeRateDto,
+	CurrenciesQueryDto,
+	ExchangeRatesQueryDto,
 	AddCurrencyDto,
 	AddExchangeRateDto,
 	AlterCurrencyDto,
@@ -31,17 +68,58 @@ from ...application.dto import (
 )
 from ...application import errors
 from ...domain.entities import CurrencyCode
+from ...domain.fixedpoint import from_scaled_rate, quantize_rate, to_scaled_rate
+from ...domain.types import CurrencyName, CurrencySign, ExchangeRateValue
+
+NOT_NULL_VIOLATION = "23502"
+FOREIGN_KEY_VIOLATION = "23503"
+
+CURRENCIES_CHANGES_TOPIC = "currencies"
+EXCHANGE_RATES_CHANGES_TOPIC = "exchange_rates"
 
 
 class CurrencyPostgresRepo(CurrencyRepoInterface):
-	def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+	def __init__(
+		self,
+		session_factory: async_sessionmaker[AsyncSession],
+		currencies_index: Optional[CurrenciesIndex] = None,
+		data_version: Optional[DataVersion] = None,
+	) -> None:
 		self._session_factory = session_factory
+		self._currencies_index = (
+			currencies_index if currencies_index is not None else CurrenciesIndex()
+		)
+		self._data_version = data_version if data_version is not None else DataVersion()
 
+	@read_only
 	async def get_all_currencies(self) -> list[Currency]:
 		async with self._session_factory() as session:
 			res = await session.scalars(select(CurrencyORM))
-		return [orm_currency_to_dm_currency(c) for c in res.all()]
+		currencies = [orm_currency_to_dm_currency(c) for c in res.all()]
+		self._currencies_index.reset(currencies)
+		return currencies
+
+	async def stream_currencies(
+		self, query: CurrenciesQueryDto
+	) -> AsyncIterator[Currency]:
+		stmt = select(CurrencyORM).order_by(CurrencyORM.code)
+		if query.codes is not None:
+			stmt = stmt.where(CurrencyORM.code.in_([code.data for code in query.codes]))
+		if query.after_code is not None:
+			stmt = stmt.where(CurrencyORM.code > query.after_code.data)
+		if query.limit is not None:
+			stmt = stmt.limit(query.limit)
+		async with self._session_factory() as session:
+			async with session.begin():
+				res = await session.stream_scalars(
+					stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+				)
+				async for currency_model in res:
+					currency = orm_currency_to_dm_currency(currency_model)
+					self._currencies_index.set(currency)
+					yield currency
 
+	@read_only
 	async def get_currency(self, currency_data: GetCurrencyDto) -> Currency:
 		if currency_data.code:
 			criteria = CurrencyORM.code == currency_data.code.data
@@ -52,9 +130,11 @@ class CurrencyPostgresRepo(CurrencyRepoInterface):
 		async with self._session_factory() as session:
 			res = await session.scalars(select(CurrencyORM).where(criteria))
 		try:
-			return orm_currency_to_dm_currency(res.one())
+			currency = orm_currency_to_dm_currency(res.one())
 		except NoResultFound:
 			raise errors.CurrencyDoesNotExistError(f"No currency with {on_exc}")
+		self._currencies_index.set(currency)
+		return currency
 
 	async def save_currency(self, currency: AddCurrencyDto) -> Currency:
 		async with self._session_factory() as session:
@@ -74,8 +154,14 @@ class CurrencyPostgresRepo(CurrencyRepoInterface):
 					raise errors.CurrencyAlreadyExistsError(
 						f"Currency with code {currency.code} already exists"
 					) from e
+				change = await publish_change(
+					session, CURRENCIES_CHANGES_TOPIC, [currency.code.data]
+				)
+		after_commit(lambda: self._data_version.update(change))
 
-		return orm_currency_to_dm_currency(res.one())
+		saved_currency = orm_currency_to_dm_currency(res.one())
+		after_commit(lambda: self._currencies_index.set(saved_currency))
+		return saved_currency
 
 	async def update_currency(self, currency: AlterCurrencyDto) -> Currency:
 		update_values = {
@@ -91,12 +177,19 @@ class CurrencyPostgresRepo(CurrencyRepoInterface):
 					.values(**update_values)
 					.returning(CurrencyORM),
 				)
-		try:
-			return orm_currency_to_dm_currency(res.one())
-		except NoResultFound:
+				currency_model = res.one_or_none()
+				if currency_model is not None:
+					change = await publish_change(
+						session, CURRENCIES_CHANGES_TOPIC, [currency.code.data]
+					)
+		if currency_model is None:
 			raise errors.CurrencyDoesNotExistError(
 				f"No currency with code {currency.code} to alter"
 			)
+		after_commit(lambda: self._data_version.update(change))
+		updated_currency = orm_currency_to_dm_currency(currency_model)
+		after_commit(lambda: self._currencies_index.set(updated_currency))
+		return updated_currency
 
 	async def delete_currency(self, currency: DeleteCurrencyDto) -> Currency:
 		async with self._session_factory() as session:
@@ -106,23 +199,85 @@ class CurrencyPostgresRepo(CurrencyRepoInterface):
 					.where(CurrencyORM.code == currency.code.data)
 					.returning(CurrencyORM)
 				)
-		try:
-			return orm_currency_to_dm_currency(res.one())
-		except NoResultFound:
+				currency_model = res.one_or_none()
+				if currency_model is not None:
+					# exchange rates of the currency are deleted by cascade
+					change = await publish_change(
+						session, CURRENCIES_CHANGES_TOPIC, [currency.code.data]
+					)
+		self._currencies_index.remove(currency.code.data)
+		if currency_model is None:
 			raise errors.CurrencyDoesNotExistError(
 				f"No currency with code {currency.code} to delete"
 			)
+		after_commit(lambda: self._data_version.update(change))
+		return orm_currency_to_dm_currency(currency_model)
 
 
-class ExchangeRatesPostgresRepo(ExchangeRatesRepoInterface):
-	def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+class ExchangeRatesPostgresRepo(
+	ExchangeRatesRepoInterface, ExchangeRateResolverInterface
+):
+	def __init__(
+		self,
+		session_factory: async_sessionmaker[AsyncSession],
+		currencies_index: Optional[CurrenciesIndex] = None,
+		data_version: Optional[DataVersion] = None,
+	) -> None:
 		self._session_factory = session_factory
+		self._currencies_index = (
+			currencies_index if currencies_index is not None else CurrenciesIndex()
+		)
+		self._data_version = data_version if data_version is not None else DataVersion()
 
+	@read_only
 	async def get_all_rates(self) -> list[CurrenciesExchangeRate]:
 		async with self._session_factory() as session:
 			res = await session.scalars(select(CurrenciesExchangeRateORMModel))
 		return [orm_ex_rate_to_dm_ex_rate(er) for er in res.all()]
 
+	async def stream_rates(
+		self, query: ExchangeRatesQueryDto
+	) -> AsyncIterator[CurrenciesExchangeRate]:
+		"""
+		Yields rates as they are fetched from server side cursor. Currencies are joined in the same query
+		and mapped once per stream, instead of loading them for every fetched batch.
+		"""
+		base = aliased(CurrencyORM)
+		target = aliased(CurrencyORM)
+		stmt = (
+			select(ExRateORM.id, ExRateORM._value, base, target)
+			.join(base, ExRateORM.base_crncy)
+			.join(target, ExRateORM.target_crncy)
+			.order_by(ExRateORM.id)
+		)
+		if query.base_currency is not None:
+			stmt = stmt.where(base.code == query.base_currency.data)
+		if query.target_currency is not None:
+			stmt = stmt.where(target.code == query.target_currency.data)
+		if query.after_id is not None:
+			stmt = stmt.where(ExRateORM.id > query.after_id)
+		if query.limit is not None:
+			stmt = stmt.limit(query.limit)
+		currencies: dict[int, Currency] = {}
+		async with self._session_factory() as session:
+			async with session.begin():
+				res = await session.stream(
+					stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+				)
+				async for rate_id, value, base_model, target_model in res:
+					for currency_model in base_model, target_model:
+						if currency_model.id not in currencies:
+							currencies[currency_model.id] = orm_currency_to_dm_currency(
+								currency_model
+							)
+					yield CurrenciesExchangeRate(
+						currencies[base_model.id],
+						currencies[target_model.id],
+						ExchangeRateValue(from_scaled_rate(value)),
+						id=rate_id,
+					)
+
+	@read_only
 	async def get_rate(self, rate: GetExchangeRateDto) -> CurrenciesExchangeRate:
 		async with self._session_factory() as session:
 			base = aliased(CurrencyORM)
@@ -142,72 +297,232 @@ class ExchangeRatesPostgresRepo(ExchangeRatesRepoInterface):
 			)
 
 	async def save_rate(self, rate: AddExchangeRateDto) -> CurrenciesExchangeRate:
-		id_res = await self._get_currencies_ids(
-			rate.base_currency.data, rate.target_currency.data
-		)
-		async with self._session_factory() as session:
-			async with session.begin():
-				try:
+		return await self._save_rate(rate, retry=True)
+
+	async def _save_rate(
+		self, rate: AddExchangeRateDto, *, retry: bool
+	) -> CurrenciesExchangeRate:
+		try:
+			async with self._session_factory() as session:
+				async with session.begin():
 					res = await session.scalars(
 						insert(ExRateORM)
 						.values(
-							base_crncy_id=id_res[rate.base_currency],
-							target_crncy_id=id_res[rate.target_currency],
-							value=rate.rate.value,
+							base_crncy_id=self._currency_id_clause(rate.base_currency),
+							target_crncy_id=self._currency_id_clause(
+								rate.target_currency
+							),
+							_value=to_scaled_rate(rate.rate.value),
 						)
 						.returning(ExRateORM)
 					)
-				except sqlalchemy.exc.IntegrityError as e:
-					raise ExchangeRateAlreadyExistsError(
-						f"Exchange rate {rate.base_currency}-{rate.target_currency} "
-						f"already exists"
-					) from e
-
-				return orm_ex_rate_to_dm_ex_rate(res.one())
+					saved_rate = orm_ex_rate_to_dm_ex_rate(res.one())
+					change = await self._publish_change(session, rate)
+		except sqlalchemy.exc.IntegrityError as e:
+			if getattr(e.orig, "sqlstate", None) in (
+				NOT_NULL_VIOLATION,
+				FOREIGN_KEY_VIOLATION,
+			):
+				await self._check_currencies_exist(
+					rate.base_currency.data, rate.target_currency.data
+				)
+				if retry and getattr(e.orig, "sqlstate", None) == FOREIGN_KEY_VIOLATION:
+					# currencies ids were obsolete in the index, and they're refreshed now
+					return await self._save_rate(rate, retry=False)
+				raise
+			raise ExchangeRateAlreadyExistsError(
+				f"Exchange rate {rate.base_currency}-{rate.target_currency} "
+				f"already exists"
+			) from e
+		after_commit(lambda: self._data_version.update(change))
+		return saved_rate
 
 	async def update_rate(self, rate: AlterExchangeRateDto) -> CurrenciesExchangeRate:
-		id_res = await self._get_currencies_ids(
-			rate.base_currency.data, rate.target_currency.data
-		)
+		return await self._update_rate(rate, retry=True)
+
+	async def _update_rate(
+		self, rate: AlterExchangeRateDto, *, retry: bool
+	) -> CurrenciesExchangeRate:
 		async with self._session_factory() as session:
 			async with session.begin():
 				res = await session.scalars(
 					update(ExRateORM)
 					.where(
-						ExRateORM.base_crncy_id == id_res[rate.base_currency],
-						ExRateORM.target_crncy_id == id_res[rate.target_currency],
+						ExRateORM.base_crncy_id
+						== self._currency_id_clause(rate.base_currency),
+						ExRateORM.target_crncy_id
+						== self._currency_id_clause(rate.target_currency),
 					)
-					.values(value=rate.new_rate.value)
+					.values(_value=to_scaled_rate(rate.new_rate.value))
 					.returning(ExRateORM)
 				)
-		try:
-			return orm_ex_rate_to_dm_ex_rate(res.one())
-		except NoResultFound:
+				rate_model = res.one_or_none()
+				if rate_model is not None:
+					change = await self._publish_change(session, rate)
+		if rate_model is None:
+			obsolete = await self._refresh_currencies_ids(
+				rate.base_currency.data, rate.target_currency.data
+			)
+			if retry and obsolete:
+				# rate was looked for by obsolete currencies ids, and they're refreshed now
+				return await self._update_rate(rate, retry=False)
 			raise errors.ExchangeRateDoesntExistError(
 				f"No exchange rate for {rate.base_currency}->{rate.target_currency}"
 			)
+		after_commit(lambda: self._data_version.update(change))
+		return orm_ex_rate_to_dm_ex_rate(rate_model)
 
 	async def delete_rate(self, rate: DeleteExchangeRateDto) -> CurrenciesExchangeRate:
-		id_res = await self._get_currencies_ids(
-			rate.base_currency.data, rate.target_currency.data
-		)
+		return await self._delete_rate(rate, retry=True)
+
+	async def _delete_rate(
+		self, rate: DeleteExchangeRateDto, *, retry: bool
+	) -> CurrenciesExchangeRate:
 		async with self._session_factory() as session:
 			async with session.begin():
 				res = await session.scalars(
 					delete(ExRateORM)
 					.where(
-						ExRateORM.base_crncy_id == id_res[rate.base_currency],
-						ExRateORM.target_crncy_id == id_res[rate.target_currency],
+						ExRateORM.base_crncy_id
+						== self._currency_id_clause(rate.base_currency),
+						ExRateORM.target_crncy_id
+						== self._currency_id_clause(rate.target_currency),
 					)
 					.returning(ExRateORM)
 				)
-		try:
-			return orm_ex_rate_to_dm_ex_rate(res.one())
-		except NoResultFound:
+				rate_model = res.one_or_none()
+				if rate_model is not None:
+					change = await self._publish_change(session, rate)
+		if rate_model is None:
+			obsolete = await self._refresh_currencies_ids(
+				rate.base_currency.data, rate.target_currency.data
+			)
+			if retry and obsolete:
+				# rate was looked for by obsolete currencies ids, and they're refreshed now
+				return await self._delete_rate(rate, retry=False)
 			raise errors.ExchangeRateDoesntExistError(
 				f"No exchange rate for {rate.base_currency}->{rate.target_currency}"
 			)
+		after_commit(lambda: self._data_version.update(change))
+		return orm_ex_rate_to_dm_ex_rate(rate_model)
+
+	async def upsert_rates(
+		self, rates: list[AddExchangeRateDto]
+	) -> list[tuple[CurrenciesExchangeRate, bool] | errors.DataRequestError]:
+		"""
+		Inserts new rates and updates existing ones in a single statement. Returns saved rates, each along with
+		a flag telling whether it was created, in order of the given ones, or errors in place of rates, which
+		currencies weren't found. Rate given several times for the same currencies pair is saved as the last one.
+		"""
+		return await self._upsert_rates(rates, retry=True)
 
+	async def _upsert_rates(
+		self, rates: list[AddExchangeRateDto], *, retry: bool
+	) -> list[tuple[CurrenciesExchangeRate, bool] | errors.DataRequestError]:
+		codes = {
+			code.data
+			for rate in rates
+			for code in (rate.base_currency, rate.target_currency)
+		}
+		currencies_ids = await self._find_currencies_ids(*codes)
+		values: dict[tuple[int, int], int] = {}
+		for rate in rates:
+			base_id = currencies_ids.get(rate.base_currency.data)
+			target_id = currencies_ids.get(rate.target_currency.data)
+			if base_id is not None and target_id is not None:
+				values[base_id, target_id] = to_scaled_rate(rate.rate.value)
+
+		saved_rates: dict[tuple[int, int], tuple[CurrenciesExchangeRate, bool]] = {}
+		if values:
+			try:
+				saved_rates, change = await self._upsert_rates_values(values)
+			except sqlalchemy.exc.IntegrityError as e:
+				if (
+					not retry
+					or getattr(e.orig, "sqlstate", None) != FOREIGN_KEY_VIOLATION
+				):
+					raise
+				# some currencies were removed by another process, index is refreshed on retry
+				for code in codes:
+					self._currencies_index.remove(code)
+				return await self._upsert_rates(rates, retry=False)
+			after_commit(lambda: self._data_version.update(change))
+
+		results: list[
+			tuple[CurrenciesExchangeRate, bool] | errors.DataRequestError
+		] = []
+		for rate in rates:
+			ids = (
+				currencies_ids.get(rate.base_currency.data),
+				currencies_ids.get(rate.target_currency.data),
+			)
+			if ids in saved_rates:
+				results.append(saved_rates[ids])
+				continue
+			notfound = [
+				code.data
+				for code in (rate.base_currency, rate.target_currency)
+				if code.data not in currencies_ids
+			]
+			results.append(
+				errors.CurrencyDoesNotExistError(
+					f"Currency(ies) with code(s) {', '.join(notfound)} not found"
+				)
+			)
+		return results
+
+	async def _upsert_rates_values(
+		self, values: dict[tuple[int, int], int]
+	) -> tuple[
+		dict[tuple[int, int], tuple[CurrenciesExchangeRate, bool]], TopicVersion
+	]:
+		base_ids, target_ids = zip(*values)
+		rows = select(
+			func.unnest(literal(list(base_ids), ARRAY(Integer))),
+			func.unnest(literal(list(target_ids), ARRAY(Integer))),
+			func.unnest(literal(list(values.values()), ARRAY(BigInteger))),
+		)
+		stmt = pg_insert(ExRateORM).from_select(
+			[ExRateORM.base_crncy_id, ExRateORM.target_crncy_id, ExRateORM._value], rows
+		)
+		stmt = stmt.on_conflict_do_update(
+			index_elements=[ExRateORM.base_crncy_id, ExRateORM.target_crncy_id],
+			set_={ExRateORM._value: stmt.excluded._value},
+		).returning(
+			ExRateORM.id,
+			ExRateORM.base_crncy_id,
+			ExRateORM.target_crncy_id,
+			ExRateORM._value,
+			# row version is zero for inserted rows only
+			literal_column("xmax = 0", Boolean),
+		)
+		async with self._session_factory() as session:
+			async with session.begin():
+				res = (await session.execute(stmt)).all()
+				change = await publish_change(
+					session,
+					EXCHANGE_RATES_CHANGES_TOPIC,
+					[
+						f"{self._currencies_index.get_currency(base_id).code}"
+						f"{self._currencies_index.get_currency(target_id).code}"
+						for base_id, target_id in values
+					],
+				)
+
+		return {
+			(base_id, target_id): (
+				CurrenciesExchangeRate(
+					self._currencies_index.get_currency(base_id),
+					self._currencies_index.get_currency(target_id),
+					ExchangeRateValue(from_scaled_rate(value)),
+					id=id_,
+				),
+				created,
+			)
+			for id_, base_id, target_id, value, created in res
+		}, change
+
+	@read_only
 	async def get_cross_rates(
 		self, rate: GetExchangeRateDto
 	) -> list[tuple[CurrenciesExchangeRate, CurrenciesExchangeRate]]:
@@ -273,16 +588,241 @@ class ExchangeRatesPostgresRepo(ExchangeRatesRepoInterface):
 			for rate1, rate2 in res
 		]
 
-	async def _get_currencies_ids(
-		self, *currencies: *Sequence[CurrencyCode]
-	) -> dict[CurrencyCode, int]:
+	@read_only
+	async def get_rates_chain(
+		self, rate: GetExchangeRateDto, max_hops: int
+	) -> list[CurrenciesExchangeRate]:
+		"""
+		Searches the chain from both currencies at once, fetching on each hop only rates of the currencies,
+		reached from the side with fewer of them. Once rates of both sides are fetched for hops, which sum up to
+		n, all chains not longer than n are known, so the first chain found is the shortest one.
+		"""
+		base, target = rate.base_currency.data, rate.target_currency.data
+		rates_graph = ExchangeRatesGraph()
+		reached = [{base}, {target}]
+		frontiers = [{base}, {target}]
+		rates_chain = None
+		for hops in range(1, max_hops + 1):
+			side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+			rates = await self._fetch_currencies_rates(frontiers[side])
+			for er in rates:
+				rates_graph.set_rate(er)
+			frontiers[side] = {
+				code
+				for er in rates
+				for code in (er.base.code.data, er.target.code.data)
+			} - reached[side]
+			reached[side] |= frontiers[side]
+			if not frontiers[side]:
+				# all rates, connected with the currency, are fetched, so no more chains could be found
+				rates_chain = rates_graph.get_rates_chain(base, target, max_hops)
+				break
+			rates_chain = rates_graph.get_rates_chain(base, target, hops)
+			if rates_chain is not None:
+				break
+		if rates_chain is None:
+			raise errors.ExchangeRateDoesntExistError(
+				f"No exchange rates chain for {rate.base_currency}->{rate.target_currency} "
+				f"within {max_hops} rates"
+			)
+		return rates_chain
+
+	async def _fetch_currencies_rates(
+		self, codes: set[str]
+	) -> list[CurrenciesExchangeRate]:
+		base = aliased(CurrencyORM)
+		target = aliased(CurrencyORM)
+		async with self._session_factory() as session:
+			res = await session.scalars(
+				select(ExRateORM)
+				.join(base, ExRateORM.base_crncy)
+				.join(target, ExRateORM.target_crncy)
+				.where(or_(base.code.in_(codes), target.code.in_(codes)))
+			)
+		return [orm_ex_rate_to_dm_ex_rate(er) for er in res.all()]
+
+	@read_only
+	async def get_rate_as_of(
+		self, rate: GetExchangeRateDto, as_of: datetime
+	) -> CurrenciesExchangeRate:
+		"""
+		Fetches the latest value of the rate written at or before as_of moment. Lookup is a backward scan of
+		the history index on currencies pair and time, limited to one row.
+		"""
+		currencies_ids = await self._get_currencies_ids(
+			rate.base_currency.data, rate.target_currency.data
+		)
+		base_id = currencies_ids[rate.base_currency.data]
+		target_id = currencies_ids[rate.target_currency.data]
+		async with self._session_factory() as session:
+			res = await session.execute(
+				select(ExRateHistoryORM.rate_id, ExRateHistoryORM._value)
+				.where(
+					ExRateHistoryORM.base_crncy_id == base_id,
+					ExRateHistoryORM.target_crncy_id == target_id,
+					ExRateHistoryORM.valid_from <= as_of,
+				)
+				.order_by(
+					ExRateHistoryORM.valid_from.desc(), ExRateHistoryORM.id.desc()
+				)
+				.limit(1)
+			)
+		found = res.one_or_none()
+		# rate didn't exist yet or was deleted at that moment
+		if found is None or found._value is None:
+			raise errors.ExchangeRateDoesntExistError(
+				f"No exchange rate for {rate.base_currency}->{rate.target_currency} "
+				f"as of {as_of.isoformat()}"
+			)
+		return CurrenciesExchangeRate(
+			self._currencies_index.get_currency(base_id),
+			self._currencies_index.get_currency(target_id),
+			ExchangeRateValue(from_scaled_rate(found._value)),
+			id=found.rate_id,
+		)
+
+	@read_only
+	async def resolve_rate(
+		self, rate: GetExchangeRateDto, *, rate_fetch_strategy: ERFetchStrat
+	) -> tuple[CurrenciesExchangeRate, ERFetchStrat]:
+		"""
+		Fetches straight, reversed and cross rate candidates, allowed by the strategy, in a single statement.
+		Candidates are ranked by fetch strategy flag value, so straight rate is preferred over reversed one, and
+		reversed one over cross rate.
+		"""
+		base = (
+			select(CurrencyORM.id, CurrencyORM.code, CurrencyORM.name, CurrencyORM.sign)
+			.where(CurrencyORM.code == rate.base_currency.data)
+			.cte("base")
+		)
+		target = (
+			select(CurrencyORM.id, CurrencyORM.code, CurrencyORM.name, CurrencyORM.sign)
+			.where(CurrencyORM.code == rate.target_currency.data)
+			.cte("target")
+		)
+
+		candidates = [
+			select(
+				literal(ERFetchStrat.BY_STRAIGHT_RATE.value).label("fetched_by"),
+				ExRateORM.id.label("rate_id"),
+				ExRateORM.value.label("value"),
+				cast(null(), Integer).label("common_crncy_id"),
+			).where(
+				ExRateORM.base_crncy_id == base.c.id,
+				ExRateORM.target_crncy_id == target.c.id,
+			)
+		]
+		if ERFetchStrat.BY_REVERSED_RATE in rate_fetch_strategy:
+			candidates.append(
+				select(
+					literal(ERFetchStrat.BY_REVERSED_RATE.value),
+					ExRateORM.id,
+					1 / ExRateORM.value,
+					cast(null(), Integer),
+				).where(
+					ExRateORM.base_crncy_id == target.c.id,
+					ExRateORM.target_crncy_id == base.c.id,
+				)
+			)
+		if ERFetchStrat.BY_COMMON_CURRENCY in rate_fetch_strategy:
+			# every rate is walkable in both directions
+			edges = union_all(
+				select(
+					ExRateORM.base_crncy_id.label("src_id"),
+					ExRateORM.target_crncy_id.label("dst_id"),
+					ExRateORM.value.label("value"),
+				),
+				select(
+					ExRateORM.target_crncy_id,
+					ExRateORM.base_crncy_id,
+					1 / ExRateORM.value,
+				),
+			).cte("edges")
+			edge1, edge2 = edges.alias("edge1"), edges.alias("edge2")
+			candidates.append(
+				select(
+					literal(ERFetchStrat.BY_COMMON_CURRENCY.value),
+					cast(null(), Integer),
+					edge1.c.value * edge2.c.value,
+					edge1.c.dst_id,
+				)
+				.join_from(edge1, edge2, edge1.c.dst_id == edge2.c.src_id)
+				.where(
+					edge1.c.src_id == base.c.id,
+					edge2.c.dst_id == target.c.id,
+					edge1.c.dst_id.not_in([base.c.id, target.c.id]),
+				)
+			)
+		best_candidate = (
+			select(union_all(*candidates).subquery())
+			.order_by("fetched_by", "common_crncy_id")
+			.limit(1)
+			.subquery()
+		)
+
 		async with self._session_factory() as session:
-			id_res = await session.execute(
-				select(CurrencyORM.id, CurrencyORM.code).where(
-					CurrencyORM.code.in_(currencies)
+			res = await session.execute(
+				select(
+					base.c.id.label("base_id"),
+					base.c.code.label("base_code"),
+					base.c.name.label("base_name"),
+					base.c.sign.label("base_sign"),
+					target.c.id.label("target_id"),
+					target.c.code.label("target_code"),
+					target.c.name.label("target_name"),
+					target.c.sign.label("target_sign"),
+					best_candidate,
+				).select_from(
+					base.join(target, true(), full=True).outerjoin(
+						best_candidate, true()
+					)
 				)
 			)
-		id_res = {code: id_ for id_, code in id_res}
+		row = res.one_or_none()
+
+		if row is None or row.fetched_by is None:
+			if ERFetchStrat.BY_COMMON_CURRENCY in rate_fetch_strategy:
+				notfound = [
+					code.data
+					for code, id_ in (
+						(rate.base_currency, row and row.base_id),
+						(rate.target_currency, row and row.target_id),
+					)
+					if id_ is None
+				]
+				if notfound:
+					raise errors.CurrencyDoesNotExistError(
+						f"Currency(ies) with code(s) {', '.join(notfound)} not found"
+					)
+			raise errors.ExchangeRateDoesntExistError(
+				f"No exchange rate for {rate.base_currency}->{rate.target_currency}"
+			)
+
+		return (
+			CurrenciesExchangeRate(
+				Currency(
+					CurrencyCode(row.base_code),
+					CurrencySign(row.base_sign),
+					CurrencyName(row.base_name),
+					row.base_id,
+				),
+				Currency(
+					CurrencyCode(row.target_code),
+					CurrencySign(row.target_sign),
+					CurrencyName(row.target_name),
+					row.target_id,
+				),
+				# reversed and cross rates are computed in floats by the db
+				ExchangeRateValue(quantize_rate(row.value)),
+				id=row.rate_id,
+			),
+			ERFetchStrat(row.fetched_by),
+		)
+
+	async def _get_currencies_ids(
+		self, *currencies: *Sequence[CurrencyCode]
+	) -> dict[CurrencyCode, int]:
+		id_res = await self._find_currencies_ids(*currencies)
 		notfound = set(code for code in id_res).symmetric_difference(set(currencies))
 		if notfound:
 			raise errors.CurrencyDoesNotExistError(
@@ -290,3 +830,68 @@ class ExchangeRatesPostgresRepo(ExchangeRatesRepoInterface):
 			)
 
 		return id_res
+
+	async def _find_currencies_ids(
+		self, *currencies: *Sequence[CurrencyCode]
+	) -> dict[CurrencyCode, int]:
+		"""Ids of found currencies, looked up in the index first."""
+		id_res = {
+			code: id_
+			for code in currencies
+			if (id_ := self._currencies_index.get_id(code)) is not None
+		}
+		if len(id_res) == len(currencies):
+			return id_res
+
+		for currency in await self._fetch_currencies(*currencies):
+			self._currencies_index.set(currency)
+			id_res[currency.code.data] = currency.id
+		return id_res
+
+	async def _fetch_currencies(
+		self, *currencies: *Sequence[CurrencyCode]
+	) -> list[Currency]:
+		async with self._session_factory() as session:
+			res = await session.scalars(
+				select(CurrencyORM).where(CurrencyORM.code.in_(currencies))
+			)
+		return [orm_currency_to_dm_currency(c) for c in res.all()]
+
+	async def _check_currencies_exist(self, *currencies: *Sequence[CurrencyCode]):
+		# index could be obsolete, if the currencies were removed by another process
+		for code in currencies:
+			self._currencies_index.remove(code)
+		await self._get_currencies_ids(*currencies)
+
+	async def _refresh_currencies_ids(
+		self, *currencies: *Sequence[CurrencyCode]
+	) -> bool:
+		"""Checks that currencies exist, telling whether any of their ids in the index was obsolete."""
+		indexed_ids = {code: self._currencies_index.get_id(code) for code in currencies}
+		await self._check_currencies_exist(*currencies)
+		return any(
+			id_ is not None and id_ != self._currencies_index.get_id(code)
+			for code, id_ in indexed_ids.items()
+		)
+
+	@staticmethod
+	async def _publish_change(
+		session: AsyncSession,
+		rate: AddExchangeRateDto | AlterExchangeRateDto | DeleteExchangeRateDto,
+	) -> TopicVersion:
+		return await publish_change(
+			session,
+			EXCHANGE_RATES_CHANGES_TOPIC,
+			[f"{rate.base_currency.data}{rate.target_currency.data}"],
+		)
+
+	def _currency_id_clause(self, code: CurrencyCode):
+		"""Currency id from the index, or a subquery selecting it, when currency isn't in the index."""
+		id_ = self._currencies_index.get_id(code.data)
+		if id_ is not None:
+			return id_
+		return (
+			select(CurrencyORM.id)
+			.where(CurrencyORM.code == code.data)
+			.scalar_subquery()
+		)
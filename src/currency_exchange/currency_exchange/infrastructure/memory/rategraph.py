@@ -0,0 +1,182 @@
+from collections import deque
+from collections.abc import Iterable
+from typing import Optional
+
+from ...application.extdm import (
+	IdentifiedCurrency as Currency,
+	IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate,
+)
+
+
+class ExchangeRatesGraph:
+	"""
+	In-process index of currencies and exchange rates between them.
+
+	Currencies are vertices, and every stored exchange rate is an edge that can be walked in both directions
+	(backwards through the reversed rate). Vertices are keyed by plain currency code strings.
+	"""
+
+	def __init__(
+		self,
+		currencies: Iterable[Currency] = (),
+		rates: Iterable[CurrenciesExchangeRate] = (),
+	) -> None:
+		self._currencies: dict[str, Currency] = {}
+		self._rates: dict[tuple[str, str], CurrenciesExchangeRate] = {}
+		# dicts are used as insertion ordered sets, so that traversal order is deterministic
+		self._neighbours: dict[str, dict[str, None]] = {}
+
+		for currency in currencies:
+			self.set_currency(currency)
+		for rate in rates:
+			self.set_rate(rate)
+
+	def __len__(self) -> int:
+		return len(self._rates)
+
+	def get_currency(self, code: str) -> Optional[Currency]:
+		return self._currencies.get(code)
+
+	def get_all_currencies(self) -> list[Currency]:
+		return list(self._currencies.values())
+
+	def set_currency(self, currency: Currency) -> None:
+		code = currency.code.data
+		self._currencies[code] = currency
+		self._neighbours.setdefault(code, {})
+
+		for neighbour in self._neighbours[code]:
+			for key in (code, neighbour), (neighbour, code):
+				rate = self._rates.get(key)
+				if rate is not None:
+					self._rates[key] = self._with_currencies(rate)
+
+	def remove_currency(self, code: str) -> list[CurrenciesExchangeRate]:
+		removed_rates = [
+			rate
+			for neighbour in list(self._neighbours.get(code, ()))
+			for rate in (
+				self.remove_rate(code, neighbour),
+				self.remove_rate(neighbour, code),
+			)
+			if rate is not None
+		]
+		self._currencies.pop(code, None)
+		self._neighbours.pop(code, None)
+		return removed_rates
+
+	def get_rate(self, base: str, target: str) -> Optional[CurrenciesExchangeRate]:
+		return self._rates.get((base, target))
+
+	def get_all_rates(self) -> list[CurrenciesExchangeRate]:
+		return list(self._rates.values())
+
+	def set_rate(self, rate: CurrenciesExchangeRate) -> None:
+		for currency in rate.base, rate.target:
+			if currency.code.data not in self._currencies:
+				self.set_currency(currency)
+		base, target = rate.base.code.data, rate.target.code.data
+		self._rates[base, target] = self._with_currencies(rate)
+		self._neighbours[base][target] = None
+		self._neighbours[target][base] = None
+
+	def remove_rate(self, base: str, target: str) -> Optional[CurrenciesExchangeRate]:
+		rate = self._rates.pop((base, target), None)
+		if rate is not None and (target, base) not in self._rates:
+			self._neighbours[base].pop(target, None)
+			self._neighbours[target].pop(base, None)
+		return rate
+
+	def get_edge(self, src: str, dst: str) -> Optional[CurrenciesExchangeRate]:
+		"""Exchange rate src->dst, either stored straight or computed from the reversed one."""
+		rate = self._rates.get((src, dst))
+		if rate is not None:
+			return rate
+		reversed_rate = self._rates.get((dst, src))
+		if reversed_rate is None:
+			return None
+		rate = reversed_rate.get_reversed()
+		rate.id = reversed_rate.id
+		return rate
+
+	def get_cross_rates(
+		self, base: str, target: str
+	) -> list[tuple[CurrenciesExchangeRate, CurrenciesExchangeRate]]:
+		common_currencies = [
+			code
+			for code in self._neighbours.get(base, ())
+			if code != target and target in self._neighbours[code]
+		]
+		return [
+			(rate1, rate2)
+			for common in common_currencies
+			for rate1 in self._stored_rates_between(base, common)
+			for rate2 in self._stored_rates_between(common, target)
+		]
+
+	def find_path(self, base: str, target: str, max_hops: int) -> Optional[list[str]]:
+		"""
+		Breadth-first search of the shortest sequence of currency codes leading from base to target, which
+		is not longer than max_hops exchange rates.
+		"""
+		if base not in self._neighbours or target not in self._neighbours:
+			return None
+		if base == target:
+			return [base]
+
+		previous: dict[str, Optional[str]] = {base: None}
+		frontier = deque([(base, 0)])
+		while frontier:
+			code, hops = frontier.popleft()
+			if hops == max_hops:
+				continue
+			for neighbour in self._neighbours[code]:
+				if neighbour in previous:
+					continue
+				previous[neighbour] = code
+				if neighbour == target:
+					return self._restore_path(previous, target)
+				frontier.append((neighbour, hops + 1))
+
+		return None
+
+	def get_rates_chain(
+		self, base: str, target: str, max_hops: int
+	) -> Optional[list[CurrenciesExchangeRate]]:
+		path = self.find_path(base, target, max_hops)
+		if path is None or len(path) < 2:
+			return None
+		return [self.get_edge(src, dst) for src, dst in zip(path, path[1:])]
+
+	def _stored_rates_between(
+		self, code1: str, code2: str
+	) -> list[CurrenciesExchangeRate]:
+		return [
+			rate
+			for rate in (
+				self._rates.get((code1, code2)),
+				self._rates.get((code2, code1)),
+			)
+			if rate is not None
+		]
+
+	def _with_currencies(self, rate: CurrenciesExchangeRate) -> CurrenciesExchangeRate:
+		# keeps rates referencing the same currency objects the graph holds
+		base = self._currencies[rate.base.code.data]
+		target = self._currencies[rate.target.code.data]
+		if rate.base is base and rate.target is target:
+			return rate
+		return CurrenciesExchangeRate(
+			base=base,
+			target=target,
+			rate=rate.rate,
+			id=rate.id,
+			decimal_fmt_precision=rate.decimal_fmt_precision,
+		)
+
+	@staticmethod
+	def _restore_path(previous: dict[str, Optional[str]], target: str) -> list[str]:
+		path = [target]
+		while (code := previous[path[-1]]) is not None:
+			path.append(code)
+		return path[::-1]
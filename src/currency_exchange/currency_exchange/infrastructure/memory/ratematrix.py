@@ -0,0 +1,195 @@
+from collections.abc import Iterable
+from typing import Optional
+
+import numpy as np
+
+from ...application.extdm import (
+	IdentifiedCurrency as Currency,
+	IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate,
+)
+from ...application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from ...domain.fixedpoint import quantize_rate
+from ...domain.types import ExchangeRateValue
+
+NO_RATE_ID = -1
+
+
+class ExchangeRatesMatrix:
+	"""
+	Exchange rates between all pairs of currencies, precomputed into NxN arrays.
+
+	Rows are base currencies and columns are target currencies. Missing values are NaN. Besides the stored
+	rates, the matrix holds rates computed through a common currency, so that a rate of any kind is a lookup.
+	Changing a single rate recomputes only the rows and columns of its currencies.
+	"""
+
+	def __init__(
+		self,
+		currencies: Iterable[Currency] = (),
+		rates: Iterable[CurrenciesExchangeRate] = (),
+	) -> None:
+		rates = list(rates)
+		self._currencies: list[Currency] = []
+		self._indices: dict[str, int] = {}
+		for currency in [
+			*currencies,
+			*(c for rate in rates for c in (rate.base, rate.target)),
+		]:
+			if currency.code.data not in self._indices:
+				self._indices[currency.code.data] = len(self._currencies)
+				self._currencies.append(currency)
+
+		size = len(self._currencies)
+		# rates as they are stored
+		self._stored = np.full((size, size), np.nan)
+		self._rate_ids = np.full((size, size), NO_RATE_ID, dtype=np.int64)
+		# rates through a common currency
+		self._cross = np.full((size, size), np.nan)
+
+		for rate in rates:
+			i, j = (
+				self._indices[rate.base.code.data],
+				self._indices[rate.target.code.data],
+			)
+			self._stored[i, j] = rate.rate.value
+			self._rate_ids[i, j] = rate.id if rate.id is not None else NO_RATE_ID
+		# stored rates, completed by reversed ones
+		self._edges = np.where(np.isnan(self._stored), 1 / self._stored.T, self._stored)
+		for i in range(size):
+			self._compute_cross_row(i)
+
+	def __len__(self) -> int:
+		return len(self._currencies)
+
+	def get_rate(
+		self, base: str, target: str, rate_fetch_strategy: ERFetchStrat
+	) -> Optional[tuple[CurrenciesExchangeRate, ERFetchStrat]]:
+		"""
+		Looks up the rate the same way exchange rates are fetched by strategy: stored rate first, then the
+		reversed one and then a rate through a common currency, if strategy allows it. Returns the rate together
+		with the strategy it was found by.
+		"""
+		i, j = self._indices.get(base), self._indices.get(target)
+		if i is None or j is None:
+			return None
+
+		if not np.isnan(self._stored[i, j]):
+			return (
+				self._make_rate(i, j, self._stored[i, j], self._rate_ids[i, j]),
+				ERFetchStrat.BY_STRAIGHT_RATE,
+			)
+		if ERFetchStrat.BY_REVERSED_RATE in rate_fetch_strategy and not np.isnan(
+			self._stored[j, i]
+		):
+			return (
+				self._make_rate(i, j, self._edges[i, j], self._rate_ids[j, i]),
+				ERFetchStrat.BY_REVERSED_RATE,
+			)
+		if ERFetchStrat.BY_COMMON_CURRENCY in rate_fetch_strategy and not np.isnan(
+			self._cross[i, j]
+		):
+			return (
+				self._make_rate(i, j, self._cross[i, j], NO_RATE_ID),
+				ERFetchStrat.BY_COMMON_CURRENCY,
+			)
+		return None
+
+	def set_currency(self, currency: Currency) -> None:
+		code = currency.code.data
+		if code in self._indices:
+			self._currencies[self._indices[code]] = currency
+			return
+
+		self._indices[code] = len(self._currencies)
+		self._currencies.append(currency)
+		for name, fill in (
+			("_stored", np.nan),
+			("_rate_ids", NO_RATE_ID),
+			("_edges", np.nan),
+			("_cross", np.nan),
+		):
+			setattr(
+				self, name, np.pad(getattr(self, name), (0, 1), constant_values=fill)
+			)
+
+	def remove_currency(self, code: str) -> None:
+		index = self._indices.pop(code, None)
+		if index is None:
+			return
+
+		del self._currencies[index]
+		self._indices = {c.code.data: i for i, c in enumerate(self._currencies)}
+		for name in "_stored", "_rate_ids", "_edges", "_cross":
+			array = getattr(self, name)
+			setattr(self, name, np.delete(np.delete(array, index, 0), index, 1))
+		# the removed currency might have been common to any pair
+		for i in range(len(self._currencies)):
+			self._compute_cross_row(i)
+
+	def set_rate(self, rate: CurrenciesExchangeRate) -> None:
+		for currency in rate.base, rate.target:
+			if currency.code.data not in self._indices:
+				self.set_currency(currency)
+		i, j = self._indices[rate.base.code.data], self._indices[rate.target.code.data]
+		self._stored[i, j] = rate.rate.value
+		self._rate_ids[i, j] = rate.id if rate.id is not None else NO_RATE_ID
+		self._update_edge(i, j)
+
+	def remove_rate(self, base: str, target: str) -> None:
+		i, j = self._indices.get(base), self._indices.get(target)
+		if i is None or j is None or np.isnan(self._stored[i, j]):
+			return
+		self._stored[i, j] = np.nan
+		self._rate_ids[i, j] = NO_RATE_ID
+		self._update_edge(i, j)
+
+	def _update_edge(self, i: int, j: int) -> None:
+		for src, dst in (i, j), (j, i):
+			self._edges[src, dst] = (
+				self._stored[src, dst]
+				if not np.isnan(self._stored[src, dst])
+				else 1 / self._stored[dst, src]
+			)
+		# a pair of rates through a common currency includes edge i-j only when i or j is the base or the target
+		for index in i, j:
+			self._compute_cross_row(index)
+			self._compute_cross_column(index)
+
+	def _compute_cross_row(self, i: int) -> None:
+		# candidates[k, j] = rate i->k->j
+		candidates = self._edges[i, :, np.newaxis] * self._edges
+		candidates[i, :] = np.nan
+		np.fill_diagonal(candidates, np.nan)
+		self._cross[i, :] = self._pick_first(candidates, axis=0)
+		self._cross[i, i] = np.nan
+
+	def _compute_cross_column(self, j: int) -> None:
+		# candidates[i, k] = rate i->k->j
+		candidates = self._edges * self._edges[np.newaxis, :, j]
+		candidates[:, j] = np.nan
+		np.fill_diagonal(candidates, np.nan)
+		self._cross[:, j] = self._pick_first(candidates, axis=1)
+		self._cross[j, j] = np.nan
+
+	@staticmethod
+	def _pick_first(candidates: np.ndarray, axis: int) -> np.ndarray:
+		# rates through the common currency with the lowest index
+		found = ~np.isnan(candidates)
+		first = np.argmax(found, axis=axis)
+		values = np.take_along_axis(
+			candidates, np.expand_dims(first, axis), axis
+		).squeeze(axis)
+		return np.where(found.any(axis=axis), values, np.nan)
+
+	def _make_rate(
+		self, i: int, j: int, value: float, rate_id: int
+	) -> CurrenciesExchangeRate:
+		return CurrenciesExchangeRate(
+			self._currencies[i],
+			self._currencies[j],
+			# reversed and cross rates are computed in floats
+			ExchangeRateValue(quantize_rate(float(value))),
+			id=int(rate_id) if rate_id != NO_RATE_ID else None,
+		)
@@ -0,0 +1,362 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime
+from typing import Any, Optional
+
+from currency_exchange.db.routing import on_primary
+from currency_exchange.db.unitofwork import after_commit
+from .rategraph import ExchangeRatesGraph
+from .ratematrix import ExchangeRatesMatrix
+from ...application import errors
+from ...application.extdm import (
+	IdentifiedCurrency as Currency,
+	IdentifiedCurrenciesExchangeRate as CurrenciesExchangeRate,
+)
+from ...application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from ...application.interfaces import (
+	CurrencyRepoInterface,
+	ExchangeRatesRepoInterface,
+	ExchangeRateResolverInterface,
+)
+from ...domain.types import CurrencyCode
+from ...application.dto import (
+	GetCurrencyDto,
+	GetExchangeRateDto,
+	CurrenciesQueryDto,
+	ExchangeRatesQueryDto,
+	AddCurrencyDto,
+	AddExchangeRateDto,
+	AlterCurrencyDto,
+	AlterExchangeRateDto,
+	DeleteCurrencyDto,
+	DeleteExchangeRateDto,
+)
+
+logger = logging.getLogger("currency_exchange")
+
+Change = Callable[[ExchangeRatesGraph | ExchangeRatesMatrix], Any]
+
+
+class ExchangeRatesGraphStore:
+	"""
+	Holds an exchange rates graph and matrix, loaded from the persistent repositories on first demand.
+
+	Writes are applied to both of them once the persistent repositories have committed them, so they are kept
+	up to date without being reloaded. Changes made by other processes are fetched and applied the same way.
+	A change that happens while data is being loaded or fetched makes that data obsolete, so the load or the
+	fetch is repeated.
+	"""
+
+	def __init__(
+		self,
+		currencies_repo: CurrencyRepoInterface,
+		exchange_rates_repo: ExchangeRatesRepoInterface,
+	) -> None:
+		self.currencies_repo = currencies_repo
+		self.exchange_rates_repo = exchange_rates_repo
+		self._graph: Optional[ExchangeRatesGraph] = None
+		self._matrix: Optional[ExchangeRatesMatrix] = None
+		self._generation = 0
+		self._load_lock = asyncio.Lock()
+
+	async def get_graph(self) -> ExchangeRatesGraph:
+		await self._load()
+		return self._graph
+
+	async def get_matrix(self) -> ExchangeRatesMatrix:
+		await self._load()
+		return self._matrix
+
+	def apply(self, change: Change) -> None:
+		"""Applies change to the graph and to the matrix, which share the same methods for altering data."""
+		self._generation += 1
+		if self._graph is not None:
+			change(self._graph)
+			change(self._matrix)
+
+	def apply_after_commit(self, change: Change) -> None:
+		"""Applies change, written to db, once it's committed, so that uncommitted data isn't served."""
+		after_commit(lambda: self.apply(change))
+
+	def invalidate(self) -> None:
+		self._graph = None
+		self._matrix = None
+		self._generation += 1
+
+	async def refresh_currencies(self, codes: list[str]) -> None:
+		"""Fetches currencies, changed by another process, and applies them."""
+
+		async def fetch_change() -> Change:
+			found, removed = [], []
+			for code in codes:
+				try:
+					found.append(
+						await self.currencies_repo.get_currency(
+							GetCurrencyDto(CurrencyCode(code))
+						)
+					)
+				except errors.CurrencyDoesNotExistError:
+					removed.append(code)
+
+			def change(index: ExchangeRatesGraph | ExchangeRatesMatrix) -> None:
+				for code in removed:
+					index.remove_currency(code)
+				for currency in found:
+					index.set_currency(currency)
+
+			return change
+
+		await self._refresh(fetch_change)
+
+	async def refresh_rates(self, code_pairs: list[tuple[str, str]]) -> None:
+		"""Fetches exchange rates between currencies pairs, changed by another process, and applies them."""
+
+		async def fetch_change() -> Change:
+			found, removed = [], []
+			for base, target in code_pairs:
+				try:
+					found.append(
+						await self.exchange_rates_repo.get_rate(
+							GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target))
+						)
+					)
+				except errors.ExchangeRateDoesntExistError:
+					removed.append((base, target))
+
+			def change(index: ExchangeRatesGraph | ExchangeRatesMatrix) -> None:
+				for base, target in removed:
+					index.remove_rate(base, target)
+				for rate in found:
+					index.set_rate(rate)
+
+			return change
+
+		await self._refresh(fetch_change)
+
+	async def _refresh(self, fetch_change: Callable[[], Awaitable[Change]]) -> None:
+		try:
+			while self._graph is not None:
+				generation = self._generation
+				with on_primary():
+					change = await fetch_change()
+				if generation == self._generation:
+					self.apply(change)
+					return
+		except Exception:
+			logger.warning(
+				"Failed to fetch changes, exchange rates graph is reloaded",
+				exc_info=True,
+			)
+			self.invalidate()
+			return
+		# graph is going to be loaded, and the load, which could be in progress, could miss the change
+		self._generation += 1
+
+	async def _load(self) -> None:
+		while self._graph is None:
+			async with self._load_lock:
+				if self._graph is not None:
+					break
+				generation = self._generation
+				currencies = await self.currencies_repo.get_all_currencies()
+				rates = await self.exchange_rates_repo.get_all_rates()
+				if generation == self._generation:
+					self._matrix = ExchangeRatesMatrix(currencies, rates)
+					self._graph = ExchangeRatesGraph(currencies, rates)
+
+
+def select_currencies(
+	currencies: list[Currency], query: CurrenciesQueryDto
+) -> list[Currency]:
+	"""Page of currencies, held in memory, the same as a repository query would return."""
+	codes = {code.data for code in query.codes} if query.codes is not None else None
+	selected = sorted(
+		(
+			c
+			for c in currencies
+			if (codes is None or c.code.data in codes)
+			and (query.after_code is None or c.code.data > query.after_code.data)
+		),
+		key=lambda c: c.code.data,
+	)
+	return selected[: query.limit] if query.limit is not None else selected
+
+
+def select_rates(
+	rates: list[CurrenciesExchangeRate], query: ExchangeRatesQueryDto
+) -> list[CurrenciesExchangeRate]:
+	"""Page of exchange rates, held in memory, the same as a repository query would return."""
+	selected = sorted(
+		(
+			er
+			for er in rates
+			if (query.base_currency is None or er.base.code == query.base_currency)
+			and (
+				query.target_currency is None or er.target.code == query.target_currency
+			)
+			and (query.after_id is None or er.id > query.after_id)
+		),
+		key=lambda er: er.id,
+	)
+	return selected[: query.limit] if query.limit is not None else selected
+
+
+class InMemoryCurrencyRepo(CurrencyRepoInterface):
+	def __init__(self, store: ExchangeRatesGraphStore) -> None:
+		self._store = store
+		self._currencies_repo = store.currencies_repo
+
+	async def get_all_currencies(self) -> list[Currency]:
+		return (await self._store.get_graph()).get_all_currencies()
+
+	async def stream_currencies(
+		self, query: CurrenciesQueryDto
+	) -> AsyncIterator[Currency]:
+		for currency in select_currencies(await self.get_all_currencies(), query):
+			yield currency
+
+	async def get_currency(self, currency_data: GetCurrencyDto) -> Currency:
+		graph = await self._store.get_graph()
+		if currency_data.code:
+			currency = graph.get_currency(currency_data.code.data)
+			on_exc = f"code {currency_data.code}"
+		else:
+			currency = next(
+				(c for c in graph.get_all_currencies() if c.name == currency_data.name),
+				None,
+			)
+			on_exc = f"name {currency_data.name}"
+		if currency is None:
+			raise errors.CurrencyDoesNotExistError(f"No currency with {on_exc}")
+		return currency
+
+	async def save_currency(self, currency: AddCurrencyDto) -> Currency:
+		saved_currency = await self._currencies_repo.save_currency(currency)
+		self._store.apply_after_commit(lambda index: index.set_currency(saved_currency))
+		return saved_currency
+
+	async def update_currency(self, currency: AlterCurrencyDto) -> Currency:
+		updated_currency = await self._currencies_repo.update_currency(currency)
+		self._store.apply_after_commit(
+			lambda index: index.set_currency(updated_currency)
+		)
+		return updated_currency
+
+	async def delete_currency(self, currency: DeleteCurrencyDto) -> Currency:
+		deleted_currency = await self._currencies_repo.delete_currency(currency)
+		self._store.apply_after_commit(
+			lambda index: index.remove_currency(deleted_currency.code.data)
+		)
+		return deleted_currency
+
+
+class InMemoryExchangeRatesRepo(
+	ExchangeRatesRepoInterface, ExchangeRateResolverInterface
+):
+	def __init__(self, store: ExchangeRatesGraphStore) -> None:
+		self._store = store
+		self._exchange_rates_repo = store.exchange_rates_repo
+
+	async def get_all_rates(self) -> list[CurrenciesExchangeRate]:
+		return (await self._store.get_graph()).get_all_rates()
+
+	async def stream_rates(
+		self, query: ExchangeRatesQueryDto
+	) -> AsyncIterator[CurrenciesExchangeRate]:
+		for rate in select_rates(await self.get_all_rates(), query):
+			yield rate
+
+	async def get_rate(self, rate: GetExchangeRateDto) -> CurrenciesExchangeRate:
+		graph = await self._store.get_graph()
+		found_rate = graph.get_rate(rate.base_currency.data, rate.target_currency.data)
+		if found_rate is None:
+			raise errors.ExchangeRateDoesntExistError(
+				f"No exchange rate for {rate.base_currency}->{rate.target_currency}"
+			)
+		return found_rate
+
+	async def save_rate(self, rate: AddExchangeRateDto) -> CurrenciesExchangeRate:
+		saved_rate = await self._exchange_rates_repo.save_rate(rate)
+		self._store.apply_after_commit(lambda index: index.set_rate(saved_rate))
+		return saved_rate
+
+	async def update_rate(self, rate: AlterExchangeRateDto) -> CurrenciesExchangeRate:
+		updated_rate = await self._exchange_rates_repo.update_rate(rate)
+		self._store.apply_after_commit(lambda index: index.set_rate(updated_rate))
+		return updated_rate
+
+	async def delete_rate(self, rate: DeleteExchangeRateDto) -> CurrenciesExchangeRate:
+		deleted_rate = await self._exchange_rates_repo.delete_rate(rate)
+		self._store.apply_after_commit(
+			lambda index: index.remove_rate(
+				deleted_rate.base.code.data, deleted_rate.target.code.data
+			)
+		)
+		return deleted_rate
+
+	async def get_rate_as_of(
+		self, rate: GetExchangeRateDto, as_of: datetime
+	) -> CurrenciesExchangeRate:
+		# history isn't kept in memory
+		return await self._exchange_rates_repo.get_rate_as_of(rate, as_of)
+
+	async def upsert_rates(
+		self, rates: list[AddExchangeRateDto]
+	) -> list[tuple[CurrenciesExchangeRate, bool] | errors.DataRequestError]:
+		results = await self._exchange_rates_repo.upsert_rates(rates)
+		saved_rates = [res[0] for res in results if not isinstance(res, Exception)]
+
+		def set_rates(index: ExchangeRatesGraph | ExchangeRatesMatrix) -> None:
+			for rate in saved_rates:
+				index.set_rate(rate)
+
+		self._store.apply_after_commit(set_rates)
+		return results
+
+	async def get_cross_rates(
+		self, rate: GetExchangeRateDto
+	) -> list[tuple[CurrenciesExchangeRate, CurrenciesExchangeRate]]:
+		graph = await self._store.get_graph()
+		base, target = rate.base_currency.data, rate.target_currency.data
+		self._check_currencies_exist(graph, base, target)
+		return graph.get_cross_rates(base, target)
+
+	async def get_rates_chain(
+		self, rate: GetExchangeRateDto, max_hops: int
+	) -> list[CurrenciesExchangeRate]:
+		graph = await self._store.get_graph()
+		rates_chain = graph.get_rates_chain(
+			rate.base_currency.data, rate.target_currency.data, max_hops
+		)
+		if rates_chain is None:
+			raise errors.ExchangeRateDoesntExistError(
+				f"No exchange rates chain for {rate.base_currency}->{rate.target_currency} "
+				f"within {max_hops} rates"
+			)
+		return rates_chain
+
+	async def resolve_rate(
+		self, rate: GetExchangeRateDto, *, rate_fetch_strategy: ERFetchStrat
+	) -> tuple[CurrenciesExchangeRate, ERFetchStrat]:
+		matrix = await self._store.get_matrix()
+		base, target = rate.base_currency.data, rate.target_currency.data
+		resolved = matrix.get_rate(base, target, rate_fetch_strategy)
+		if resolved is not None:
+			return resolved
+
+		if ERFetchStrat.BY_COMMON_CURRENCY in rate_fetch_strategy:
+			self._check_currencies_exist(await self._store.get_graph(), base, target)
+		raise errors.ExchangeRateDoesntExistError(
+			f"No exchange rate for {rate.base_currency}->{rate.target_currency}"
+		)
+
+	@staticmethod
+	def _check_currencies_exist(graph: ExchangeRatesGraph, *codes: str) -> None:
+		notfound = [code for code in codes if graph.get_currency(code) is None]
+		if notfound:
+			raise errors.CurrencyDoesNotExistError(
+				f"Currency(ies) with code(s) {', '.join(notfound)} not found"
+			)
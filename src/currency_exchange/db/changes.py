@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import BigInteger, String, Text, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP, insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+from .unitofwork import before_commit
+
+logger = logging.getLogger("currency_exchange")
+
+CHANGES_CHANNEL = "data_changes"
+# notification payload is limited in size, so many changed keys are notified as a change of the whole topic
+MAX_NOTIFIED_KEYS = 100
+# distinguishes notifications of changes, made by this process
+PROCESS_ID = uuid4().hex
+
+ChangesCallback = Callable[[Optional[list[str]]], None]
+
+
+class ChangeVersion(Base):
+	__tablename__ = "change_version"
+
+	topic: Mapped[str] = mapped_column(String, primary_key=True)
+	version: Mapped[int] = mapped_column(BigInteger)
+	changed_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True))
+
+
+@dataclass(slots=True)
+class TopicVersion:
+	"""Version of the topic, shared by all processes, and time of its change."""
+
+	topic: str
+	version: int = 0
+	changed_at: Optional[datetime] = None
+
+
+async def publish_change(
+	session: AsyncSession, topic: str, keys: Optional[Iterable[str]] = None
+) -> TopicVersion:
+	"""
+	Increments version of the topic and notifies other processes about the change, within the session's
+	transaction, so notification is sent only if the change is committed. Keys identify changed objects,
+	None means that anything in the topic could have changed.
+
+	Within a unit of work the change is published just before it's committed, as the topic's version row stays
+	locked until then. So the returned version of the topic is filled in once the change is published, i.e.
+	it's known to callbacks run after commit (see unitofwork.after_commit).
+	"""
+	keys = list(keys) if keys is not None else None
+	if keys is not None and len(keys) > MAX_NOTIFIED_KEYS:
+		keys = None
+
+	version = (
+		insert(ChangeVersion)
+		.values(topic=topic, version=1, changed_at=func.now())
+		.on_conflict_do_update(
+			index_elements=[ChangeVersion.topic],
+			set_={"version": ChangeVersion.version + 1, "changed_at": func.now()},
+		)
+		.returning(ChangeVersion.version, ChangeVersion.changed_at)
+		.cte("version")
+	)
+	payload = literal({"topic": topic, "keys": keys, "origin": PROCESS_ID}, JSONB).op(
+		"||"
+	)(
+		func.jsonb_build_object(
+			"version", version.c.version, "changed_at", version.c.changed_at
+		)
+	)
+	statement = select(
+		version.c.version,
+		version.c.changed_at,
+		func.pg_notify(CHANGES_CHANNEL, cast(payload, Text)),
+	).select_from(version)
+	published = TopicVersion(topic)
+
+	async def publish(connection: AsyncConnection) -> None:
+		published.version, published.changed_at, _ = (
+			await connection.execute(statement)
+		).one()
+
+	await before_commit(session, publish)
+	return published
+
+
+async def get_versions(
+	session: AsyncSession, topics: Iterable[str]
+) -> list[TopicVersion]:
+	res = await session.execute(
+		select(
+			ChangeVersion.topic, ChangeVersion.version, ChangeVersion.changed_at
+		).where(ChangeVersion.topic.in_(list(topics)))
+	)
+	return [TopicVersion(*row) for row in res.all()]
+
+
+class ChangesListener:
+	"""
+	Listens to notifications about changes made by other processes and passes changed keys to the topic's
+	subscribers.
+
+	Notifications could be missed, e.g. while connection to db is being reestablished, so topics versions are
+	also polled periodically. A topic, which version was changed without notification, is passed to subscribers
+	as changed entirely.
+	"""
+
+	def __init__(self, engine: AsyncEngine, poll_interval: float) -> None:
+		self._engine = engine
+		self._poll_interval = poll_interval
+		self._subscribers: defaultdict[str, list[ChangesCallback]] = defaultdict(list)
+		self._versions: dict[str, int] = {}
+		self._changed_at: dict[str, datetime] = {}
+		self._versions_polled = False
+		self._task: Optional[asyncio.Task] = None
+
+	def subscribe(self, topic: str, callback: ChangesCallback) -> None:
+		self._subscribers[topic].append(callback)
+
+	def get_version(self, topic: str) -> TopicVersion:
+		"""Version of the topic, seen by the listener last."""
+		return TopicVersion(
+			topic, self._versions.get(topic, 0), self._changed_at.get(topic)
+		)
+
+	def start(self) -> None:
+		if self._subscribers and self._task is None:
+			self._task = asyncio.create_task(self._listen())
+
+	async def stop(self) -> None:
+		if self._task is None:
+			return
+		self._task.cancel()
+		try:
+			await self._task
+		except asyncio.CancelledError:
+			pass
+		self._task = None
+
+	def handle_notification(self, payload: str) -> None:
+		change = json.loads(payload)
+		topic, version = change["topic"], change["version"]
+		seen_version = self._versions.get(topic)
+		if seen_version is not None and version <= seen_version:
+			# change was already handled on versions poll
+			return
+		self._versions[topic] = version
+		if change.get("changed_at") is not None:
+			self._changed_at[topic] = datetime.fromisoformat(change["changed_at"])
+		if seen_version is not None and version > seen_version + 1:
+			self._notify_subscribers(topic, None)
+		elif change["origin"] != PROCESS_ID:
+			self._notify_subscribers(topic, change["keys"])
+
+	def handle_versions(
+		self,
+		versions: dict[str, int],
+		changed_at: Optional[dict[str, datetime]] = None,
+	) -> None:
+		for topic, version in versions.items():
+			seen_version = self._versions.get(topic)
+			self._versions[topic] = version
+			if changed_at is not None and topic in changed_at:
+				self._changed_at[topic] = changed_at[topic]
+			# versions of the first poll are taken as they are
+			if self._versions_polled and (seen_version or 0) < version:
+				self._notify_subscribers(topic, None)
+		self._versions_polled = True
+
+	async def _listen(self) -> None:
+		while True:
+			try:
+				async with self._engine.connect() as connection:
+					raw_connection = await connection.get_raw_connection()
+					driver_connection = raw_connection.driver_connection
+					await driver_connection.add_listener(
+						CHANGES_CHANNEL,
+						lambda conn, pid, channel, payload: self.handle_notification(
+							payload
+						),
+					)
+					while True:
+						rows = await driver_connection.fetch(
+							"SELECT topic, version, changed_at FROM change_version"
+						)
+						self.handle_versions(
+							{row[0]: row[1] for row in rows},
+							{row[0]: row[2] for row in rows},
+						)
+						await asyncio.sleep(self._poll_interval)
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				# notifications are missed until reconnection, and they're caught up by versions poll
+				logger.warning("Changes listener connection failed", exc_info=True)
+				await asyncio.sleep(self._poll_interval)
+
+	def _notify_subscribers(self, topic: str, keys: Optional[list[str]]) -> None:
+		for callback in self._subscribers.get(topic, ()):
+			try:
+				callback(keys)
+			except Exception:
+				logger.exception("Failed to handle changes of %s", topic)
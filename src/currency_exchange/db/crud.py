@@ -1,10 +1,13 @@
-from typing import Callable, TypeVar
+from collections.abc import AsyncIterator
+from typing import Callable, Optional, TypeVar
 
-from sqlalchemy import select
+from sqlalchemy import Select, select
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from pydantic import BaseModel as PydanticModel
 
+from .changes import publish_change
+
 SessionMakerType = async_sessionmaker[AsyncSession]
 
 InputModelType = TypeVar("InputModelType", bound=PydanticModel)
@@ -12,6 +15,9 @@ OutputModelType = TypeVar("OutputModelType", bound=PydanticModel)
 RootModelType = TypeVar("RootModelType", bound=DeclarativeBase)
 ExceptionType = TypeVar("ExceptionType", bound=type[Exception])
 
+# rows fetched from server side cursor at once, when objects are streamed
+STREAM_BATCH_SIZE = 1000
+
 
 class AsyncCrudMixin[RootModelType, InputModelType, OutputModelType]:
 	_root_model: RootModelType
@@ -19,6 +25,8 @@ class AsyncCrudMixin[RootModelType, InputModelType, OutputModelType]:
 	_input_model: InputModelType
 	_output_model: OutputModelType
 	_session_factory: SessionMakerType
+	# topic to notify other processes about changes on, see changes.publish_change
+	_changes_topic: Optional[str] = None
 	create_root_model_from_dto: Callable[[InputModelType], RootModelType]
 
 	async def _get_object(self, identity_criteria, error_msg: str) -> OutputModelType:
@@ -33,18 +41,47 @@ class AsyncCrudMixin[RootModelType, InputModelType, OutputModelType]:
 
 		return self._output_model.model_validate(model)
 
-	async def _get_all_objects(self) -> list[OutputModelType]:
+	def _select_objects(
+		self, criteria, after_id: Optional[int], limit: Optional[int]
+	) -> Select:
+		"""Objects, matching the criteria, ordered by id, starting after after_id."""
+		stmt = select(self._root_model).where(*criteria).order_by(self._root_model.id)
+		if after_id is not None:
+			stmt = stmt.where(self._root_model.id > after_id)
+		if limit is not None:
+			stmt = stmt.limit(limit)
+		return stmt
+
+	async def _get_all_objects(
+		self, *criteria, after_id: Optional[int] = None, limit: Optional[int] = None
+	) -> list[OutputModelType]:
 		async with self._session_factory() as session:
 			async with session.begin():
-				res = await session.execute(select(self._root_model))
+				res = await session.execute(
+					self._select_objects(criteria, after_id, limit)
+				)
 		return [self._output_model.model_validate(obj) for obj in res.scalars().all()]
 
+	async def _stream_all_objects(
+		self, *criteria, after_id: Optional[int] = None, limit: Optional[int] = None
+	) -> AsyncIterator[OutputModelType]:
+		async with self._session_factory() as session:
+			async with session.begin():
+				res = await session.stream_scalars(
+					self._select_objects(criteria, after_id, limit).execution_options(
+						yield_per=STREAM_BATCH_SIZE
+					)
+				)
+				async for obj in res:
+					yield self._output_model.model_validate(obj)
+
 	async def _save_object(self, input_object) -> RootModelType | None:
 		model = self.create_root_model_from_dto(input_object)
 		async with self._session_factory() as session:
 			async with session.begin():
 				self.process_final_model(model)
 				session.add(model)
+				await self._publish_change(session, model)
 				return model
 
 	async def _update_object(
@@ -62,6 +99,7 @@ class AsyncCrudMixin[RootModelType, InputModelType, OutputModelType]:
 				for attr, value in update_values.items():
 					setattr(model, attr, value)
 				self.process_final_model(model)
+				await self._publish_change(session, model)
 
 	async def _delete_object(self, identity_criteria, error_msg: str) -> None:
 		async with self._session_factory() as session:
@@ -73,5 +111,12 @@ class AsyncCrudMixin[RootModelType, InputModelType, OutputModelType]:
 				if model is None:
 					raise self._object_does_not_exist_error(error_msg)
 				await session.delete(model)
+				await self._publish_change(session, model)
 
 	def process_final_model(self, model: RootModelType) -> None: ...
+
+	async def _publish_change(self, session: AsyncSession, model: RootModelType):
+		if self._changes_topic is not None:
+			# flushes the model to get its identity
+			await session.flush()
+			await publish_change(session, self._changes_topic, [str(model.id)])
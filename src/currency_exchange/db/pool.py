@@ -0,0 +1,73 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import sqlalchemy.exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+
+@dataclass(slots=True)
+class PoolStats:
+	size: int
+	max_overflow: int
+	checked_out: int
+	overflow: int
+	max_checked_out: int
+	max_overflow_used: int
+	checkouts: int
+	timeouts: int
+	total_wait_seconds: float
+	max_wait_seconds: float
+
+
+class MonitoredAsyncQueuePool(AsyncAdaptedQueuePool):
+	"""
+	Connections pool of an async engine, which counts checkouts and measures time spent waiting for a free
+	connection, or connecting a new one, so that queueing of requests on the exhausted pool can be seen.
+	"""
+
+	def __init__(self, *args, **kwargs) -> None:
+		super().__init__(*args, **kwargs)
+		self._max_checked_out = 0
+		self._max_overflow_used = 0
+		self._checkouts = 0
+		self._timeouts = 0
+		self._total_wait = 0.0
+		self._max_wait = 0.0
+
+	def connect(self) -> PoolProxiedConnection:
+		started = time.perf_counter()
+		try:
+			connection = super().connect()
+		except sqlalchemy.exc.TimeoutError:
+			self._timeouts += 1
+			raise
+		finally:
+			wait = time.perf_counter() - started
+			self._total_wait += wait
+			self._max_wait = max(self._max_wait, wait)
+		self._checkouts += 1
+		self._max_checked_out = max(self._max_checked_out, self.checkedout())
+		self._max_overflow_used = max(self._max_overflow_used, self.overflow())
+		return connection
+
+	def get_stats(self) -> PoolStats:
+		return PoolStats(
+			size=self.size(),
+			max_overflow=self._max_overflow,
+			checked_out=self.checkedout(),
+			# overflow is counted from minus pool size, until the pool is filled
+			overflow=max(self.overflow(), 0),
+			max_checked_out=self._max_checked_out,
+			max_overflow_used=self._max_overflow_used,
+			checkouts=self._checkouts,
+			timeouts=self._timeouts,
+			total_wait_seconds=self._total_wait,
+			max_wait_seconds=self._max_wait,
+		)
+
+
+def get_pool_stats(engine: AsyncEngine) -> Optional[PoolStats]:
+	pool = engine.sync_engine.pool
+	return pool.get_stats() if isinstance(pool, MonitoredAsyncQueuePool) else None
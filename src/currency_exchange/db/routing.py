@@ -0,0 +1,168 @@
+import functools
+import itertools
+import logging
+import time
+from collections.abc import AsyncIterator, Callable, Iterator, Sequence
+from contextlib import AbstractAsyncContextManager, asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+import sqlalchemy.exc
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+logger = logging.getLogger("currency_exchange")
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+
+@dataclass(slots=True)
+class _ReadOnlyCall:
+	used_replica: bool = False
+
+
+_read_only_call: ContextVar[Optional[_ReadOnlyCall]] = ContextVar(
+	"read_only_call", default=None
+)
+# monotonic time of the last commit of writes, made within the context, e.g. while handling the current request,
+# so that only the writer reads from the primary after that
+_last_write_at: ContextVar[float] = ContextVar("last_write_at", default=float("-inf"))
+_on_primary: ContextVar[bool] = ContextVar("on_primary", default=False)
+
+
+class PrimarySession(Session):
+	"""Session of the primary db, which records time of committed writes."""
+
+
+@event.listens_for(PrimarySession, "do_orm_execute")
+def _track_statement(orm_execute_state: ORMExecuteState) -> None:
+	if not orm_execute_state.is_select:
+		orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(PrimarySession, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+	session.info["has_writes"] = True
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _record_write(session: Session) -> None:
+	# within a unit of work the session commits its savepoint only, and the following reads have to be made on
+	# the primary all the same, to see the writes made by the unit of work
+	if session.info.pop("has_writes", False):
+		_last_write_at.set(time.monotonic())
+
+
+@event.listens_for(PrimarySession, "after_rollback")
+def _forget_writes(session: Session) -> None:
+	session.info.pop("has_writes", None)
+
+
+def _is_connection_error(error: Exception) -> bool:
+	if isinstance(error, OSError):
+		return True
+	return isinstance(error, sqlalchemy.exc.DBAPIError) and (
+		error.connection_invalidated
+		or isinstance(
+			error, (sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError)
+		)
+	)
+
+
+def read_only(method):
+	"""
+	Marks repository method, which only reads data, so that its sessions can be routed to a replica. The method
+	is repeated on the primary, if replica connection fails.
+	"""
+
+	@functools.wraps(method)
+	async def wrapper(*args, **kwargs):
+		if _read_only_call.get() is not None:
+			return await method(*args, **kwargs)
+		call = _ReadOnlyCall()
+		token = _read_only_call.set(call)
+		try:
+			return await method(*args, **kwargs)
+		except Exception as e:
+			if not (call.used_replica and _is_connection_error(e)):
+				raise
+		finally:
+			_read_only_call.reset(token)
+		return await method(*args, **kwargs)
+
+	return wrapper
+
+
+@contextmanager
+def on_primary() -> Iterator[None]:
+	"""
+	Makes reads within the context on the primary, e.g. reads of changes, which other processes notified of,
+	as replicas could have not caught them up yet.
+	"""
+	token = _on_primary.set(True)
+	try:
+		yield
+	finally:
+		_on_primary.reset(token)
+
+
+class RoutingSessionFactory:
+	"""
+	Session factory, which makes sessions of replicas for read only repository methods, and sessions of the
+	primary for everything else. Replicas are taken in turn.
+
+	Reads are made on the primary for stickiness seconds after writes, made within the same context, e.g. by the
+	same request handling, so that the writer sees its writes despite replication lag, while reads of others
+	are still made on replicas. Replica, which connection failed, isn't used for retry_interval seconds.
+	"""
+
+	def __init__(
+		self,
+		primary: SessionFactory,
+		replicas: Sequence[SessionFactory] = (),
+		stickiness: float = 2,
+		retry_interval: float = 30,
+	) -> None:
+		self._primary = primary
+		self._replicas = list(replicas)
+		self._stickiness = stickiness
+		self._retry_interval = retry_interval
+		self._down_until = [float("-inf")] * len(self._replicas)
+		self._turns = itertools.cycle(range(len(self._replicas)))
+
+	def __call__(self) -> AbstractAsyncContextManager[AsyncSession]:
+		call = _read_only_call.get()
+		if call is None or _on_primary.get() or not self._replicas:
+			return self._primary()
+		now = time.monotonic()
+		if now < _last_write_at.get() + self._stickiness:
+			return self._primary()
+		for _ in range(len(self._replicas)):
+			index = next(self._turns)
+			if now >= self._down_until[index]:
+				call.used_replica = True
+				return self._replica_session(index)
+		return self._primary()
+
+	def get_replicas_state(self) -> list[bool]:
+		"""Whether each replica is considered available."""
+		now = time.monotonic()
+		return [now >= down_until for down_until in self._down_until]
+
+	@asynccontextmanager
+	async def _replica_session(self, index: int) -> AsyncIterator[AsyncSession]:
+		try:
+			async with self._replicas[index]() as session:
+				yield session
+		except Exception as e:
+			if _is_connection_error(e):
+				logger.warning(
+					"Replica %d connection failed, reads are made on the primary for %s seconds",
+					index,
+					self._retry_interval,
+					exc_info=True,
+				)
+				self._down_until[index] = time.monotonic() + self._retry_interval
+			raise
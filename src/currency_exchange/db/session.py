@@ -1,17 +1,60 @@
 from sqlalchemy import URL
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 
 from currency_exchange.config import db_conn_settings, general_settings
+from .pool import MonitoredAsyncQueuePool
+from .routing import PrimarySession, RoutingSessionFactory
+from .unitofwork import UnitOfWorkSessionFactory
+
+
+def _make_url(host: str, port: str | int) -> URL:
+	return URL.create(
+		drivername=f"{db_conn_settings.DBMS}+{db_conn_settings.DRIVER}",
+		host=host,
+		port=port,
+		username=db_conn_settings.USERNAME,
+		password=db_conn_settings.PASSWORD,
+		database=db_conn_settings.DB_NAME,
+	)
 
-url = URL.create(
-	drivername=f"{db_conn_settings.DBMS}+{db_conn_settings.DRIVER}",
-	host=db_conn_settings.HOST,
-	port=db_conn_settings.PORT,
-	username=db_conn_settings.USERNAME,
-	password=db_conn_settings.PASSWORD,
-	database=db_conn_settings.DB_NAME,
-)
 
-engine = create_async_engine(url, echo=general_settings.DEBUG)
+def _create_engine(url: URL) -> AsyncEngine:
+	return create_async_engine(
+		url,
+		echo=general_settings.DEBUG,
+		poolclass=MonitoredAsyncQueuePool,
+		pool_size=db_conn_settings.POOL_SIZE,
+		max_overflow=db_conn_settings.MAX_OVERFLOW,
+		pool_timeout=db_conn_settings.POOL_TIMEOUT,
+		pool_recycle=db_conn_settings.POOL_RECYCLE,
+		pool_pre_ping=db_conn_settings.POOL_PRE_PING,
+		connect_args={
+			# statements prepared by sqlalchemy and by asyncpg itself are cached separately
+			"prepared_statement_cache_size": db_conn_settings.STATEMENT_CACHE_SIZE,
+			"statement_cache_size": db_conn_settings.STATEMENT_CACHE_SIZE,
+		},
+	)
 
-async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+url = _make_url(db_conn_settings.HOST, db_conn_settings.PORT)
+engine = _create_engine(url)
+replica_engines = [
+	_create_engine(_make_url(host, port or db_conn_settings.PORT))
+	for host, _, port in (
+		replica.partition(":") for replica in db_conn_settings.REPLICA_HOSTS
+	)
+]
+
+async_session_factory = RoutingSessionFactory(
+	UnitOfWorkSessionFactory(
+		async_sessionmaker(
+			engine, expire_on_commit=False, sync_session_class=PrimarySession
+		)
+	),
+	[
+		UnitOfWorkSessionFactory(async_sessionmaker(replica, expire_on_commit=False))
+		for replica in replica_engines
+	],
+	stickiness=db_conn_settings.REPLICA_STICKINESS,
+	retry_interval=db_conn_settings.REPLICA_RETRY_INTERVAL,
+)
@@ -0,0 +1,195 @@
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import (
+	AsyncConnection,
+	AsyncEngine,
+	AsyncSession,
+	AsyncTransaction,
+	async_sessionmaker,
+)
+
+logger = logging.getLogger("currency_exchange")
+
+_current_unit_of_work: ContextVar[Optional["UnitOfWork"]] = ContextVar(
+	"unit_of_work", default=None
+)
+
+
+class UnitOfWork:
+	"""
+	Connection and transaction shared by sessions of all repositories, used within the unit of work, so that
+	operations don't check connections out of the pool one by one, and their changes are committed or rolled
+	back at once. Connection is checked out on the first use, so work, which doesn't touch db, doesn't hold it.
+
+	Side effects of the changes outside of db, e.g. updates of in-memory caches, are deferred until the changes
+	are committed, and dropped, if they are rolled back (see after_commit).
+	"""
+
+	def __init__(self) -> None:
+		self._transactions: dict[
+			AsyncEngine | AsyncConnection, tuple[AsyncConnection, AsyncTransaction]
+		] = {}
+		self._before_commit: list[Callable[[], Awaitable[Any]]] = []
+		self._after_commit: list[Callable[[], Any]] = []
+
+	@asynccontextmanager
+	async def session(
+		self, session_factory: async_sessionmaker[AsyncSession]
+	) -> AsyncIterator[AsyncSession]:
+		"""
+		Session of the factory, joining transaction of the unit of work by a savepoint, so that it's used by
+		repositories as an ordinary one, and an error rolls back changes made within the session only.
+		"""
+		connection = await self._get_connection(session_factory.kw["bind"])
+		async with session_factory(
+			bind=connection, join_transaction_mode="create_savepoint"
+		) as session:
+			yield session
+
+	def holds(self, connection: AsyncConnection) -> bool:
+		"""Whether the connection is the one, which transaction is managed by the unit of work."""
+		return any(
+			own.sync_connection is connection.sync_connection
+			for own, _ in self._transactions.values()
+		)
+
+	async def commit(self) -> None:
+		await self._finish(commit=True)
+
+	async def rollback(self) -> None:
+		await self._finish(commit=False)
+
+	async def _get_connection(
+		self, bind: AsyncEngine | AsyncConnection
+	) -> AsyncConnection:
+		if bind in self._transactions:
+			return self._transactions[bind][0]
+		if isinstance(bind, AsyncConnection):
+			# connection given to the factory is already in a transaction of its owner
+			connection = bind
+			transaction = await connection.begin_nested()
+		else:
+			connection = await bind.connect()
+			transaction = await connection.begin()
+		self._transactions[bind] = connection, transaction
+		return connection
+
+	async def _finish(self, commit: bool) -> None:
+		transactions, self._transactions = self._transactions, {}
+		before_commit, self._before_commit = self._before_commit, []
+		after_commit, self._after_commit = self._after_commit, []
+		error = None
+		if commit:
+			try:
+				for callback in before_commit:
+					await callback()
+			except Exception as e:
+				error = e
+		for bind, (connection, transaction) in transactions.items():
+			try:
+				# the rest is rolled back, if a transaction failed to commit
+				if commit and error is None:
+					await transaction.commit()
+				else:
+					await transaction.rollback()
+			except Exception as e:
+				error = error or e
+			finally:
+				if connection is not bind:
+					await connection.close()
+		if error is not None:
+			raise error
+		if not commit:
+			return
+		for callback in after_commit:
+			try:
+				callback()
+			except Exception:
+				logger.exception("Callback after commit of unit of work failed")
+
+
+def after_commit(callback: Callable[[], Any]) -> None:
+	"""
+	Runs the callback once the current unit of work is committed, or at once, if there's no unit of work.
+	Callback is dropped, if the unit of work is rolled back. Side effects of writes, like updates of in-memory
+	caches, are run by it, so that they don't expose uncommitted data to concurrent requests.
+	"""
+	work = _current_unit_of_work.get()
+	if work is None:
+		callback()
+	else:
+		work._after_commit.append(callback)
+
+
+def has_uncommitted_changes() -> bool:
+	"""
+	Whether the current unit of work has changes, which side effects are deferred until commit (see after_commit).
+	Data, read within such unit of work, might be uncommitted, so it's not to be shared, e.g. cached.
+	"""
+	work = _current_unit_of_work.get()
+	return work is not None and bool(work._after_commit)
+
+
+async def before_commit(
+	session: AsyncSession, callback: Callable[[AsyncConnection], Awaitable[Any]]
+) -> None:
+	"""
+	Runs the callback on the session's connection just before the current unit of work is committed, if the
+	session takes part in it, or at once otherwise. Statements, locking rows shared by all writers, are run by
+	it, so that locks aren't held for the whole unit of work.
+	"""
+	connection = await session.connection()
+	work = _current_unit_of_work.get()
+	if work is None or not work.holds(connection):
+		await callback(connection)
+	else:
+		work._before_commit.append(partial(callback, connection))
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[UnitOfWork]:
+	"""
+	Runs the enclosed code within a unit of work, which is committed on exit, or rolled back on error.
+	Enclosed unit of work joins the outer one.
+	"""
+	current = _current_unit_of_work.get()
+	if current is not None:
+		yield current
+		return
+	work = UnitOfWork()
+	token = _current_unit_of_work.set(work)
+	try:
+		yield work
+	except BaseException:
+		_current_unit_of_work.reset(token)
+		await work.rollback()
+		raise
+	_current_unit_of_work.reset(token)
+	await work.commit()
+
+
+async def request_unit_of_work() -> AsyncIterator[UnitOfWork]:
+	"""FastAPI dependency, running the whole request handling within a unit of work."""
+	async with unit_of_work() as work:
+		yield work
+
+
+class UnitOfWorkSessionFactory:
+	"""
+	Session factory, which makes sessions of the current unit of work, if there's one, or ordinary sessions
+	otherwise. Repositories, using it, take part in units of work transparently.
+	"""
+
+	def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+		self._session_factory = session_factory
+
+	def __call__(self) -> AbstractAsyncContextManager[AsyncSession]:
+		work = _current_unit_of_work.get()
+		if work is None:
+			return self._session_factory()
+		return work.session(self._session_factory)
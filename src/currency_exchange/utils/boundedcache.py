@@ -0,0 +1,151 @@
+from collections import OrderedDict, defaultdict
+from collections.abc import Callable, Hashable, Iterable
+from dataclasses import dataclass
+from typing import Any, Literal
+
+EvictionPolicy = Literal["lru", "lfu"]
+
+MISSING = object()
+
+
+@dataclass(slots=True)
+class CacheStats:
+	size: int
+	max_size: int
+	hits: int
+	misses: int
+	evictions: int
+	invalidations: int
+
+
+class BoundedCache:
+	"""
+	Size bounded key-value cache, evicting least recently (lru) or least frequently (lfu) used entries.
+
+	Entries can be marked with tags, so that a group of entries is invalidated at once, without scanning
+	the whole cache. Generation is changed on every invalidation, so that a value fetched before it could be
+	told obsolete.
+	"""
+
+	def __init__(self, max_size: int, policy: EvictionPolicy = "lru") -> None:
+		if max_size <= 0:
+			raise ValueError("Cache size must be positive")
+		if policy not in ("lru", "lfu"):
+			raise ValueError(f"Unknown eviction policy {policy}")
+		self._max_size = max_size
+		self._policy = policy
+		# entries are kept in recency order, the least recently used goes first
+		self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+		# uses counts, and keys grouped by them in recency order, for lfu policy
+		self._uses: dict[Hashable, int] = {}
+		self._keys_by_uses: defaultdict[int, OrderedDict[Hashable, None]] = defaultdict(
+			OrderedDict
+		)
+		self._min_uses = 0
+		self._entry_tags: dict[Hashable, tuple[Hashable, ...]] = {}
+		self._tagged: defaultdict[Hashable, set[Hashable]] = defaultdict(set)
+
+		self._hits = 0
+		self._misses = 0
+		self._evictions = 0
+		self._invalidations = 0
+		self.generation = 0
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def __contains__(self, key: Hashable) -> bool:
+		return key in self._entries
+
+	def get(self, key: Hashable, default: Any = MISSING) -> Any:
+		value = self._entries.get(key, MISSING)
+		if value is MISSING:
+			self._misses += 1
+			return default
+		self._hits += 1
+		self._entries.move_to_end(key)
+		if self._policy == "lfu":
+			self._count_use(key)
+		return value
+
+	def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = ()) -> None:
+		if key in self._entries:
+			self._remove(key)
+		elif len(self._entries) >= self._max_size:
+			self._remove(self._choose_victim())
+			self._evictions += 1
+
+		self._entries[key] = value
+		if self._policy == "lfu":
+			self._uses[key] = 1
+			self._keys_by_uses[1][key] = None
+			self._min_uses = 1
+		self._entry_tags[key] = tuple(tags)
+		for tag in self._entry_tags[key]:
+			self._tagged[tag].add(key)
+
+	def invalidate(self, *keys: Hashable) -> None:
+		self.generation += 1
+		for key in keys:
+			if key in self._entries:
+				self._remove(key)
+				self._invalidations += 1
+
+	def invalidate_tagged(self, *tags: Hashable) -> None:
+		for tag in tags:
+			self.invalidate(*self._tagged.get(tag, ()))
+
+	def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+		self.invalidate(*[key for key in self._entries if predicate(key)])
+
+	def clear(self) -> None:
+		self.generation += 1
+		self._invalidations += len(self._entries)
+		self._entries.clear()
+		self._uses.clear()
+		self._keys_by_uses.clear()
+		self._entry_tags.clear()
+		self._tagged.clear()
+
+	def get_stats(self) -> CacheStats:
+		return CacheStats(
+			size=len(self._entries),
+			max_size=self._max_size,
+			hits=self._hits,
+			misses=self._misses,
+			evictions=self._evictions,
+			invalidations=self._invalidations,
+		)
+
+	def _choose_victim(self) -> Hashable:
+		if self._policy == "lru":
+			return next(iter(self._entries))
+		if self._min_uses not in self._keys_by_uses:
+			# least used entries were invalidated
+			self._min_uses = min(self._keys_by_uses)
+		# among equally used entries the least recently used one is evicted
+		return next(iter(self._keys_by_uses[self._min_uses]))
+
+	def _count_use(self, key: Hashable) -> None:
+		uses = self._uses[key]
+		self._discard_uses(key, uses)
+		if uses == self._min_uses and uses not in self._keys_by_uses:
+			self._min_uses += 1
+		self._uses[key] = uses + 1
+		self._keys_by_uses[uses + 1][key] = None
+
+	def _discard_uses(self, key: Hashable, uses: int) -> None:
+		keys = self._keys_by_uses[uses]
+		del keys[key]
+		if not keys:
+			del self._keys_by_uses[uses]
+
+	def _remove(self, key: Hashable) -> None:
+		del self._entries[key]
+		if self._policy == "lfu":
+			self._discard_uses(key, self._uses.pop(key))
+		for tag in self._entry_tags.pop(key):
+			tagged = self._tagged[tag]
+			tagged.discard(key)
+			if not tagged:
+				del self._tagged[tag]
@@ -0,0 +1,118 @@
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# items are sent in chunks, so a chunk isn't written to socket for every row
+STREAM_CHUNK_ITEMS = 100
+
+PAGE_MAX_SIZE = 1000
+
+STREAMING_RESPONSES = {200: {"content": {NDJSON_MEDIA_TYPE: {}}}}
+
+# serializes a trusted item straight to JSON, the same way as the schema would after validating it
+ItemSerializer = Callable[[Any], bytes]
+
+
+def serialize_item(
+	item: Any, schema: type[BaseModel], serialize: Optional[ItemSerializer] = None
+) -> bytes:
+	if serialize is not None:
+		return serialize(item)
+	return (
+		schema.model_validate(item, from_attributes=True)
+		.model_dump_json(by_alias=True)
+		.encode()
+	)
+
+
+async def _iter_serialized(
+	items: AsyncIterable,
+	schema: type[BaseModel],
+	serialize: Optional[ItemSerializer] = None,
+) -> AsyncIterator[list[bytes]]:
+	chunk = []
+	async for item in items:
+		chunk.append(serialize_item(item, schema, serialize))
+		if len(chunk) == STREAM_CHUNK_ITEMS:
+			yield chunk
+			chunk = []
+	if chunk:
+		yield chunk
+
+
+async def iter_json_lines(
+	items: AsyncIterable,
+	schema: type[BaseModel],
+	serialize: Optional[ItemSerializer] = None,
+) -> AsyncIterator[bytes]:
+	async for chunk in _iter_serialized(items, schema, serialize):
+		yield b"\n".join(chunk) + b"\n"
+
+
+async def iter_json_array(
+	items: AsyncIterable,
+	schema: type[BaseModel],
+	serialize: Optional[ItemSerializer] = None,
+) -> AsyncIterator[bytes]:
+	separator = b"["
+	async for chunk in _iter_serialized(items, schema, serialize):
+		yield separator + b",".join(chunk)
+		separator = b","
+	yield b"]" if separator == b"," else b"[]"
+
+
+async def _iter_async(items: Iterable) -> AsyncIterator:
+	for item in items:
+		yield item
+
+
+def stream_json_response(
+	request: Request,
+	items: AsyncIterable,
+	schema: type[BaseModel],
+	headers: Optional[dict[str, str]] = None,
+	serialize: Optional[ItemSerializer] = None,
+) -> StreamingResponse:
+	"""
+	Sends items as they are fetched, serialized by the schema, or by the serializer without validation, if
+	it's given. Items are sent as NDJSON, if client accepts it, otherwise as a JSON array.
+	"""
+	if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+		return StreamingResponse(
+			iter_json_lines(items, schema, serialize),
+			headers=headers,
+			media_type=NDJSON_MEDIA_TYPE,
+		)
+	return StreamingResponse(
+		iter_json_array(items, schema, serialize),
+		headers=headers,
+		media_type="application/json",
+	)
+
+
+async def stream_page_response(
+	request: Request,
+	items: AsyncIterable,
+	schema: type[BaseModel],
+	limit: Optional[int],
+	get_cursor: Callable[[Any], Any],
+	headers: Optional[dict[str, str]] = None,
+	serialize: Optional[ItemSerializer] = None,
+) -> StreamingResponse:
+	"""
+	Sends a page of items, fetched with the limit. If the page is full, link to the next one is sent in Link
+	header, with the cursor of the last item passed in "after" query parameter. Without limit all items are
+	streamed.
+	"""
+	if limit is None:
+		return stream_json_response(request, items, schema, headers, serialize)
+	page = [item async for item in items]
+	headers = dict(headers or {})
+	if len(page) == limit:
+		next_url = request.url.include_query_params(after=get_cursor(page[-1]))
+		headers["Link"] = f'<{next_url}>; rel="next"'
+	return stream_json_response(request, _iter_async(page), schema, headers, serialize)
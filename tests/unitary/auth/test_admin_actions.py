@@ -119,6 +119,36 @@ async def test_admin_get_all_users_success(
 	assert len(response_data) == number_of_users_in_db
 
 
+async def test_admin_get_users_page_success(
+	admin_access_token, request_client, db_session
+):
+	users_ids = (
+		await db_session.scalars(
+			select(User.id)
+			.where(User.category == UserCategory.API_CLIENT, User.is_active.is_(True))
+			.order_by(User.id)
+		)
+	).all()
+
+	pages_ids = []
+	url, params = (
+		"/admin/users/all",
+		{"category": "API_CLIENT", "is_active": True, "limit": 1},
+	)
+	while url is not None:
+		response = await request_client.get(
+			url,
+			headers={"Authorization": f"Bearer {admin_access_token.str}"},
+			params=params,
+		)
+		assert response.status_code == 200
+		pages_ids.append([user["id"] for user in response.json()])
+		url, params = response.links.get("next", {}).get("url"), None
+
+	# the last page is empty, as the page before is full
+	assert pages_ids == [[id_] for id_ in users_ids] + [[]]
+
+
 async def test_get_one_user_success(admin_access_token, request_client, users_models):
 	user = users_models["Bilbo_baggins"]
 	response = await request_client.get(
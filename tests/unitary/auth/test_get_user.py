@@ -3,6 +3,7 @@ from fastapi import HTTPException
 
 from currency_exchange.auth.dbmodels import User
 from currency_exchange.auth.providers import get_active_user
+from currency_exchange.auth.utils import LazyUser, get_subject_claim_for_user
 
 
 pytestmark = pytest.mark.anyio
@@ -31,3 +32,29 @@ async def test_get_active_user_error_on_inactive_user(inactive_user: User):
 async def test_get_active_user_error_on_nonexistent_user(active_user: User):
 	with pytest.raises(HTTPException):
 		await get_active_user(active_user.username[::-1])
+
+
+async def test_lazy_user_from_sub_claim(active_user: User, users_repo, monkeypatch):
+	user = LazyUser(
+		get_subject_claim_for_user(
+			"testing.prefix", active_user.username, active_user.id
+		)
+	)
+	get_calls = []
+	get = users_repo.get
+
+	async def counting_get(user_identity):
+		get_calls.append(user_identity)
+		return await get(user_identity)
+
+	monkeypatch.setattr(users_repo, "get", counting_get)
+
+	assert (user.username, user.id) == (active_user.username, active_user.id)
+	with pytest.raises(AttributeError):
+		user.category
+	assert get_calls == []
+
+	await user.load()
+	await user.load()
+	assert user.category == active_user.category
+	assert get_calls == [active_user.id]
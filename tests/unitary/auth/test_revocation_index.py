@@ -0,0 +1,95 @@
+import datetime
+import uuid
+
+import pytest
+
+from currency_exchange.auth import errors
+from currency_exchange.auth.revocation import TokenRevocationIndex
+from currency_exchange.auth.schemas import TokenStateDbIn, TokenStateDbUpdate
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def user(users_models):
+	return users_models["Mithrandir"]
+
+
+@pytest.fixture
+async def revocation_index(token_state_repo) -> TokenRevocationIndex:
+	return TokenRevocationIndex(token_state_repo)
+
+
+@pytest.fixture
+async def get_token_state(user):
+	def _get_token_state(**kwargs) -> TokenStateDbIn:
+		token_state = {
+			"id": uuid.uuid4(),
+			"type": "access",
+			"user_id": user.id,
+			"device_id": "none",
+			"expiry_date": datetime.datetime.now(tz=datetime.timezone.utc)
+			+ datetime.timedelta(minutes=30),
+		}
+		token_state.update(kwargs)
+		return TokenStateDbIn(**token_state)
+
+	return _get_token_state
+
+
+async def test_revocation_index_looks_token_up_once(
+	revocation_index, token_state_repo, get_token_state, monkeypatch
+):
+	token_state = get_token_state()
+	await token_state_repo.save(token_state)
+
+	assert await revocation_index.is_revoked(token_state.id.hex) is False
+
+	async def fail_get(token_id):
+		raise AssertionError("Indexed token is looked up in db")
+
+	monkeypatch.setattr(token_state_repo, "get", fail_get)
+	assert await revocation_index.is_revoked(token_state.id.hex) is False
+	revocation_index.revoke(token_state.id.hex)
+	assert await revocation_index.is_revoked(token_state.id.hex) is True
+
+
+async def test_revocation_index_unrecognized_token(revocation_index):
+	with pytest.raises(errors.TokenDoesNotExistError):
+		await revocation_index.is_revoked(uuid.uuid4().hex)
+
+
+async def test_revocation_index_drops_changed_tokens(
+	revocation_index, token_state_repo, get_token_state
+):
+	token_state = get_token_state()
+	await token_state_repo.save(token_state)
+	assert await revocation_index.is_revoked(token_state.id) is False
+
+	# as if revoked by another process
+	await token_state_repo.update(TokenStateDbUpdate(id=token_state.id, revoked=True))
+	assert await revocation_index.is_revoked(token_state.id) is False
+
+	revocation_index.drop([str(token_state.id)])
+	assert await revocation_index.is_revoked(token_state.id) is True
+
+
+async def test_revocation_index_load(
+	revocation_index, token_state_repo, get_token_state
+):
+	now = datetime.datetime.now(tz=datetime.timezone.utc)
+	token_states = [
+		get_token_state(),
+		get_token_state(revoked=True),
+		get_token_state(expiry_date=now - datetime.timedelta(minutes=1)),
+	]
+	for token_state in token_states:
+		await token_state_repo.save(token_state)
+
+	await revocation_index.load()
+
+	assert [
+		await revocation_index.is_revoked(token_state.id)
+		for token_state in token_states[:2]
+	] == [False, True]
+	assert token_states[2].id not in revocation_index._tokens
@@ -3,6 +3,7 @@ import uuid
 import pytest
 
 from currency_exchange.auth.services.jwtservice import JWTIssuer
+from currency_exchange.auth.utils import revoke_all_users_tokens_per_device
 from .utils import get_token_state_from_db, b64_encode_credentials
 
 
@@ -139,3 +140,21 @@ async def test_revoke_tokens_user_is_inactive_error(
 	)
 
 	assert response.status_code == 403
+
+
+async def test_revoke_all_users_tokens_per_device_success(
+	user, existing_tokens, db_session
+):
+	device_tokens_ids = {
+		uuid.UUID(t.payload["jti"]) for t in existing_tokens["tel"].values()
+	}
+
+	revoked_ids = await revoke_all_users_tokens_per_device(user, "tel")
+
+	assert set(revoked_ids) == device_tokens_ids
+	assert await revoke_all_users_tokens_per_device(user, "tel") == []
+	other_tokens_states = [
+		await get_token_state_from_db(t.payload["jti"], db_session)
+		for t in existing_tokens["none"].values()
+	]
+	assert all(not t.revoked for t in other_tokens_states)
@@ -181,3 +181,66 @@ async def test_validate_jwt_invalid_signature_failure(get_mock_token, jwt_valida
 async def test_validate_jwt_invalid_token_format_failure(token, jwt_validator):
 	with pytest.raises(errors.CorruptedTokenDataError):
 		jwt_validator.token_validate(token)
+
+
+@pytest.fixture
+async def caching_jwt_validator(encryption_key) -> JWTValidator:
+	return JWTValidator(key=encryption_key.as_pem(private=False), cache_size=2)
+
+
+async def test_validate_jwt_cached(get_mock_token, caching_jwt_validator, monkeypatch):
+	now = datetime.datetime.now()
+	token = get_mock_token(iat=now, exp=now + datetime.timedelta(minutes=5))
+
+	validated_token = caching_jwt_validator.token_validate(token.str)
+
+	def fail_decode(token_str):
+		raise AssertionError("Cached token is verified again")
+
+	monkeypatch.setattr(caching_jwt_validator, "_decode_jwt_data", fail_decode)
+	assert caching_jwt_validator.token_validate(token.str) is validated_token
+	stats = caching_jwt_validator.get_cache_stats()
+	assert (stats.size, stats.hits, stats.misses) == (1, 1, 1)
+
+
+async def test_validate_jwt_cached_token_expiry(get_mock_token, caching_jwt_validator):
+	now = datetime.datetime.now()
+	token = get_mock_token(iat=now, exp=now + datetime.timedelta(minutes=5))
+	caching_jwt_validator.token_validate(token.str)
+
+	with pytest.MonkeyPatch.context() as m:
+		m.setattr(
+			"time.time",
+			lambda: (now + datetime.timedelta(minutes=6)).timestamp(),
+		)
+		with pytest.raises(errors.ExpiredTokenError):
+			caching_jwt_validator.token_validate(token.str)
+
+	assert caching_jwt_validator.get_cache_stats().size == 0
+
+
+@pytest.mark.parametrize(
+	"iat,exp,error",
+	[
+		(
+			datetime.datetime.now() - datetime.timedelta(minutes=10),
+			datetime.datetime.now() - datetime.timedelta(minutes=5),
+			errors.ExpiredTokenError,
+		),
+		(
+			datetime.datetime.now() + datetime.timedelta(minutes=1),
+			datetime.datetime.now() + datetime.timedelta(minutes=5),
+			errors.InvalidTokenClaimError,
+		),
+	],
+)
+async def test_validate_jwt_time_claims_checked_before_signature(
+	iat, exp, error, get_mock_token, jwt_validator
+):
+	token = get_mock_token(iat=iat, exp=exp)
+	header_str, payload_str, signature_str = token.str.split(".")
+
+	with pytest.raises(error):
+		jwt_validator.token_validate(
+			f"{header_str}.{payload_str}.{randomize_char(signature_str)}"
+		)
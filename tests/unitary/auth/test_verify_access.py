@@ -1,15 +1,19 @@
+from typing import Annotated
+
 import pytest
 from fastapi import FastAPI, APIRouter
-from fastapi import Security
+from fastapi import Depends, Security
 import httpx
 from httpx import AsyncClient
 
-from currency_exchange.auth.schemas import TokenStateDbIn
+from currency_exchange.auth.schemas import TokenStateDbIn, UserDbOut
+from currency_exchange.config import auth_settings
 from currency_exchange.auth.services.jwtservice import JWTIssuer
 from currency_exchange.auth.providers import (
 	verify_access,
 	jwt_validator_provider,
 	jwt_revocation_checker_provider,
+	get_user_from_bearer_token,
 )
 
 pytestmark = pytest.mark.anyio
@@ -29,6 +33,16 @@ def get_guarded_endpoint():
 	return {"message": "You have got a guarded resource!"}
 
 
+@test_router.get(
+	"/guarded_user_endpoint",
+	dependencies=[Security(verify_access, scopes=REQUIRED_ACCESS_SCOPES)],
+)
+def get_guarded_user_endpoint(
+	user: Annotated[UserDbOut, Depends(get_user_from_bearer_token)],
+):
+	return {"username": user.username}
+
+
 @pytest.fixture(scope="module")
 async def token_issuer(get_jwt_issuer_config) -> JWTIssuer:
 	return JWTIssuer(**get_jwt_issuer_config())
@@ -145,3 +159,108 @@ async def test_verify_access_error_when_token_has_no_token_state_in_db(
 	with pytest.raises(httpx.HTTPStatusError):
 		response.raise_for_status()
 	assert "unrecognized" in response.text.lower()
+
+
+@pytest.mark.parametrize(
+	"username, status_code", [("Bilbo_baggins", 200), ("The_Goblin_King", 403)]
+)
+async def test_get_user_from_bearer_token(
+	token_issuer,
+	request_client: AsyncClient,
+	token_state_repo,
+	token_validator_dependency_override,
+	users_models,
+	monkeypatch,
+	username,
+	status_code,
+):
+	access_token, _, payload = token_issuer.get_access_token(
+		subject=username, scope=REQUIRED_ACCESS_SCOPES
+	)
+	await token_state_repo.save(
+		TokenStateDbIn(
+			id=payload["jti"],
+			type="access",
+			device_id="none",
+			expiry_date=payload["exp"],
+			user_id=users_models[username].id,
+		)
+	)
+	validator = token_validator_dependency_override()
+	validated_tokens = []
+	token_validate = validator.token_validate
+
+	def counting_token_validate(token):
+		validated_tokens.append(token)
+		return token_validate(token)
+
+	monkeypatch.setattr(validator, "token_validate", counting_token_validate)
+
+	response = await request_client.get(
+		"/guarded_user_endpoint", headers={"Authorization": f"Bearer {access_token}"}
+	)
+
+	assert response.status_code == status_code
+	if status_code == 200:
+		assert response.json() == {"username": username}
+	assert validated_tokens == [access_token]
+
+
+async def test_token_state_is_read_once_per_request(
+	token_issuer,
+	request_client: AsyncClient,
+	app,
+	token_state_repo,
+	users_models,
+	monkeypatch,
+):
+	access_token, _, payload = token_issuer.get_access_token(
+		subject="Bilbo_baggins", scope=REQUIRED_ACCESS_SCOPES
+	)
+	await token_state_repo.save(
+		TokenStateDbIn(
+			id=payload["jti"],
+			type="access",
+			device_id="none",
+			expiry_date=payload["exp"],
+			user_id=users_models["Bilbo_baggins"].id,
+		)
+	)
+	del app.dependency_overrides[jwt_revocation_checker_provider]
+	monkeypatch.setattr(auth_settings, "REVOCATION_INDEX", False)
+	reads = []
+
+	def counting(method):
+		read = getattr(token_state_repo, method)
+
+		async def counting_read(*args):
+			reads.append(method)
+			return await read(*args)
+
+		return counting_read
+
+	for method in ("get", "get_with_user"):
+		monkeypatch.setattr(token_state_repo, method, counting(method))
+
+	response = await request_client.get(
+		"/guarded_user_endpoint", headers={"Authorization": f"Bearer {access_token}"}
+	)
+
+	assert response.status_code == 200
+	assert reads == ["get_with_user"]
+
+
+async def test_overridden_revocation_checker_is_used_without_revocation_index(
+	token_issuer, request_client: AsyncClient, monkeypatch
+):
+	# there's no state of the token in db, so the override would be bypassed by reading it
+	access_token = token_issuer.get_access_token(
+		subject="Smeagol", scope=REQUIRED_ACCESS_SCOPES
+	)[0]
+	monkeypatch.setattr(auth_settings, "REVOCATION_INDEX", False)
+
+	response = await request_client.get(
+		"/guarded_endpoint", headers={"Authorization": f"Bearer {access_token}"}
+	)
+
+	assert response.status_code == 200
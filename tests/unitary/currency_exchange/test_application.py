@@ -7,6 +7,7 @@ from currency_exchange.currency_exchange.application.dto import (
 from currency_exchange.currency_exchange.application.interactions.exchangeratesinteracions import (
 	GetExchangeRateInteraction,
 	ConvertCurrencyInteraction,
+	BatchConvertCurrencyInteraction,
 )
 from currency_exchange.currency_exchange.domain.types import CurrencyCode
 from currency_exchange.currency_exchange.application.interactions.erfetchstrategies import (
@@ -121,7 +122,8 @@ async def test_convert_currency_interaction_successful_when_cross_rate_is_needed
 	assert res.base_currency.code == "RUB"
 	assert res.target_currency.code == "EUR"
 	assert res.exchange_rate.value == pytest.approx(rate_val)
-	assert res.target_currency_amount.value == amount * rate_val
+	# amount is rounded to cents of the target currency
+	assert res.target_currency_amount.value == round(amount * rate_val, 2)
 
 
 async def test_convert_currency_interaction_successful_when_same_base_and_target_currency(
@@ -138,3 +140,50 @@ async def test_convert_currency_interaction_successful_when_same_base_and_target
 	assert res.target_currency.code == "RUB"
 	assert res.exchange_rate.value == 1
 	assert res.target_currency_amount.value == amount * 1
+
+
+async def test_get_exchange_rate_interaction_by_rates_chain_successful(
+	get_exchange_rate_interaction, exchange_rates_models
+):
+	res = await get_exchange_rate_interaction(
+		GetExchangeRateDto(CurrencyCode("KZT"), CurrencyCode("GBP")),
+		rate_fetch_strategy=ERFetchStrat.BY_COMMON_CURRENCY
+		| ERFetchStrat.BY_RATES_CHAIN,
+	)
+
+	assert res.base_currency.code == "KZT"
+	assert res.target_currency.code == "GBP"
+	assert res.rate.value == pytest.approx(
+		exchange_rates_models["KZT", "RUB"].value.value
+		* exchange_rates_models["RUB", "USD"].value.value
+		* exchange_rates_models["USD", "GBP"].value.value
+	)
+
+
+async def test_batch_convert_currency_interaction_successful(
+	exchange_rates_repo, currencies_repo, exchange_rates_models
+):
+	interaction = BatchConvertCurrencyInteraction(exchange_rates_repo, currencies_repo)
+	rate_val = (
+		exchange_rates_models["RUB", "USD"].value.value
+		/ exchange_rates_models[("EUR", "USD")].value.value
+	)
+
+	res = await interaction(
+		[
+			MakeConvertionDto(
+				CurrencyCode("RUB"), CurrencyCode("EUR"), CurrencyAmount(10)
+			),
+			MakeConvertionDto(
+				CurrencyCode("GBP"), CurrencyCode("KZT"), CurrencyAmount(10)
+			),
+			MakeConvertionDto(
+				CurrencyCode("RUB"), CurrencyCode("EUR"), CurrencyAmount(20)
+			),
+		],
+		rate_fetch_strategy=ERFetchStrat.BY_COMMON_CURRENCY,
+	)
+
+	assert res[0].target_currency_amount.value == round(10 * rate_val, 2)
+	assert isinstance(res[1], errors.CurrenciesConvertionError)
+	assert res[2].target_currency_amount.value == round(20 * rate_val, 2)
@@ -0,0 +1,245 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from currency_exchange.currency_exchange.application.dto import (
+	GetCurrencyDto,
+	GetExchangeRateDto,
+	AddExchangeRateDto,
+	AlterExchangeRateDto,
+	DeleteExchangeRateDto,
+)
+from currency_exchange.currency_exchange.domain.types import (
+	CurrencyCode,
+	CurrencyName,
+	ExchangeRateValue,
+)
+from currency_exchange.currency_exchange.application import errors
+from currency_exchange.currency_exchange.application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from currency_exchange.utils.boundedcache import (
+	BoundedCache,
+)
+from currency_exchange.currency_exchange.infrastructure.cache.repos import (
+	CachingCurrencyRepo,
+	CachingExchangeRatesRepo,
+	invalidate_exchange_rates,
+)
+from currency_exchange.currency_exchange.infrastructure.dataversion import DataVersion
+from currency_exchange.currency_exchange.infrastructure.db.repos import (
+	ExchangeRatesPostgresRepo,
+)
+from currency_exchange.db.changes import ChangesListener, PROCESS_ID, TopicVersion
+from currency_exchange.db.unitofwork import UnitOfWorkSessionFactory, unit_of_work
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache() -> BoundedCache:
+	return BoundedCache(100)
+
+
+@pytest.fixture
+async def caching_currencies_repo(currencies_repo, cache) -> CachingCurrencyRepo:
+	return CachingCurrencyRepo(currencies_repo, cache)
+
+
+@pytest.fixture
+async def caching_exchange_rates_repo(
+	exchange_rates_repo, cache
+) -> CachingExchangeRatesRepo:
+	return CachingExchangeRatesRepo(exchange_rates_repo, cache)
+
+
+@pytest.mark.parametrize(
+	"policy, expected_keys", [("lru", ["b", "c", "d"]), ("lfu", ["a", "c", "d"])]
+)
+def test_bounded_cache_eviction(policy, expected_keys):
+	cache = BoundedCache(3, policy)
+	for key in "a", "b", "c":
+		cache.set(key, key)
+	for key in "a", "a", "a", "b", "c":
+		cache.get(key)
+
+	cache.set("d", "d")
+
+	assert sorted(key for key in "abcd" if key in cache) == expected_keys
+	stats = cache.get_stats()
+	assert (stats.size, stats.hits, stats.misses, stats.evictions) == (3, 5, 0, 1)
+
+
+def test_bounded_cache_invalidate_tagged():
+	cache = BoundedCache(10)
+	cache.set("a", 1, tags=["x"])
+	cache.set("b", 2, tags=["x", "y"])
+	cache.set("c", 3, tags=["y"])
+
+	cache.invalidate_tagged("x")
+
+	assert "c" in cache and len(cache) == 1
+	assert cache.get("a", None) is None
+	assert cache.get_stats().invalidations == 2
+
+
+async def test_currency_reads_are_cached(caching_currencies_repo, cache):
+	for _ in range(2):
+		res = await caching_currencies_repo.get_currency(
+			GetCurrencyDto(name=CurrencyName("Euro"))
+		)
+		assert res.code == "EUR"
+		with pytest.raises(errors.CurrencyDoesNotExistError):
+			await caching_currencies_repo.get_currency(
+				GetCurrencyDto(CurrencyCode("XXX"))
+			)
+
+	stats = cache.get_stats()
+	assert (stats.hits, stats.misses) == (2, 2)
+
+
+async def test_rate_reads_are_cached_and_invalidated_by_writes(
+	caching_exchange_rates_repo, exchange_rates_repo, cache
+):
+	rate_data = GetExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("KZT"))
+	strategy = ERFetchStrat.BY_REVERSED_RATE | ERFetchStrat.BY_COMMON_CURRENCY
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await caching_exchange_rates_repo.get_rate(rate_data)
+	reversed_data = GetExchangeRateDto(CurrencyCode("KZT"), CurrencyCode("GBP"))
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await caching_exchange_rates_repo.resolve_rate(
+			reversed_data, rate_fetch_strategy=strategy
+		)
+	all_rates_count = len(await caching_exchange_rates_repo.get_all_rates())
+
+	await caching_exchange_rates_repo.save_rate(
+		AddExchangeRateDto(
+			rate_data.base_currency, rate_data.target_currency, ExchangeRateValue(650)
+		)
+	)
+	try:
+		res = await caching_exchange_rates_repo.get_rate(rate_data)
+		assert res.rate.value == pytest.approx(650)
+		_, fetched_by = await caching_exchange_rates_repo.resolve_rate(
+			reversed_data, rate_fetch_strategy=strategy
+		)
+		assert fetched_by is ERFetchStrat.BY_REVERSED_RATE
+		assert len(await caching_exchange_rates_repo.get_all_rates()) == (
+			all_rates_count + 1
+		)
+
+		await caching_exchange_rates_repo.update_rate(
+			AlterExchangeRateDto(
+				rate_data.base_currency,
+				rate_data.target_currency,
+				ExchangeRateValue(600),
+			)
+		)
+		res = await caching_exchange_rates_repo.get_rate(rate_data)
+		assert res.rate.value == pytest.approx(600)
+	finally:
+		await exchange_rates_repo.delete_rate(
+			DeleteExchangeRateDto(rate_data.base_currency, rate_data.target_currency)
+		)
+	cache.clear()
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await caching_exchange_rates_repo.get_rate(rate_data)
+
+
+async def test_rates_read_after_writes_of_rolled_back_unit_of_work_arent_cached(
+	local_sessionmaker, cache
+):
+	caching_exchange_rates_repo = CachingExchangeRatesRepo(
+		ExchangeRatesPostgresRepo(UnitOfWorkSessionFactory(local_sessionmaker)), cache
+	)
+	rate_data = GetExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("KZT"))
+
+	with pytest.raises(RuntimeError):
+		async with unit_of_work():
+			await caching_exchange_rates_repo.save_rate(
+				AddExchangeRateDto(
+					rate_data.base_currency,
+					rate_data.target_currency,
+					ExchangeRateValue(650),
+				)
+			)
+			res = await caching_exchange_rates_repo.get_rate(rate_data)
+			assert res.rate.value == pytest.approx(650)
+			raise RuntimeError
+
+	assert len(cache) == 0
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await caching_exchange_rates_repo.get_rate(rate_data)
+
+
+def test_changes_listener_passes_missed_changes_as_whole_topic():
+	listener = ChangesListener(None, poll_interval=1)
+	changes = []
+	listener.subscribe("exchange_rates", changes.append)
+
+	def notification(version, origin="other"):
+		return json.dumps(
+			{
+				"topic": "exchange_rates",
+				"version": version,
+				"keys": ["USDEUR"],
+				"origin": origin,
+			}
+		)
+
+	listener.handle_versions({"exchange_rates": 3})
+	listener.handle_notification(notification(4))
+	# change made by this process is already applied
+	listener.handle_notification(notification(5, origin=PROCESS_ID))
+	listener.handle_notification(notification(7))
+	listener.handle_versions({"exchange_rates": 8})
+	listener.handle_notification(notification(8))
+
+	assert changes == [["USDEUR"], None, None]
+
+
+def test_data_version_is_the_same_for_processes_seen_the_same_changes():
+	changed_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+	writer_version = DataVersion()
+	writer_version.update(TopicVersion("currencies", 2, changed_at))
+	writer_version.update(
+		TopicVersion("exchange_rates", 5, changed_at + timedelta(seconds=1))
+	)
+	listener = ChangesListener(None, poll_interval=1)
+	listener.handle_versions(
+		{"currencies": 2, "exchange_rates": 4}, {"currencies": changed_at}
+	)
+	listener.handle_notification(
+		json.dumps(
+			{
+				"topic": "exchange_rates",
+				"version": 5,
+				"changed_at": (changed_at + timedelta(seconds=1)).isoformat(),
+				"keys": ["USDEUR"],
+				"origin": "other",
+			}
+		)
+	)
+	reader_version = DataVersion()
+	for topic in ("currencies", "exchange_rates"):
+		reader_version.update(listener.get_version(topic))
+
+	assert reader_version.etag == writer_version.etag
+	assert reader_version.changed_at == writer_version.changed_at
+
+
+async def test_rates_changes_of_other_process_invalidate_cache(
+	caching_exchange_rates_repo, cache
+):
+	usd_eur = GetExchangeRateDto(CurrencyCode("USD"), CurrencyCode("EUR"))
+	rub_jpy = GetExchangeRateDto(CurrencyCode("RUB"), CurrencyCode("JPY"))
+	await caching_exchange_rates_repo.get_rate(usd_eur)
+	await caching_exchange_rates_repo.get_rate(rub_jpy)
+
+	invalidate_exchange_rates(cache, ["EURUSD"])
+	assert ("rate", "USD", "EUR") not in cache
+	assert ("rate", "RUB", "JPY") in cache
+
+	invalidate_exchange_rates(cache, None)
+	assert len(cache) == 0
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 
 from currency_exchange.currency_exchange.domain.entities import (
@@ -11,7 +12,7 @@ from currency_exchange.currency_exchange.domain.types import (
 	CurrencyName,
 	ExchangeRateValue,
 )
-from currency_exchange.currency_exchange.domain import errors
+from currency_exchange.currency_exchange.domain import errors, fixedpoint
 
 
 @pytest.mark.parametrize(
@@ -33,6 +34,16 @@ def test_currency_init_error(code, name, sign):
 		Currency(CurrencyCode(code), CurrencySign(sign), CurrencyName(name))
 
 
+def test_interned_values_are_shared():
+	code = CurrencyCode.interned("USD")
+
+	assert code is CurrencyCode.interned("USD")
+	assert code == CurrencyCode("USD")
+	assert CurrencyName.interned("USD") is not code
+	with pytest.raises(errors.IncorrectCurrencyCodeError):
+		CurrencyCode.interned("US1")
+
+
 @pytest.mark.parametrize("rate", [0, -1, float("inf"), float("-inf")])
 def test_exchange_rate_incorrect_rate_value_error(rate):
 	with pytest.raises(errors.IncorrectExchangeRateValue):
@@ -80,6 +91,87 @@ def test_exchange_rate_convertion_successful():
 	assert er.convert(CurrencyAmount(convert_amount)) == rate * convert_amount
 
 
+@pytest.mark.parametrize(
+	"base, target, rate, amount, expected",
+	[
+		("USD", "RUB", 80.123456, 10.05, 805.24),
+		("USD", "JPY", 151.37, 10.05, 1521),
+		("JPY", "BHD", 0.0025, 1001, 2.502),
+		("USD", "EUR", 0.5, 0.01, 0),
+		("USD", "EUR", 0.5, 0.03, 0.02),
+	],
+)
+def test_exchange_rate_convertion_rounded_to_minor_unit(
+	base, target, rate, amount, expected
+):
+	er = CurrenciesExchangeRate(
+		Currency(CurrencyCode(base), CurrencySign("$"), CurrencyName("Base")),
+		Currency(CurrencyCode(target), CurrencySign("$"), CurrencyName("Target")),
+		ExchangeRateValue(rate),
+	)
+
+	assert er.convert(CurrencyAmount(amount)) == expected
+
+
+@pytest.mark.parametrize(
+	"dividend, divisor, expected",
+	[(5, 2, 2), (7, 2, 4), (-5, 2, -2), (10, 4, 2), (11, 4, 3), (9, 3, 3)],
+)
+def test_div_round_half_even(dividend, divisor, expected):
+	assert fixedpoint.div_round_half_even(dividend, divisor) == expected
+
+
+@pytest.mark.parametrize("rate", [1e-10, fixedpoint.MAX_RATE + 1, 1e300])
+def test_to_scaled_rate_error_when_rate_is_out_of_range(rate):
+	with pytest.raises(errors.IncorrectExchangeRateValue):
+		fixedpoint.to_scaled_rate(rate)
+
+
+def test_scaled_rates_error_when_computed_rate_is_out_of_range():
+	assert fixedpoint.to_scaled_rate(fixedpoint.MAX_RATE) <= np.iinfo(np.int64).max
+	small = fixedpoint.to_scaled_rate(1e-6)
+	large = fixedpoint.to_scaled_rate(fixedpoint.MAX_RATE)
+
+	for compute in (
+		lambda: fixedpoint.multiply_scaled_rates(small, small),
+		lambda: fixedpoint.multiply_scaled_rates(large, large),
+		lambda: fixedpoint.divide_scaled_rates(large, small),
+		lambda: fixedpoint.reverse_scaled_rate(large),
+		lambda: fixedpoint.reverse_scaled_rate(0),
+	):
+		with pytest.raises(errors.IncorrectExchangeRateValue):
+			compute()
+
+
+# products of larger amounts and rates overflow int64
+@pytest.mark.parametrize("max_amount, max_rate", [(10, 10), (10**12, 10**4)])
+def test_vectorized_convertion_equals_scalar_one(max_amount, max_rate):
+	rng = np.random.default_rng(0)
+	amounts = rng.uniform(0.01, max_amount, 1000)
+	rates = rng.uniform(0.0001, max_rate, 1000)
+	base_units = rng.choice([0, 2, 3], 1000)
+	target_units = rng.choice([0, 2, 3], 1000)
+
+	converted = fixedpoint.convert_minor_units_array(
+		fixedpoint.to_minor_units_array(amounts, base_units),
+		np.array([fixedpoint.to_scaled_rate(rate) for rate in rates.tolist()]),
+		base_units,
+		target_units,
+	)
+
+	assert converted.tolist() == [
+		fixedpoint.convert_minor_units(
+			fixedpoint.to_minor_units(amount, base_unit),
+			fixedpoint.to_scaled_rate(rate),
+			base_unit,
+			target_unit,
+		)
+		for amount, rate, base_unit, target_unit in zip(
+			amounts.tolist(), rates.tolist(), base_units.tolist(), target_units.tolist()
+		)
+	]
+
+
 @pytest.mark.parametrize("convert_amount", [0, -1, float("inf"), float("-inf")])
 def test_exchange_rate_convertion_error_on_incorrect_amount(convert_amount):
 	rate = 90
@@ -200,3 +292,25 @@ def test_exchange_rate_get_cross_rate_error_when_no_common_currency():
 
 	with pytest.raises(errors.CrossExchangeRateComputationError):
 		rate1.get_cross_rate(rate2)
+
+
+def test_exchange_rate_get_chained_rate_successful():
+	rate1 = CurrenciesExchangeRate(
+		Currency(CurrencyCode("RUB"), CurrencySign("Р"), CurrencyName("Russian ruble")),
+		Currency(CurrencyCode("USD"), CurrencySign("$"), CurrencyName("US dollar")),
+		ExchangeRateValue(0.01),
+	)
+	rate2 = CurrenciesExchangeRate(
+		Currency(CurrencyCode("USD"), CurrencySign("$"), CurrencyName("US dollar")),
+		Currency(CurrencyCode("EUR"), CurrencySign("E"), CurrencyName("Euro")),
+		ExchangeRateValue(0.88),
+	)
+
+	chained_rate = rate1.get_chained_rate(rate2)
+
+	assert chained_rate.base.code == "RUB"
+	assert chained_rate.target.code == "EUR"
+	assert chained_rate.rate.value == pytest.approx(0.01 * 0.88)
+
+	with pytest.raises(errors.ExchangeRatesChainComputationError):
+		rate2.get_chained_rate(rate1)
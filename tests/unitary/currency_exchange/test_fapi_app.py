@@ -1,9 +1,15 @@
+from decimal import Decimal
+import json
+
 import pytest
 
 from sqlalchemy import select
 
 import currency_exchange.db.session
-from currency_exchange.auth.schemas import UserDbOut
+from currency_exchange.config import auth_settings, db_conn_settings
+from currency_exchange.db.unitofwork import UnitOfWorkSessionFactory
+from currency_exchange.auth import get_token_state_repo
+from currency_exchange.auth.schemas import TokenStateDbIn, UserDbOut
 from currency_exchange.auth.providers import (
 	jwt_revocation_checker_provider,
 	JWTIssuerProvider,
@@ -13,6 +19,30 @@ from currency_exchange.currency_exchange.fapiadoption.appadapter import (
 	currency_exchange_app,
 )
 from currency_exchange.currency_exchange.fapiadoption.main import app as fapi_app
+from currency_exchange.currency_exchange.application.dto import (
+	CurrencyDto,
+	ExchangeRateDto,
+	ConvertedCurrenciesPairDto,
+)
+from currency_exchange.currency_exchange.domain.types import (
+	CurrencyAmount,
+	CurrencyCode,
+	CurrencyName,
+	CurrencySign,
+	ExchangeRateValue,
+)
+from currency_exchange.currency_exchange.fapiadoption.schemas import (
+	CurrencyOutSchema,
+	ExchangeRateOutSchema,
+	ConvertedCurrencySchema,
+)
+from currency_exchange.currency_exchange.fapiadoption.serializers import (
+	DTO_SERIALIZERS,
+)
+from currency_exchange.currency_exchange.fapiadoption.responsecache import (
+	ResponseCache,
+	choose_encoding,
+)
 from currency_exchange.currency_exchange.infrastructure.db.dbmodels import (
 	CurrencyORMModel,
 	CurrenciesExchangeRateORMModel,
@@ -32,9 +62,11 @@ async def app(local_sessionmaker):
 
 		return check_revocation
 
-	currency_exchange.db.session.async_session_factory = local_sessionmaker
-	currency_exchange_app._exchange_rates_repo._session_factory = local_sessionmaker
-	currency_exchange_app._currencies_repo._session_factory = local_sessionmaker
+	# requests are handled within units of work
+	session_factory = UnitOfWorkSessionFactory(local_sessionmaker)
+	currency_exchange.db.session.async_session_factory = session_factory
+	currency_exchange_app._exchange_rates_repo._session_factory = session_factory
+	currency_exchange_app._currencies_repo._session_factory = session_factory
 
 	fapi_app.dependency_overrides = {
 		jwt_revocation_checker_provider: jwt_token_revocation_checker_stub
@@ -42,6 +74,12 @@ async def app(local_sessionmaker):
 	return fapi_app
 
 
+@pytest.fixture(autouse=True)
+def reset_data_version(monkeypatch):
+	# versions of changes topics are rolled back along with the test's changes
+	monkeypatch.setattr(currency_exchange_app.get_data_version(), "_versions", {})
+
+
 @pytest.fixture(scope="module", autouse=True)
 async def app_user(local_sessionmaker):
 	session = local_sessionmaker()
@@ -78,6 +116,90 @@ async def admin_access_token(admin_user):
 	return issuer.get_access_token()
 
 
+@pytest.mark.parametrize(
+	"accept_encoding, expected_encoding",
+	[
+		("gzip, deflate", "gzip"),
+		("deflate, gzip;q=0", "identity"),
+		("*;q=0.5", "gzip"),
+		("", "identity"),
+		("br;q=0.1, gzip;q=0.9", "gzip"),
+		("br;q=0, *", "gzip"),
+		("gzip;q=0.5, identity", "identity"),
+		("gzip;q=0.5, *;q=0.1", "gzip"),
+		("gzip;q=0, identity;q=0", "identity"),
+	],
+)
+def test_choose_encoding(accept_encoding, expected_encoding):
+	assert choose_encoding(accept_encoding) == expected_encoding
+
+
+@pytest.mark.parametrize("value", [1, 3.0, 0.005, 1.23456, Decimal("12.345"), 1e17])
+def test_dto_serializers_output_equals_schemas_output(value):
+	base = CurrencyDto(
+		CurrencyCode("eur"), CurrencyName("Euro"), CurrencySign('€"\n'), id=1
+	)
+	target = CurrencyDto(
+		CurrencyCode("RUB"), CurrencyName("Russian ruble"), CurrencySign("Р"), id=2
+	)
+	dtos = {
+		CurrencyOutSchema: base,
+		ExchangeRateOutSchema: ExchangeRateDto(
+			base, target, ExchangeRateValue(value), id=3
+		),
+		ConvertedCurrencySchema: ConvertedCurrenciesPairDto(
+			base,
+			target,
+			ExchangeRateValue(value),
+			CurrencyAmount(value),
+			CurrencyAmount(value * 2),
+		),
+	}
+
+	for schema, dto in dtos.items():
+		assert (
+			DTO_SERIALIZERS[schema](dto)
+			== schema.model_validate(dto, from_attributes=True)
+			.model_dump_json(by_alias=True)
+			.encode()
+		)
+
+
+@pytest.mark.parametrize("is_active, status_code", [(True, 200), (False, 403)])
+async def test_endpoint_error_when_user_is_not_active(
+	app, request_client, db_session, monkeypatch, is_active, status_code
+):
+	user = User(
+		username="ce_deactivated_client",
+		password="abrakadabra",
+		category=UserCategory.API_CLIENT,
+		is_active=is_active,
+	)
+	async with db_session.begin():
+		db_session.add(user)
+	token, _, payload = JWTIssuerProvider(
+		UserDbOut.model_validate(user), "none"
+	).get_access_token()
+	await get_token_state_repo().save(
+		TokenStateDbIn(
+			id=payload["jti"],
+			type="access",
+			device_id="none",
+			expiry_date=payload["exp"],
+			user_id=user.id,
+		)
+	)
+	# the user is read along with the token state, when revocation index isn't used
+	monkeypatch.delitem(app.dependency_overrides, jwt_revocation_checker_provider)
+	monkeypatch.setattr(auth_settings, "REVOCATION_INDEX", False)
+
+	response = await request_client.get(
+		"/currency/EUR", headers={"Authorization": f"Bearer {token}"}
+	)
+
+	assert response.status_code == status_code
+
+
 class TestCurrenciesEndpoints:
 	all_currencies_endpoint = "/currencies"
 	add_currency_endpoint = "/currencies"
@@ -105,6 +227,36 @@ class TestCurrenciesEndpoints:
 
 		assert len(response_data) == len(currencies_from_db)
 
+	async def test_get_currencies_page_successful(self, access_token, request_client):
+		response = await request_client.get(
+			self.all_currencies_endpoint,
+			params={"codes": ["USD", "EUR", "RUB"], "after": "EUR", "limit": 1},
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+		)
+
+		assert response.status_code == 200
+		assert [c["code"] for c in response.json()] == ["RUB"]
+		assert "after=RUB" in response.links["next"]["url"]
+
+	async def test_get_currencies_page_cached_links_to_requested_host(
+		self, access_token, request_client, monkeypatch
+	):
+		response_cache = ResponseCache(
+			10, 1024 * 1024, currency_exchange_app.get_data_version()
+		)
+		monkeypatch.setattr(currency_exchange_app, "_response_cache", response_cache)
+
+		for url in ("http://127.0.0.1", "https://example.com", "http://127.0.0.1"):
+			response = await request_client.get(
+				url + self.all_currencies_endpoint,
+				params={"after": "EUR", "limit": 1},
+				headers={"Authorization": f"Bearer {access_token[0]}"},
+			)
+
+			assert response.status_code == 200
+			assert response.links["next"]["url"].startswith(url + "/")
+		assert response_cache.get_stats().hits == 1
+
 	async def test_get_currency_successful(
 		self, access_token, request_client, db_session, get_currency_request_endpoint
 	):
@@ -281,6 +433,7 @@ class TestCurrenciesEndpoints:
 class TestExchangeRatesEndpoints:
 	get_all_exch_rates_endpoint = "/exchangerates"
 	add_exch_rate_endpoint = "/exchangerates"
+	bulk_exch_rates_endpoint = "/exchangerates/bulk"
 
 	@pytest.fixture(scope="class")
 	async def get_exchange_rate_request_endpoint(self):
@@ -305,6 +458,25 @@ class TestExchangeRatesEndpoints:
 
 		assert len(response_data) == len(ers_from_db)
 
+	async def test_get_all_exchange_rates_as_ndjson(
+		self, access_token, request_client, db_session
+	):
+		response = await request_client.get(
+			self.get_all_exch_rates_endpoint,
+			headers={
+				"Authorization": f"Bearer {access_token[0]}",
+				"Accept": "application/x-ndjson",
+			},
+		)
+
+		assert response.status_code == 200
+		assert response.headers["content-type"] == "application/x-ndjson"
+
+		response_data = [json.loads(line) for line in response.text.splitlines()]
+		ers_from_db = await db_session.scalars(select(CurrenciesExchangeRateORMModel))
+		assert {er["id"] for er in response_data} == {er.id for er in ers_from_db}
+		assert {"baseCurrency", "targetCurrency", "rate"} <= response_data[0].keys()
+
 	async def test_get_exchange_rate_successful(
 		self,
 		access_token,
@@ -323,6 +495,38 @@ class TestExchangeRatesEndpoints:
 		er_from_db = await get_exchange_rate_from_db("EUR", "USD", db_session)
 		assert response_data["id"] == er_from_db.id
 
+	async def test_get_exchange_rate_as_of(
+		self,
+		access_token,
+		request_client,
+		get_exchange_rate_request_endpoint,
+		db_session,
+	):
+		responses = [
+			await request_client.get(
+				get_exchange_rate_request_endpoint("EURUSD"),
+				params={"as_of": as_of},
+				headers={"Authorization": f"Bearer {access_token[0]}"},
+			)
+			for as_of in ("2000-01-01T00:00:00Z", "2100-01-01T00:00:00Z")
+		]
+
+		assert [response.status_code for response in responses] == [404, 200]
+		er_from_db = await get_exchange_rate_from_db("EUR", "USD", db_session)
+		assert responses[1].json()["id"] == er_from_db.id
+
+	@pytest.mark.parametrize("as_of", [None, "2100-01-01T00:00:00Z"])
+	async def test_get_exchange_rate_error_when_currency_doesnt_exist(
+		self, as_of, access_token, request_client, get_exchange_rate_request_endpoint
+	):
+		response = await request_client.get(
+			get_exchange_rate_request_endpoint("EURXXX"),
+			params={"as_of": as_of} if as_of is not None else {},
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+		)
+
+		assert response.status_code == 404
+
 	async def test_get_exchange_rate_error_when_exchange_rate_doesnt_exist(
 		self, access_token, request_client, get_exchange_rate_request_endpoint
 	):
@@ -333,6 +537,30 @@ class TestExchangeRatesEndpoints:
 
 		assert response.status_code == 404
 
+	async def test_get_exchange_rate_error_when_reversed_rate_is_out_of_range(
+		self, access_token, request_client, get_exchange_rate_request_endpoint
+	):
+		headers = {"Authorization": f"Bearer {access_token[0]}"}
+		response = await request_client.patch(
+			get_exchange_rate_request_endpoint("EURJPY"),
+			headers=headers,
+			data={"rate": 9e9},
+		)
+		assert response.status_code == 200
+
+		# reversed rate is rounded to zero in fixed point
+		response = await request_client.get(
+			get_exchange_rate_request_endpoint("JPYEUR"), headers=headers
+		)
+		assert response.status_code == 404
+
+		response = await request_client.get(
+			"/exchange",
+			headers=headers,
+			params={"from_": "JPY", "to": "EUR", "amount": 100},
+		)
+		assert response.status_code == 404
+
 	@pytest.mark.parametrize("codes", ["EUR", "EURUS", ""])
 	async def test_get_exchange_rate_error_when_bad_data_in_request(
 		self, codes, access_token, request_client, get_exchange_rate_request_endpoint
@@ -364,6 +592,146 @@ class TestExchangeRatesEndpoints:
 		er_from_db = await get_exchange_rate_from_db("RUB", "USD", db_session)
 		assert new_rate == er_from_db.value.value
 
+	async def test_get_exchange_rates_not_modified_until_rate_is_updated(
+		self, access_token, request_client, get_exchange_rate_request_endpoint
+	):
+		headers = {"Authorization": f"Bearer {access_token[0]}"}
+		response = await request_client.get(
+			self.get_all_exch_rates_endpoint, headers=headers
+		)
+		etag = response.headers["etag"]
+
+		for endpoint in (
+			self.get_all_exch_rates_endpoint,
+			get_exchange_rate_request_endpoint("RUBUSD"),
+		):
+			response = await request_client.get(
+				endpoint, headers={**headers, "If-None-Match": etag}
+			)
+			assert response.status_code == 304
+			assert response.headers["etag"] == etag
+			assert not response.content
+
+		await request_client.patch(
+			get_exchange_rate_request_endpoint("RUBUSD"),
+			headers=headers,
+			data={"rate": 80},
+		)
+		response = await request_client.get(
+			get_exchange_rate_request_endpoint("RUBUSD"),
+			headers={**headers, "If-None-Match": etag},
+		)
+
+		assert response.status_code == 200
+		assert response.json()["rate"] == 80
+		assert response.headers["etag"] != etag
+
+		response = await request_client.get(
+			get_exchange_rate_request_endpoint("RUBUSD"),
+			headers={
+				**headers,
+				"If-Modified-Since": response.headers["last-modified"],
+			},
+		)
+		assert response.status_code == 304
+
+	async def test_get_exchange_rates_from_response_cache(
+		self,
+		access_token,
+		admin_access_token,
+		request_client,
+		get_exchange_rate_request_endpoint,
+		monkeypatch,
+	):
+		response_cache = ResponseCache(
+			10, 1024 * 1024, currency_exchange_app.get_data_version()
+		)
+		monkeypatch.setattr(currency_exchange_app, "_response_cache", response_cache)
+		headers = {"Authorization": f"Bearer {access_token[0]}"}
+
+		first = await request_client.get(
+			self.get_all_exch_rates_endpoint, headers=headers
+		)
+		cached = await request_client.get(
+			self.get_all_exch_rates_endpoint,
+			headers={**headers, "Accept-Encoding": "gzip"},
+		)
+
+		assert cached.headers["content-encoding"] == "gzip"
+		assert cached.json() == first.json()
+		assert cached.headers["etag"] == first.headers["etag"]
+
+		await request_client.patch(
+			get_exchange_rate_request_endpoint("RUBUSD"),
+			headers=headers,
+			data={"rate": 81},
+		)
+		for _ in range(2):
+			response = await request_client.get(
+				get_exchange_rate_request_endpoint("RUBUSD"), headers=headers
+			)
+			assert response.json()["rate"] == 81
+
+		response = await request_client.get(
+			"/admin/stats/responses",
+			headers={"Authorization": f"Bearer {admin_access_token[0]}"},
+		)
+		assert response.status_code == 200
+		assert (response.json()["hits"], response.json()["invalidations"]) == (2, 1)
+
+	async def test_get_pool_stats(
+		self, admin_access_token, access_token, request_client
+	):
+		response = await request_client.get(
+			"/admin/stats/pool",
+			headers={"Authorization": f"Bearer {admin_access_token[0]}"},
+		)
+		assert response.status_code == 200
+		assert response.json()["size"] == db_conn_settings.POOL_SIZE
+
+		response = await request_client.get(
+			"/admin/stats/pool",
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+		)
+		assert response.status_code == 403
+
+	async def test_get_tokens_cache_stats(self, admin_access_token, request_client):
+		responses = [
+			await request_client.get(
+				"/admin/stats/tokens",
+				headers={"Authorization": f"Bearer {admin_access_token[0]}"},
+			)
+			for _ in range(2)
+		]
+		assert [response.status_code for response in responses] == [200, 200]
+		assert responses[1].json()["hits"] > responses[0].json()["hits"]
+
+	async def test_read_exchange_rates_with_fast_serialization(
+		self,
+		access_token,
+		request_client,
+		get_exchange_rate_request_endpoint,
+		monkeypatch,
+	):
+		headers = {"Authorization": f"Bearer {access_token[0]}"}
+		endpoints = (
+			self.get_all_exch_rates_endpoint,
+			get_exchange_rate_request_endpoint("EURUSD"),
+			"/currency/EUR",
+			"/exchange?from_=EUR&to=USD&amount=10",
+		)
+		validated = [
+			(await request_client.get(endpoint, headers=headers)).content
+			for endpoint in endpoints
+		]
+
+		monkeypatch.setattr(currency_exchange_app, "_fast_serialization", True)
+
+		for endpoint, content in zip(endpoints, validated):
+			response = await request_client.get(endpoint, headers=headers)
+			assert response.status_code == 200
+			assert response.content == content
+
 	async def test_update_exchange_rate_error_when_rate_doesnt_exist(
 		self, access_token, request_client, get_exchange_rate_request_endpoint
 	):
@@ -381,6 +749,8 @@ class TestExchangeRatesEndpoints:
 		[
 			{"codes": "EURUSD", "rate": 0},
 			{"codes": "EURUSD", "rate": -1},
+			{"codes": "EURUSD", "rate": 1e10},
+			{"codes": "EURUSD", "rate": 1e-10},
 			{"codes": "EURUSD", "rate": None},
 			{"codes": "EURUSD", "rat": 10},
 			{"codes": "EUR", "rate": 10},
@@ -442,6 +812,8 @@ class TestExchangeRatesEndpoints:
 		[
 			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "USD", "rate": 0},
 			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "USD", "rate": -1},
+			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "USD", "rate": 1e10},
+			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "USD", "rate": 0.001},
 			{"baseCurrencyCode": "EU", "target": "USD", "targetCurrencyCode": 1},
 			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "US", "rate": 1},
 			{"baseCurrencyCode": None, "targetCurrencyCode": "USD", "rate": 1},
@@ -469,6 +841,50 @@ class TestExchangeRatesEndpoints:
 		)
 		assert response.status_code == 404
 
+	async def test_upsert_exchange_rates_successful(
+		self, access_token, request_client, db_session
+	):
+		items = [
+			{"baseCurrencyCode": "DKK", "targetCurrencyCode": "USD", "rate": 0.15},
+			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "USD", "rate": 1.2},
+			{"baseCurrencyCode": "XXX", "targetCurrencyCode": "USD", "rate": 1},
+			{"baseCurrencyCode": "EUR", "targetCurrencyCode": "EUR", "rate": 1},
+		]
+		response = await request_client.post(
+			self.bulk_exch_rates_endpoint,
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+			json={"items": items},
+		)
+		assert response.status_code == 200
+
+		response_data = response.json()
+		assert [item["created"] for item in response_data] == [True, False, None, None]
+		assert response_data[2]["error"] is not None
+		assert response_data[3]["error"] is not None
+		for item in items[:2]:
+			er_from_db = await get_exchange_rate_from_db(
+				item["baseCurrencyCode"], item["targetCurrencyCode"], db_session
+			)
+			assert er_from_db.value.value == pytest.approx(item["rate"])
+
+	@pytest.mark.parametrize(
+		"items",
+		[
+			[],
+			[{"baseCurrencyCode": "EUR", "targetCurrencyCode": "US", "rate": 1}],
+			[{"baseCurrencyCode": "EUR", "targetCurrencyCode": "USD", "rate": 0}],
+		],
+	)
+	async def test_upsert_exchange_rates_error_when_bad_data_in_request(
+		self, items, access_token, request_client
+	):
+		response = await request_client.post(
+			self.bulk_exch_rates_endpoint,
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+			json={"items": items},
+		)
+		assert response.status_code == 400
+
 	async def test_delete_exchange_rate_successful(
 		self,
 		admin_access_token,
@@ -498,6 +914,7 @@ class TestExchangeRatesEndpoints:
 
 class TestConvertionEndpoint:
 	convertion_endpoint = "/exchange"
+	convertion_batch_endpoint = "/exchange/batch"
 
 	async def test_convert_currency_straight_strat_successful(
 		self, access_token, request_client, db_session
@@ -562,6 +979,72 @@ class TestConvertionEndpoint:
 
 		assert response.status_code == 404
 
+	@pytest.mark.parametrize("as_of", [None, "2100-01-01T00:00:00Z"])
+	async def test_convert_currency_error_when_currency_doesnt_exist(
+		self, as_of, access_token, request_client
+	):
+		params = {"from_": "XXX", "to": "USD", "amount": 100}
+		if as_of is not None:
+			params["as_of"] = as_of
+
+		response = await request_client.get(
+			self.convertion_endpoint,
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+			params=params,
+		)
+
+		assert response.status_code == 404
+
+	async def test_convert_currency_batch_successful(
+		self, access_token, request_client, db_session
+	):
+		items = [
+			{"from_": "RUB", "to": "USD", "amount": 1000},
+			{"from_": "GBP", "to": "KZT", "amount": 100},
+			{"from_": "USD", "to": "RUB", "amount": 100},
+			{"from_": "RUB", "to": "USD", "amount": 10},
+		]
+		response = await request_client.post(
+			self.convertion_batch_endpoint,
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+			json={"items": items},
+		)
+		assert response.status_code == 200
+
+		er = await get_exchange_rate_from_db("RUB", "USD", db_session)
+		response_data = response.json()
+		assert len(response_data) == len(items)
+		assert response_data[0]["result"]["convertedAmount"] == pytest.approx(
+			er.value.value * 1000
+		)
+		assert response_data[1]["result"] is None
+		assert response_data[1]["error"] is not None
+		assert response_data[2]["result"]["convertedAmount"] == pytest.approx(
+			1 / er.value.value * 100, abs=0.01
+		)
+		assert response_data[3]["result"]["convertedAmount"] == pytest.approx(
+			er.value.value * 10
+		)
+
+	@pytest.mark.parametrize(
+		"items",
+		[
+			[],
+			[{"from_": "US", "to": "EUR", "amount": 1000}],
+			[{"from_": "USD", "to": "EUR", "amount": 0}],
+		],
+	)
+	async def test_convert_currency_batch_error_when_bad_data_in_request(
+		self, items, access_token, request_client
+	):
+		response = await request_client.post(
+			self.convertion_batch_endpoint,
+			headers={"Authorization": f"Bearer {access_token[0]}"},
+			json={"items": items},
+		)
+
+		assert response.status_code == 400
+
 	@pytest.mark.parametrize(
 		"data",
 		[
@@ -0,0 +1,308 @@
+import pytest
+
+from currency_exchange.currency_exchange.application.dto import (
+	GetCurrencyDto,
+	GetExchangeRateDto,
+	AddExchangeRateDto,
+	AlterCurrencyDto,
+	AlterExchangeRateDto,
+	DeleteExchangeRateDto,
+)
+from currency_exchange.currency_exchange.domain.types import (
+	CurrencyCode,
+	CurrencyName,
+	CurrencySign,
+	ExchangeRateValue,
+)
+from currency_exchange.currency_exchange.application import errors
+from currency_exchange.currency_exchange.application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from currency_exchange.currency_exchange.infrastructure.memory.ratematrix import (
+	ExchangeRatesMatrix,
+)
+from currency_exchange.currency_exchange.infrastructure.memory.repos import (
+	ExchangeRatesGraphStore,
+	InMemoryCurrencyRepo,
+	InMemoryExchangeRatesRepo,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def rates_graph_store(
+	currencies_repo, exchange_rates_repo
+) -> ExchangeRatesGraphStore:
+	return ExchangeRatesGraphStore(currencies_repo, exchange_rates_repo)
+
+
+@pytest.fixture
+async def in_memory_currencies_repo(rates_graph_store) -> InMemoryCurrencyRepo:
+	return InMemoryCurrencyRepo(rates_graph_store)
+
+
+@pytest.fixture
+async def in_memory_exchange_rates_repo(
+	rates_graph_store,
+) -> InMemoryExchangeRatesRepo:
+	return InMemoryExchangeRatesRepo(rates_graph_store)
+
+
+async def test_get_currency_success(in_memory_currencies_repo):
+	res = await in_memory_currencies_repo.get_currency(
+		GetCurrencyDto(CurrencyCode("USD"))
+	)
+	assert res.code == "USD"
+
+	res = await in_memory_currencies_repo.get_currency(
+		GetCurrencyDto(name=CurrencyName("Euro"))
+	)
+	assert res.code == "EUR"
+
+
+async def test_get_currency_error_when_currency_doesnt_exist(
+	in_memory_currencies_repo,
+):
+	with pytest.raises(errors.CurrencyDoesNotExistError):
+		await in_memory_currencies_repo.get_currency(
+			GetCurrencyDto(CurrencyCode("XXX"))
+		)
+
+
+async def test_get_exchange_rate_success(
+	in_memory_exchange_rates_repo, exchange_rates_models
+):
+	res = await in_memory_exchange_rates_repo.get_rate(
+		GetExchangeRateDto(CurrencyCode("RUB"), CurrencyCode("USD"))
+	)
+	assert res.base.code == "RUB"
+	assert res.target.code == "USD"
+	assert res.id == exchange_rates_models["RUB", "USD"].id
+
+
+async def test_get_exchange_rate_error_when_rate_doesnt_exist(
+	in_memory_exchange_rates_repo,
+):
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await in_memory_exchange_rates_repo.get_rate(
+			GetExchangeRateDto(CurrencyCode("USD"), CurrencyCode("RUB"))
+		)
+
+
+async def test_get_cross_rates_successful(in_memory_exchange_rates_repo):
+	cross_rates = await in_memory_exchange_rates_repo.get_cross_rates(
+		GetExchangeRateDto(CurrencyCode("RUB"), CurrencyCode("EUR")),
+	)
+
+	res_currency_codes_tuples = {
+		(
+			(er1.base.code.data, er1.target.code.data),
+			(er2.base.code.data, er2.target.code.data),
+		)
+		for er1, er2 in cross_rates
+	}
+
+	assert res_currency_codes_tuples == {
+		(("RUB", "USD"), ("USD", "EUR")),
+		(("RUB", "USD"), ("EUR", "USD")),
+		(("RUB", "JPY"), ("EUR", "JPY")),
+		(("RUB", "DKK"), ("DKK", "EUR")),
+	}
+
+
+async def test_get_rates_chain_successful(in_memory_exchange_rates_repo):
+	rates_chain = await in_memory_exchange_rates_repo.get_rates_chain(
+		GetExchangeRateDto(CurrencyCode("KZT"), CurrencyCode("GBP")), max_hops=3
+	)
+
+	assert [(er.base.code, er.target.code) for er in rates_chain] == [
+		("KZT", "RUB"),
+		("RUB", "USD"),
+		("USD", "GBP"),
+	]
+
+
+async def test_get_rates_chain_error_when_chain_is_too_long(
+	in_memory_exchange_rates_repo,
+):
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await in_memory_exchange_rates_repo.get_rates_chain(
+			GetExchangeRateDto(CurrencyCode("KZT"), CurrencyCode("GBP")), max_hops=2
+		)
+
+
+async def test_written_rates_are_applied_to_loaded_graph(
+	in_memory_exchange_rates_repo,
+):
+	rate_data = GetExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("KZT"))
+	# loads the graph before the write
+	await in_memory_exchange_rates_repo.get_all_rates()
+
+	await in_memory_exchange_rates_repo.save_rate(
+		AddExchangeRateDto(
+			rate_data.base_currency, rate_data.target_currency, ExchangeRateValue(650)
+		)
+	)
+	res = await in_memory_exchange_rates_repo.get_rate(rate_data)
+	assert res.rate.value == pytest.approx(650)
+
+	await in_memory_exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(rate_data.base_currency, rate_data.target_currency)
+	)
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await in_memory_exchange_rates_repo.get_rate(rate_data)
+
+
+async def test_rates_changed_by_another_process_are_refreshed(
+	rates_graph_store, in_memory_exchange_rates_repo, exchange_rates_repo
+):
+	rate_data = GetExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("KZT"))
+	await in_memory_exchange_rates_repo.get_all_rates()
+	# writes made by another process aren't applied to the graph until it's refreshed
+	await exchange_rates_repo.save_rate(
+		AddExchangeRateDto(
+			rate_data.base_currency, rate_data.target_currency, ExchangeRateValue(650)
+		)
+	)
+	await exchange_rates_repo.update_rate(
+		AlterExchangeRateDto(
+			CurrencyCode("RUB"), CurrencyCode("USD"), ExchangeRateValue(0.02)
+		)
+	)
+
+	await rates_graph_store.refresh_rates([("GBP", "KZT"), ("RUB", "USD")])
+	res = await in_memory_exchange_rates_repo.get_rate(rate_data)
+	assert res.rate.value == pytest.approx(650)
+	res, _ = await in_memory_exchange_rates_repo.resolve_rate(
+		GetExchangeRateDto(CurrencyCode("USD"), CurrencyCode("RUB")),
+		rate_fetch_strategy=ERFetchStrat.BY_REVERSED_RATE,
+	)
+	assert res.rate.value == pytest.approx(50)
+
+	await exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(rate_data.base_currency, rate_data.target_currency)
+	)
+	await rates_graph_store.refresh_rates([("GBP", "KZT")])
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await in_memory_exchange_rates_repo.get_rate(rate_data)
+
+
+async def test_currencies_changed_by_another_process_are_refreshed(
+	rates_graph_store,
+	in_memory_currencies_repo,
+	in_memory_exchange_rates_repo,
+	currencies_repo,
+):
+	usd = GetCurrencyDto(CurrencyCode("USD"))
+	await in_memory_currencies_repo.get_all_currencies()
+	await currencies_repo.update_currency(
+		AlterCurrencyDto(CurrencyCode("USD"), CurrencyName("Dollar"), CurrencySign("$"))
+	)
+
+	await rates_graph_store.refresh_currencies(["USD", "XXX"])
+	assert (await in_memory_currencies_repo.get_currency(usd)).name == "Dollar"
+	res = await in_memory_exchange_rates_repo.get_rate(
+		GetExchangeRateDto(CurrencyCode("RUB"), CurrencyCode("USD"))
+	)
+	assert res.target.name == "Dollar"
+
+
+async def test_resolve_rate_successful(
+	in_memory_exchange_rates_repo, exchange_rates_models
+):
+	strategy = ERFetchStrat.BY_REVERSED_RATE | ERFetchStrat.BY_COMMON_CURRENCY
+
+	res, fetched_by = await in_memory_exchange_rates_repo.resolve_rate(
+		GetExchangeRateDto(CurrencyCode("USD"), CurrencyCode("RUB")),
+		rate_fetch_strategy=strategy,
+	)
+	assert fetched_by is ERFetchStrat.BY_REVERSED_RATE
+	assert res.id == exchange_rates_models["RUB", "USD"].id
+	assert res.rate.value == pytest.approx(
+		1 / exchange_rates_models["RUB", "USD"].value.value
+	)
+
+	res, fetched_by = await in_memory_exchange_rates_repo.resolve_rate(
+		GetExchangeRateDto(CurrencyCode("RUB"), CurrencyCode("EUR")),
+		rate_fetch_strategy=strategy,
+	)
+	assert fetched_by is ERFetchStrat.BY_COMMON_CURRENCY
+	assert res.base.code == "RUB"
+	assert res.target.code == "EUR"
+	assert res.rate.value == pytest.approx(
+		exchange_rates_models["RUB", "USD"].value.value
+		/ exchange_rates_models["EUR", "USD"].value.value
+	)
+
+
+@pytest.mark.parametrize(
+	"base, target, strategy, error",
+	[
+		(
+			"USD",
+			"RUB",
+			ERFetchStrat.BY_STRAIGHT_RATE,
+			errors.ExchangeRateDoesntExistError,
+		),
+		(
+			"RUB",
+			"EUR",
+			ERFetchStrat.BY_REVERSED_RATE,
+			errors.ExchangeRateDoesntExistError,
+		),
+		(
+			"KZT",
+			"GBP",
+			ERFetchStrat.BY_COMMON_CURRENCY,
+			errors.ExchangeRateDoesntExistError,
+		),
+		(
+			"XXX",
+			"GBP",
+			ERFetchStrat.BY_COMMON_CURRENCY,
+			errors.CurrencyDoesNotExistError,
+		),
+	],
+)
+async def test_resolve_rate_error_when_strategy_doesnt_allow_it(
+	in_memory_exchange_rates_repo, base, target, strategy, error
+):
+	with pytest.raises(error):
+		await in_memory_exchange_rates_repo.resolve_rate(
+			GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target)),
+			rate_fetch_strategy=strategy,
+		)
+
+
+async def test_rates_matrix_incremental_update_matches_rebuild(
+	rates_graph_store,
+):
+	graph = await rates_graph_store.get_graph()
+	matrix = ExchangeRatesMatrix(graph.get_all_currencies(), graph.get_all_rates())
+	kzt_rub, usd_gbp = graph.get_rate("KZT", "RUB"), graph.get_rate("USD", "GBP")
+
+	matrix.remove_rate("KZT", "RUB")
+	matrix.remove_rate("USD", "GBP")
+	matrix.set_rate(kzt_rub)
+	matrix.set_rate(usd_gbp)
+	matrix.remove_currency("DKK")
+
+	rebuilt = ExchangeRatesMatrix(
+		[c for c in graph.get_all_currencies() if c.code != "DKK"],
+		[
+			er
+			for er in graph.get_all_rates()
+			if "DKK" not in (er.base.code, er.target.code)
+		],
+	)
+	strategy = ERFetchStrat.BY_REVERSED_RATE | ERFetchStrat.BY_COMMON_CURRENCY
+	for base in rebuilt._indices:
+		for target in rebuilt._indices:
+			expected = rebuilt.get_rate(base, target, strategy)
+			res = matrix.get_rate(base, target, strategy)
+			if expected is None:
+				assert res is None
+			else:
+				assert res[0].rate.value == pytest.approx(expected[0].rate.value)
+				assert res[1] is expected[1]
@@ -1,4 +1,11 @@
+import asyncio
+import contextvars
+from datetime import timedelta
+
 import pytest
+import sqlalchemy.exc
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from currency_exchange.currency_exchange.application.dto import (
 	GetCurrencyDto,
@@ -9,6 +16,7 @@ from currency_exchange.currency_exchange.application.dto import (
 	AddExchangeRateDto,
 	AlterExchangeRateDto,
 	DeleteExchangeRateDto,
+	ExchangeRatesQueryDto,
 )
 from currency_exchange.currency_exchange.domain.entities import Currency
 
@@ -20,11 +28,58 @@ from currency_exchange.currency_exchange.domain.types import (
 )
 from currency_exchange.currency_exchange.application import errors
 from currency_exchange.currency_exchange.domain.entities import CurrenciesExchangeRate
+from currency_exchange.currency_exchange.application.interactions.erfetchstrategies import (
+	ExchangeRateFetchStrategy as ERFetchStrat,
+)
+from currency_exchange.currency_exchange.infrastructure.memory.rategraph import (
+	ExchangeRatesGraph,
+)
+from currency_exchange.currency_exchange.infrastructure.memory.repos import (
+	ExchangeRatesGraphStore,
+	InMemoryExchangeRatesRepo,
+)
+from currency_exchange.currency_exchange.application.extdm import IdentifiedCurrency
+from currency_exchange.currency_exchange.infrastructure.db.currenciesindex import (
+	CurrenciesIndex,
+)
+from currency_exchange.currency_exchange.infrastructure.db.repos import (
+	CurrencyPostgresRepo,
+	ExchangeRatesPostgresRepo,
+)
+from currency_exchange.currency_exchange.infrastructure.db.rawrepos import (
+	CurrencyAsyncpgRepo,
+	ExchangeRatesAsyncpgRepo,
+)
+from currency_exchange.currency_exchange.infrastructure.db.dbmodels import (
+	ExchangeRateHistoryORMModel,
+)
+from currency_exchange.currency_exchange.infrastructure.dataversion import DataVersion
+from currency_exchange.db.changes import ChangeVersion
+from currency_exchange.db.pool import MonitoredAsyncQueuePool, get_pool_stats
+from currency_exchange.db.unitofwork import UnitOfWorkSessionFactory, unit_of_work
+from currency_exchange.db.routing import (
+	PrimarySession,
+	RoutingSessionFactory,
+	on_primary,
+)
 from .utils import get_currency_from_db, get_exchange_rate_from_db
 
 pytestmark = pytest.mark.anyio
 
 
+# repositories of both implementations have to behave the same
+@pytest.fixture(scope="module", params=[CurrencyPostgresRepo, CurrencyAsyncpgRepo])
+async def currencies_repo(request, local_sessionmaker):
+	return request.param(local_sessionmaker)
+
+
+@pytest.fixture(
+	scope="module", params=[ExchangeRatesPostgresRepo, ExchangeRatesAsyncpgRepo]
+)
+async def exchange_rates_repo(request, local_sessionmaker):
+	return request.param(local_sessionmaker)
+
+
 class TestCurrenciesRepo:
 	async def test_get_all_currencies(self, currencies_repo):
 		res = await currencies_repo.get_all_currencies()
@@ -107,10 +162,133 @@ class TestCurrenciesRepo:
 
 
 class TestExchangeRatesRepo:
+	@pytest.mark.parametrize(
+		"base, target, strategy, fetched_by",
+		[
+			(
+				"RUB",
+				"USD",
+				ERFetchStrat.BY_STRAIGHT_RATE,
+				ERFetchStrat.BY_STRAIGHT_RATE,
+			),
+			(
+				"USD",
+				"RUB",
+				ERFetchStrat.BY_REVERSED_RATE,
+				ERFetchStrat.BY_REVERSED_RATE,
+			),
+			(
+				"EUR",
+				"USD",
+				ERFetchStrat.BY_REVERSED_RATE | ERFetchStrat.BY_COMMON_CURRENCY,
+				ERFetchStrat.BY_STRAIGHT_RATE,
+			),
+			(
+				"RUB",
+				"EUR",
+				ERFetchStrat.BY_REVERSED_RATE | ERFetchStrat.BY_COMMON_CURRENCY,
+				ERFetchStrat.BY_COMMON_CURRENCY,
+			),
+		],
+	)
+	async def test_resolve_rate_successful(
+		self, exchange_rates_repo, currencies_repo, base, target, strategy, fetched_by
+	):
+		correct_rate, _ = await InMemoryExchangeRatesRepo(
+			ExchangeRatesGraphStore(currencies_repo, exchange_rates_repo)
+		).resolve_rate(
+			GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target)),
+			rate_fetch_strategy=strategy,
+		)
+
+		res, res_fetched_by = await exchange_rates_repo.resolve_rate(
+			GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target)),
+			rate_fetch_strategy=strategy,
+		)
+
+		assert res_fetched_by is fetched_by
+		assert res.base.code == base
+		assert res.target.code == target
+		assert res.id == correct_rate.id
+		assert res.rate.value == pytest.approx(correct_rate.rate.value)
+
+	@pytest.mark.parametrize(
+		"base, target, strategy, error",
+		[
+			(
+				"USD",
+				"RUB",
+				ERFetchStrat.BY_STRAIGHT_RATE,
+				errors.ExchangeRateDoesntExistError,
+			),
+			(
+				"KZT",
+				"GBP",
+				ERFetchStrat.BY_REVERSED_RATE | ERFetchStrat.BY_COMMON_CURRENCY,
+				errors.ExchangeRateDoesntExistError,
+			),
+			(
+				"XXX",
+				"GBP",
+				ERFetchStrat.BY_COMMON_CURRENCY,
+				errors.CurrencyDoesNotExistError,
+			),
+		],
+	)
+	async def test_resolve_rate_error(
+		self, exchange_rates_repo, base, target, strategy, error
+	):
+		with pytest.raises(error):
+			await exchange_rates_repo.resolve_rate(
+				GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target)),
+				rate_fetch_strategy=strategy,
+			)
+
 	async def test_get_all_exchange_rates(self, exchange_rates_repo):
 		res = await exchange_rates_repo.get_all_rates()
 		assert all(isinstance(er, CurrenciesExchangeRate) for er in res)
 
+		currencies = {}
+		for er in res:
+			for currency in er.base, er.target:
+				assert currencies.setdefault(currency.id, currency) is currency
+
+	async def test_stream_exchange_rates(self, exchange_rates_repo):
+		def rates_data(rates):
+			return sorted(
+				(er.id, er.base.code, er.target.code, er.rate.value) for er in rates
+			)
+
+		streamed_rates = [
+			er async for er in exchange_rates_repo.stream_rates(ExchangeRatesQueryDto())
+		]
+		assert rates_data(streamed_rates) == rates_data(
+			await exchange_rates_repo.get_all_rates()
+		)
+
+	async def test_stream_exchange_rates_page(self, exchange_rates_repo):
+		usd_rates = sorted(
+			(
+				er
+				for er in await exchange_rates_repo.get_all_rates()
+				if er.target.code == "USD"
+			),
+			key=lambda er: er.id,
+		)
+
+		res = [
+			er
+			async for er in exchange_rates_repo.stream_rates(
+				ExchangeRatesQueryDto(
+					target_currency=CurrencyCode("USD"),
+					after_id=usd_rates[0].id,
+					limit=1,
+				)
+			)
+		]
+
+		assert [er.id for er in res] == [usd_rates[1].id]
+
 	async def test_get_exchange_rate_success(self, exchange_rates_repo):
 		res = await exchange_rates_repo.get_rate(
 			GetExchangeRateDto(CurrencyCode("RUB"), CurrencyCode("USD"))
@@ -126,6 +304,41 @@ class TestExchangeRatesRepo:
 				GetExchangeRateDto(CurrencyCode("AAA"), CurrencyCode("DDD"))
 			)
 
+	@pytest.mark.parametrize(
+		"base, target", [("KZT", "GBP"), ("GBP", "KZT"), ("RUB", "EUR")]
+	)
+	async def test_get_rates_chain_is_the_shortest_one(
+		self, exchange_rates_repo, base, target
+	):
+		rates_graph = ExchangeRatesGraph(
+			rates=await exchange_rates_repo.get_all_rates()
+		)
+		shortest_chain = rates_graph.get_rates_chain(base, target, max_hops=3)
+
+		rates_chain = await exchange_rates_repo.get_rates_chain(
+			GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target)), max_hops=3
+		)
+
+		assert len(rates_chain) == len(shortest_chain)
+		assert rates_chain[0].base.code == base
+		assert rates_chain[-1].target.code == target
+		assert all(
+			er1.target.code == er2.base.code
+			for er1, er2 in zip(rates_chain, rates_chain[1:])
+		)
+
+	@pytest.mark.parametrize(
+		"base, target, max_hops", [("KZT", "GBP", 2), ("XXX", "GBP", 3)]
+	)
+	async def test_get_rates_chain_error_when_chain_isnt_found(
+		self, exchange_rates_repo, base, target, max_hops
+	):
+		with pytest.raises(errors.ExchangeRateDoesntExistError):
+			await exchange_rates_repo.get_rates_chain(
+				GetExchangeRateDto(CurrencyCode(base), CurrencyCode(target)),
+				max_hops=max_hops,
+			)
+
 	async def test_add_exchange_rate_successful(
 		self, exchange_rates_repo, local_sessionmaker
 	):
@@ -231,3 +444,415 @@ class TestExchangeRatesRepo:
 			or currency_codes[::-1] in res_currency_codes_tuples
 			for currency_codes in correct_currency_codes_tuples
 		)
+
+
+async def test_currencies_index_is_kept_by_currencies_repo(local_sessionmaker):
+	currencies_index = CurrenciesIndex()
+	currencies_repo = CurrencyPostgresRepo(local_sessionmaker, currencies_index)
+
+	await currencies_repo.get_all_currencies()
+	usd_id = currencies_index.get_id("USD")
+	assert currencies_index.get_currency(usd_id).code == "USD"
+
+	saved_currency = await currencies_repo.save_currency(
+		AddCurrencyDto(
+			CurrencyCode("CHF"), CurrencyName("Swiss franc"), CurrencySign("F")
+		)
+	)
+	assert currencies_index.get_id("CHF") == saved_currency.id
+
+	await currencies_repo.delete_currency(DeleteCurrencyDto(CurrencyCode("CHF")))
+	assert currencies_index.get_id("CHF") is None
+
+
+async def test_save_rate_when_currencies_index_is_obsolete(local_sessionmaker):
+	currencies_index = CurrenciesIndex(
+		[
+			IdentifiedCurrency(
+				CurrencyCode("GBP"),
+				CurrencySign("£"),
+				CurrencyName("Pound Sterling"),
+				id=100500,
+			)
+		]
+	)
+	exchange_rates_repo = ExchangeRatesPostgresRepo(
+		local_sessionmaker, currencies_index
+	)
+
+	saved_rate = await exchange_rates_repo.save_rate(
+		AddExchangeRateDto(
+			CurrencyCode("GBP"), CurrencyCode("DKK"), ExchangeRateValue(8.6)
+		)
+	)
+	assert saved_rate.base.code == "GBP"
+	assert currencies_index.get_id("GBP") == saved_rate.base.id
+
+	await exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+	)
+
+
+async def test_update_and_delete_rate_when_currencies_index_is_obsolete(
+	local_sessionmaker,
+):
+	saved_rate = await ExchangeRatesPostgresRepo(
+		local_sessionmaker, CurrenciesIndex([])
+	).save_rate(
+		AddExchangeRateDto(
+			CurrencyCode("GBP"), CurrencyCode("DKK"), ExchangeRateValue(8.6)
+		)
+	)
+	currencies_index = CurrenciesIndex(
+		[
+			IdentifiedCurrency(
+				CurrencyCode("GBP"),
+				CurrencySign("£"),
+				CurrencyName("Pound Sterling"),
+				id=100500,
+			)
+		]
+	)
+	exchange_rates_repo = ExchangeRatesPostgresRepo(
+		local_sessionmaker, currencies_index
+	)
+
+	updated_rate = await exchange_rates_repo.update_rate(
+		AlterExchangeRateDto(
+			CurrencyCode("GBP"), CurrencyCode("DKK"), ExchangeRateValue(8.7)
+		)
+	)
+	assert updated_rate.id == saved_rate.id
+	assert currencies_index.get_id("GBP") == saved_rate.base.id
+
+	currencies_index.set(
+		IdentifiedCurrency(
+			CurrencyCode("GBP"),
+			CurrencySign("£"),
+			CurrencyName("Pound Sterling"),
+			id=100500,
+		)
+	)
+	deleted_rate = await exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+	)
+	assert deleted_rate.id == saved_rate.id
+
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await exchange_rates_repo.delete_rate(
+			DeleteExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+		)
+
+
+async def test_rate_writes_increment_change_version(exchange_rates_repo, db_session):
+	async def get_version():
+		version = await db_session.scalar(
+			select(ChangeVersion.version).where(ChangeVersion.topic == "exchange_rates")
+		)
+		await db_session.rollback()
+		return version or 0
+
+	version = await get_version()
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await exchange_rates_repo.delete_rate(
+			DeleteExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+		)
+	assert await get_version() == version
+
+	await exchange_rates_repo.save_rate(
+		AddExchangeRateDto(
+			CurrencyCode("GBP"), CurrencyCode("DKK"), ExchangeRateValue(8.6)
+		)
+	)
+	await exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+	)
+	assert await get_version() == version + 2
+
+
+async def test_upsert_rates(exchange_rates_repo, exchange_rates_models, db_session):
+	rates = [
+		AddExchangeRateDto(
+			CurrencyCode("GBP"), CurrencyCode("DKK"), ExchangeRateValue(8.6)
+		),
+		AddExchangeRateDto(
+			CurrencyCode("EUR"), CurrencyCode("USD"), ExchangeRateValue(2)
+		),
+		AddExchangeRateDto(
+			CurrencyCode("XXX"), CurrencyCode("USD"), ExchangeRateValue(1)
+		),
+		AddExchangeRateDto(
+			CurrencyCode("EUR"), CurrencyCode("USD"), ExchangeRateValue(1.13)
+		),
+	]
+
+	results = await exchange_rates_repo.upsert_rates(rates)
+
+	(gbp_dkk, created), (eur_usd, updated), error, last_eur_usd = results
+	assert created is True and updated is False
+	assert (gbp_dkk.base.code, gbp_dkk.target.code) == ("GBP", "DKK")
+	assert eur_usd.id == exchange_rates_models["EUR", "USD"].id
+	# the last rate for the same currencies pair is saved
+	assert eur_usd.rate.value == pytest.approx(1.13)
+	assert last_eur_usd[0] is eur_usd
+	assert isinstance(error, errors.CurrencyDoesNotExistError)
+	er_from_db = await get_exchange_rate_from_db("GBP", "DKK", db_session)
+	assert er_from_db.id == gbp_dkk.id
+
+	await exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+	)
+
+
+async def test_get_rate_as_of(exchange_rates_repo, db_session):
+	rate_data = GetExchangeRateDto(CurrencyCode("GBP"), CurrencyCode("DKK"))
+	saved_rate = await exchange_rates_repo.save_rate(
+		AddExchangeRateDto(
+			rate_data.base_currency, rate_data.target_currency, ExchangeRateValue(8.6)
+		)
+	)
+	await exchange_rates_repo.update_rate(
+		AlterExchangeRateDto(
+			rate_data.base_currency, rate_data.target_currency, ExchangeRateValue(8.7)
+		)
+	)
+	await exchange_rates_repo.delete_rate(
+		DeleteExchangeRateDto(rate_data.base_currency, rate_data.target_currency)
+	)
+	saved_at, updated_at, deleted_at = (
+		await db_session.scalars(
+			select(ExchangeRateHistoryORMModel.valid_from)
+			.where(ExchangeRateHistoryORMModel.rate_id == saved_rate.id)
+			.order_by(ExchangeRateHistoryORMModel.id)
+		)
+	).all()
+
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await exchange_rates_repo.get_rate_as_of(
+			rate_data, saved_at - timedelta(microseconds=1)
+		)
+	for as_of, value in [
+		(saved_at, 8.6),
+		(updated_at - timedelta(microseconds=1), 8.6),
+		(updated_at, 8.7),
+	]:
+		res = await exchange_rates_repo.get_rate_as_of(rate_data, as_of)
+		assert res.id == saved_rate.id
+		assert res.rate.value == pytest.approx(value)
+	with pytest.raises(errors.ExchangeRateDoesntExistError):
+		await exchange_rates_repo.get_rate_as_of(rate_data, deleted_at)
+
+
+async def test_pool_stats(sqlalchemy_engine):
+	engine = create_async_engine(
+		sqlalchemy_engine.url,
+		poolclass=MonitoredAsyncQueuePool,
+		pool_size=1,
+		max_overflow=0,
+		pool_timeout=0.1,
+	)
+	try:
+		async with engine.connect():
+			with pytest.raises(sqlalchemy.exc.TimeoutError):
+				async with engine.connect():
+					pass
+			stats = get_pool_stats(engine)
+	finally:
+		await engine.dispose()
+
+	assert (stats.size, stats.checked_out, stats.max_checked_out) == (1, 1, 1)
+	assert (stats.checkouts, stats.timeouts) == (1, 1)
+	assert stats.max_wait_seconds >= 0.1
+	assert get_pool_stats(sqlalchemy_engine) is None
+
+
+async def test_unit_of_work_uses_one_connection(sqlalchemy_engine):
+	engine = create_async_engine(
+		sqlalchemy_engine.url, poolclass=MonitoredAsyncQueuePool
+	)
+	session_factory = UnitOfWorkSessionFactory(
+		async_sessionmaker(engine, expire_on_commit=False)
+	)
+	currencies_repo = CurrencyPostgresRepo(session_factory)
+	exchange_rates_repo = ExchangeRatesPostgresRepo(session_factory)
+
+	async def read():
+		await currencies_repo.get_currency(GetCurrencyDto(CurrencyCode("USD")))
+		await exchange_rates_repo.get_rate(
+			GetExchangeRateDto(CurrencyCode("EUR"), CurrencyCode("USD"))
+		)
+
+	try:
+		await read()
+		assert get_pool_stats(engine).checkouts == 2
+		async with unit_of_work():
+			await read()
+			with pytest.raises(errors.ExchangeRateDoesntExistError):
+				await exchange_rates_repo.get_rate(
+					GetExchangeRateDto(CurrencyCode("USD"), CurrencyCode("RUB"))
+				)
+			await read()
+		assert get_pool_stats(engine).checkouts == 3
+	finally:
+		await engine.dispose()
+
+
+async def test_unit_of_work_changes_are_committed_at_once(
+	local_sessionmaker, db_session
+):
+	currencies_repo = CurrencyPostgresRepo(UnitOfWorkSessionFactory(local_sessionmaker))
+
+	async with unit_of_work():
+		await currencies_repo.save_currency(
+			AddCurrencyDto(CurrencyCode("AAA"), CurrencyName("A"), CurrencySign("A"))
+		)
+		# failed operation doesn't break the unit of work
+		with pytest.raises(errors.CurrencyAlreadyExistsError):
+			await currencies_repo.save_currency(
+				AddCurrencyDto(
+					CurrencyCode("AAA"), CurrencyName("A"), CurrencySign("A")
+				)
+			)
+		await currencies_repo.save_currency(
+			AddCurrencyDto(CurrencyCode("BBB"), CurrencyName("B"), CurrencySign("B"))
+		)
+	with pytest.raises(RuntimeError):
+		async with unit_of_work():
+			await currencies_repo.save_currency(
+				AddCurrencyDto(
+					CurrencyCode("CCC"), CurrencyName("C"), CurrencySign("C")
+				)
+			)
+			raise RuntimeError
+
+	assert await get_currency_from_db("AAA", db_session) is not None
+	assert await get_currency_from_db("BBB", db_session) is not None
+	assert await get_currency_from_db("CCC", db_session) is None
+
+
+async def test_unit_of_work_side_effects_run_after_commit(
+	local_sessionmaker, db_session
+):
+	currencies_index = CurrenciesIndex()
+	data_version = DataVersion()
+	currencies_repo = CurrencyPostgresRepo(
+		UnitOfWorkSessionFactory(local_sessionmaker), currencies_index, data_version
+	)
+
+	async def get_version():
+		version = await db_session.scalar(
+			select(ChangeVersion.version).where(ChangeVersion.topic == "currencies")
+		)
+		await db_session.rollback()
+		return version or 0
+
+	version = await get_version()
+	async with unit_of_work():
+		saved_currency = await currencies_repo.save_currency(
+			AddCurrencyDto(CurrencyCode("DDD"), CurrencyName("D"), CurrencySign("D"))
+		)
+		# uncommitted currency isn't exposed to concurrent requests
+		assert currencies_index.get_id("DDD") is None
+		assert data_version.value == 0
+		# change is published just before commit
+		assert await get_version() == version
+	assert currencies_index.get_id("DDD") == saved_currency.id
+	assert data_version.value == 1
+	assert await get_version() == version + 1
+
+	with pytest.raises(RuntimeError):
+		async with unit_of_work():
+			await currencies_repo.update_currency(
+				AlterCurrencyDto(CurrencyCode("DDD"), CurrencyName("E"))
+			)
+			raise RuntimeError
+	assert data_version.value == 1
+	assert currencies_index.get_currency(saved_currency.id).name == "D"
+	assert await get_version() == version + 1
+
+
+@pytest.fixture
+def routed_sessions(db_connection, local_sessionmaker):
+	primary_sessionmaker = async_sessionmaker(
+		bind=db_connection,
+		expire_on_commit=False,
+		join_transaction_mode="create_savepoint",
+		sync_session_class=PrimarySession,
+	)
+	routed = []
+
+	def routed_to(name, session_factory):
+		def make_session():
+			routed.append(name)
+			return session_factory()
+
+		return make_session
+
+	return routed, routed_to("primary", primary_sessionmaker), routed_to
+
+
+async def test_reads_are_routed_to_replica_until_write_of_the_same_request(
+	routed_sessions, local_sessionmaker
+):
+	routed, primary, routed_to = routed_sessions
+	currencies_repo = CurrencyPostgresRepo(
+		RoutingSessionFactory(
+			primary,
+			[routed_to("replica", local_sessionmaker)],
+			stickiness=60,
+		)
+	)
+	usd = GetCurrencyDto(CurrencyCode("USD"))
+
+	async def write_request():
+		await currencies_repo.get_currency(usd)
+		await currencies_repo.save_currency(
+			AddCurrencyDto(CurrencyCode("AAA"), CurrencyName("A"), CurrencySign("A"))
+		)
+		# data, written by the request, is read from the primary
+		return await currencies_repo.get_currency(GetCurrencyDto(CurrencyCode("AAA")))
+
+	# requests are handled in contexts of their own
+	res = await asyncio.create_task(write_request(), context=contextvars.Context())
+	await asyncio.create_task(
+		currencies_repo.get_currency(usd), context=contextvars.Context()
+	)
+
+	assert res.code == "AAA"
+	assert routed == ["replica", "primary", "primary", "replica"]
+
+
+async def test_reads_are_routed_to_primary_within_on_primary_context(
+	routed_sessions, local_sessionmaker
+):
+	routed, primary, routed_to = routed_sessions
+	currencies_repo = CurrencyPostgresRepo(
+		RoutingSessionFactory(primary, [routed_to("replica", local_sessionmaker)])
+	)
+	usd = GetCurrencyDto(CurrencyCode("USD"))
+
+	with on_primary():
+		await currencies_repo.get_currency(usd)
+	await currencies_repo.get_currency(usd)
+
+	assert routed == ["primary", "replica"]
+
+
+async def test_reads_fall_back_to_primary_when_replica_fails(
+	routed_sessions, sqlalchemy_engine
+):
+	routed, primary, routed_to = routed_sessions
+	unavailable_replica = create_async_engine(sqlalchemy_engine.url.set(port=1))
+	session_factory = RoutingSessionFactory(
+		primary,
+		[routed_to("replica", async_sessionmaker(unavailable_replica))],
+	)
+	exchange_rates_repo = ExchangeRatesPostgresRepo(session_factory)
+	rate_data = GetExchangeRateDto(CurrencyCode("EUR"), CurrencyCode("USD"))
+
+	res = await exchange_rates_repo.get_rate(rate_data)
+	assert session_factory.get_replicas_state() == [False]
+	await exchange_rates_repo.get_rate(rate_data)
+
+	assert res.base.code == "EUR"
+	assert routed == ["replica", "primary", "primary"]